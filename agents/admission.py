@@ -0,0 +1,159 @@
+# triage_ai_assistant/agents/admission.py
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Patient the current request is for; set by the routers, which charge it once per request
+current_patient: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_patient", default=None)
+
+class LLMOverloadedError(Exception):
+    """Raised when an LLM call is shed instead of queued"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"LLM capacity exceeded: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, cost: float = 1.0) -> float:
+        """Seconds until cost tokens are available (0 if they are now), without taking them"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """Take cost tokens; returns 0 on success, otherwise seconds until they'd be available"""
+        wait = self.wait_time(cost)
+        if not wait:
+            self.tokens -= cost
+        return wait
+
+class AdmissionController:
+    """Global and per-patient rate limits for LLM-backed requests plus a bounded concurrency gate for LLM calls.
+
+    `admit` charges the rate limits once per triage or chat request, however
+    many LLM calls (workflow steps, retries, hedges) it goes on to make.
+    `slot` gates each call: calls arriving when the wait queue is already
+    full are rejected immediately, others wait at most `queue_timeout`
+    seconds for one of the `max_concurrency` slots.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        max_queue: int = int(os.getenv("LLM_MAX_QUEUE", "32")),
+        queue_timeout: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "10")),
+        global_rate: float = float(os.getenv("LLM_GLOBAL_RATE", "5")),
+        global_burst: float = float(os.getenv("LLM_GLOBAL_BURST", "20")),
+        patient_rate: float = float(os.getenv("LLM_PATIENT_RATE", "0.5")),
+        patient_burst: float = float(os.getenv("LLM_PATIENT_BURST", "6")),
+        max_patients: int = 10000,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.patient_rate = patient_rate
+        self.patient_burst = patient_burst
+        self.max_patients = max_patients
+        self._global = TokenBucket(global_rate, global_burst)
+        self._patients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued = 0
+        self._rejections = {"global_rate": 0, "patient_rate": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def _reject(self, reason: str, retry_after: float):
+        with self._lock:
+            self._rejections[reason] += 1
+        logger.warning("Shedding LLM call (%s), retry after %.1fs", reason, retry_after)
+        raise LLMOverloadedError(reason, retry_after)
+
+    def _patient_bucket(self, patient: str) -> TokenBucket:
+        bucket = self._patients.get(patient)
+        if bucket is None:
+            bucket = TokenBucket(self.patient_rate, self.patient_burst)
+            self._patients[patient] = bucket
+            while len(self._patients) > self.max_patients:
+                self._patients.popitem(last=False)
+        else:
+            self._patients.move_to_end(patient)
+        return bucket
+
+    def admit(self, patient: Optional[str] = None):
+        """Charge one request to the rate limits: the patient's (defaulting to `current_patient`) and the global one.
+
+        Both buckets are checked before either is charged, so a rejected request costs nothing. Requests
+        without a patient only count against the global limit.
+        """
+        if patient is None:
+            patient = current_patient.get()
+        with self._lock:
+            buckets = [(self._patient_bucket(patient), "patient_rate")] if patient is not None else []
+            buckets.append((self._global, "global_rate"))
+            for bucket, reason in buckets:
+                wait = bucket.wait_time()
+                if wait:
+                    break
+            else:
+                for bucket, _ in buckets:
+                    bucket.try_acquire()
+                return
+        self._reject(reason, wait)
+
+    @contextmanager
+    def slot(self):
+        """Hold one LLM concurrency slot for the duration of the block"""
+        with self._lock:
+            full = self._queued >= self.max_queue and self._in_flight >= self.max_concurrency
+            if not full:
+                self._queued += 1
+        if full:
+            self._reject("queue_full", self.queue_timeout)
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._queued -= 1
+            if acquired:
+                self._in_flight += 1
+        if not acquired:
+            self._reject("queue_timeout", self.queue_timeout)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def utilization(self) -> float:
+        """Admitted calls (running or waiting for a slot) per concurrency slot"""
+        with self._lock:
+            return (self._in_flight + self._queued) / self.max_concurrency
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "rejections": dict(self._rejections),
+            }
+
+llm_admission = AdmissionController()
@@ -0,0 +1,162 @@
+# triage_ai_assistant/agents/checkpoints.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Tables each LangGraph saver keeps per thread (= triage run id)
+CHECKPOINT_TABLES = {
+    "sqlite": ("writes", "checkpoints"),
+    "postgres": ("checkpoint_writes", "checkpoint_blobs", "checkpoints"),
+}
+
+RUNS_SCHEMA = """
+create table if not exists triage_runs (
+    run_id text primary key,
+    status text not null,
+    created_at double precision not null,
+    updated_at double precision not null
+)
+"""
+
+class TriageCheckpoints:
+    """Persistent LangGraph checkpointer for the triage workflow.
+
+    Every completed node is checkpointed under the triage run id, so a retry
+    with the same run id continues from the last completed nurse/doctor step
+    instead of starting over. A small `triage_runs` registry next to the
+    checkpoint tables records run age and status for garbage collection.
+    """
+
+    def __init__(self, backend: str, target: str):
+        self.backend = backend
+        self.target = target
+        self._saver = None
+        self._init_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"runs_started": 0, "runs_resumed": 0, "completed_replays": 0,
+                       "llm_calls_saved": 0, "gc_deleted": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend in CHECKPOINT_TABLES
+
+    @property
+    def saver(self):
+        if self._saver is None:
+            with self._init_lock:
+                if self._saver is None:
+                    self._saver = self._create_saver()
+        return self._saver
+
+    def _create_saver(self):
+        if self.backend == "postgres":
+            from psycopg import Connection
+            from psycopg.rows import dict_row
+            from langgraph.checkpoint.postgres import PostgresSaver
+
+            conn = Connection.connect(self.target, autocommit=True, prepare_threshold=0, row_factory=dict_row)
+            saver = PostgresSaver(conn)
+        else:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+
+            directory = os.path.dirname(self.target)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            saver = SqliteSaver(sqlite3.connect(self.target, check_same_thread=False))
+        saver.setup()
+        saver.conn.execute(RUNS_SCHEMA)
+        if self.backend == "sqlite":
+            saver.conn.commit()
+        return saver
+
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> List[Any]:
+        saver = self.saver
+        if self.backend == "postgres":
+            sql = sql.replace("?", "%s")
+        with saver.lock:
+            cur = saver.conn.execute(sql, params)
+            rows = cur.fetchall() if cur.description else []
+            if self.backend == "sqlite":
+                saver.conn.commit()
+        return [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in rows]
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def begin(self, run_id: str):
+        now = time.time()
+        self._execute(
+            "insert into triage_runs (run_id, status, created_at, updated_at) values (?, 'running', ?, ?) "
+            "on conflict (run_id) do update set status = 'running', updated_at = excluded.updated_at",
+            (run_id, now, now)
+        )
+        self._count("runs_started")
+
+    def record_resume(self, run_id: str, saved_llm_calls: int, finished: bool):
+        self._count("completed_replays" if finished else "runs_resumed")
+        self._count("llm_calls_saved", saved_llm_calls)
+        self._execute("update triage_runs set updated_at = ? where run_id = ?", (time.time(), run_id))
+        logger.info("Triage run %s resumed from checkpoint, saved %d LLM calls", run_id, saved_llm_calls)
+
+    def finish(self, run_id: str):
+        self._execute("update triage_runs set status = 'completed', updated_at = ? where run_id = ?",
+                      (time.time(), run_id))
+
+    def run_status(self, run_id: str) -> Optional[str]:
+        rows = self._execute("select status from triage_runs where run_id = ?", (run_id,))
+        return rows[0][0] if rows else None
+
+    def gc(self, completed_ttl: float, incomplete_ttl: float) -> int:
+        """Drop checkpoints of completed runs older than completed_ttl and abandoned ones older than incomplete_ttl"""
+        now = time.time()
+        expired = [row[0] for row in self._execute(
+            "select run_id from triage_runs where (status = 'completed' and updated_at < ?) or updated_at < ?",
+            (now - completed_ttl, now - incomplete_ttl)
+        )]
+        for run_id in expired:
+            for table in CHECKPOINT_TABLES[self.backend]:
+                self._execute(f"delete from {table} where thread_id = ?", (run_id,))
+            self._execute("delete from triage_runs where run_id = ?", (run_id,))
+        if expired:
+            self._count("gc_deleted", len(expired))
+            logger.info("Garbage-collected checkpoints of %d triage runs", len(expired))
+        return len(expired)
+
+    def start_gc(
+        self,
+        interval: float = float(os.getenv("TRIAGE_CHECKPOINT_GC_INTERVAL", "600")),
+        completed_ttl: float = float(os.getenv("TRIAGE_CHECKPOINT_COMPLETED_TTL", "3600")),
+        incomplete_ttl: float = float(os.getenv("TRIAGE_CHECKPOINT_TTL", "86400")),
+    ):
+        if not self.enabled:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.gc(completed_ttl, incomplete_ttl)
+                except Exception as e:
+                    logger.error("Triage checkpoint GC failed: %s", e)
+                time.sleep(interval)
+        threading.Thread(target=loop, name="triage-checkpoint-gc", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {"backend": self.backend if self.enabled else "off", **self._stats}
+
+# Opt-in: with it on, importing the triage agent opens (and creates) the checkpoint store
+TRIAGE_CHECKPOINTER = os.getenv("TRIAGE_CHECKPOINTER", "off").lower()
+
+triage_checkpoints = TriageCheckpoints(
+    TRIAGE_CHECKPOINTER,
+    os.getenv("TRIAGE_CHECKPOINT_URL", os.getenv("SUPABASE_DATABASE_URL", ""))
+    if TRIAGE_CHECKPOINTER == "postgres"
+    else os.getenv("TRIAGE_CHECKPOINT_PATH", ".data/triage_checkpoints.db")
+)
@@ -0,0 +1,156 @@
+# triage_ai_assistant/agents/context_window.py
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for Gemini-style tokenizers)"""
+    return max(1, len(text) // 4) if text else 0
+
+def _role_and_text(msg) -> Tuple[str, str]:
+    if isinstance(msg, tuple):
+        return msg[0], str(msg[1])
+    if isinstance(msg, HumanMessage):
+        return "user", str(msg.content)
+    if isinstance(msg, AIMessage):
+        return "assistant", str(msg.content)
+    if isinstance(msg, SystemMessage):
+        return "system", str(msg.content)
+    return getattr(msg, "type", "message"), str(getattr(msg, "content", msg))
+
+def message_tokens(msg) -> int:
+    role, text = _role_and_text(msg)
+    return estimate_tokens(text) + 4  # role and framing overhead
+
+def _fingerprint(messages: list) -> str:
+    h = hashlib.sha256()
+    for msg in messages:
+        role, text = _role_and_text(msg)
+        h.update(role.encode("utf-8"))
+        h.update(b"\0")
+        h.update(text.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class ContextWindowManager:
+    """Bound the prompt sent to the LLM on every conversational turn.
+
+    The last `keep_messages` messages are sent verbatim. Older messages are folded
+    into a running clinical summary; the summary is updated incrementally with
+    only the newly evicted messages, and cached per session so stateless callers
+    (the `/triage/chat` endpoint) don't recompute it every turn.
+
+    The summarizer is asked to stay under `summary_budget` tokens. A summary that
+    still comes back longer is condensed once more, then cut, so a long
+    conversation can't grow the summary past the prompt budget.
+    """
+
+    def __init__(
+        self,
+        summarizer: Callable[[str, List[Tuple[str, str]], int], str],
+        keep_messages: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        summary_budget: Optional[int] = None,
+        max_sessions: int = 1024,
+    ):
+        self.summarizer = summarizer
+        self.keep_messages = keep_messages or int(os.getenv("NURSEBOT_KEEP_MESSAGES", "6"))
+        self.token_budget = token_budget or int(os.getenv("NURSEBOT_TOKEN_BUDGET", "2000"))
+        self.summary_budget = summary_budget or int(os.getenv("NURSEBOT_SUMMARY_TOKENS", str(self.token_budget // 4)))
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Tuple[int, str, str]]" = OrderedDict()  # key -> (folded, fingerprint, summary)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "last_tokens": 0, "max_tokens": 0, "total_tokens": 0, "summaries": 0,
+                       "resummarized": 0, "summary_truncated": 0, "over_budget": 0}
+
+    def _cached(self, session_key: Optional[str], messages: list) -> Tuple[int, str]:
+        """Return (folded_count, summary) still valid for this history"""
+        if session_key is None:
+            return 0, ""
+        with self._lock:
+            entry = self._sessions.get(session_key)
+            if entry is None:
+                return 0, ""
+            self._sessions.move_to_end(session_key)
+        folded, fingerprint, summary = entry
+        if folded > len(messages) or _fingerprint(messages[:folded]) != fingerprint:
+            return 0, ""  # conversation was restarted or edited
+        return folded, summary
+
+    def _store(self, session_key: Optional[str], messages: list, folded: int, summary: str):
+        if session_key is None:
+            return
+        with self._lock:
+            self._sessions[session_key] = (folded, _fingerprint(messages[:folded]), summary)
+            self._sessions.move_to_end(session_key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def _fold(self, summary: str, evicted: list) -> str:
+        with self._lock:
+            self._stats["summaries"] += 1
+        summary = self.summarizer(summary, [_role_and_text(m) for m in evicted], self.summary_budget)
+        if estimate_tokens(summary) > self.summary_budget:
+            with self._lock:
+                self._stats["resummarized"] += 1
+            summary = self.summarizer(summary, [], self.summary_budget)
+        if estimate_tokens(summary) > self.summary_budget:
+            with self._lock:
+                self._stats["summary_truncated"] += 1
+            summary = summary[:self.summary_budget * 4].rsplit(" ", 1)[0] + " …"
+        return summary
+
+    def build(self, system, messages: list, session_key: Optional[str] = None,
+              summary: str = "", folded: int = 0) -> Tuple[list, str, int]:
+        """Build the prompt for one turn.
+
+        Returns (prompt_messages, summary, folded_count) so graph callers can keep
+        the summary in their own state instead of the session cache.
+        """
+        if not summary and not folded:
+            folded, summary = self._cached(session_key, messages)
+
+        fixed_tokens = message_tokens(system)
+        cut = max(folded, len(messages) - self.keep_messages)
+        # Evict more of the verbatim window while the prompt exceeds the budget
+        while cut < len(messages) - 1:
+            tail_tokens = sum(message_tokens(m) for m in messages[cut:])
+            summary_tokens = estimate_tokens(summary) + 4 if (summary or cut > folded) else 0
+            if fixed_tokens + summary_tokens + tail_tokens <= self.token_budget:
+                break
+            cut += 1
+
+        if cut > folded:
+            summary = self._fold(summary, messages[folded:cut])
+            folded = cut
+            self._store(session_key, messages, folded, summary)
+
+        prompt = [system]
+        if summary:
+            prompt.append(SystemMessage(content=f"Summary of the earlier conversation with this patient:\n{summary}"))
+        prompt.extend(messages[folded:])
+        self._record(sum(message_tokens(m) for m in prompt))
+        return prompt, summary, folded
+
+    def _record(self, tokens: int):
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["last_tokens"] = tokens
+            self._stats["total_tokens"] += tokens
+            self._stats["max_tokens"] = max(self._stats["max_tokens"], tokens)
+            if tokens > self.token_budget:
+                self._stats["over_budget"] += 1
+        logger.debug("NurseBot prompt: %d tokens (budget %d)", tokens, self.token_budget)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "token_budget": self.token_budget, "summary_budget": self.summary_budget,
+                    "sessions": len(self._sessions)}
@@ -0,0 +1,242 @@
+# triage_ai_assistant/agents/esi_classifier.py
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ESI_LEVELS = (1, 2, 3, 4, 5)
+# Marks results finalized by the classifier so retraining can leave them out
+CLASSIFIER_REASONING_PREFIX = "Local ESI classifier"
+# ESI levels that must never be missed: the classifier may not finalize a lower acuity while these are plausible
+HIGH_ACUITY_LEVELS = (1, 2)
+
+class Prediction(NamedTuple):
+    esi_level: int
+    confidence: float
+    high_acuity: float  # probability mass on HIGH_ACUITY_LEVELS
+
+def note_features(note: str, dim: int) -> List[int]:
+    """Hashed unigram and bigram feature indices (crc32, so stable across processes)"""
+    tokens = re.findall(r"[a-z0-9]+", (note or "").lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return [zlib.crc32(g.encode("utf-8")) % dim for g in grams]
+
+class ESIClassifier:
+    """Multinomial naive Bayes over hashed n-grams: a CPU-only, sub-millisecond first opinion on a note's ESI level.
+
+    `threshold` is the confidence above which the training run measured
+    hold-out precision at or above its target; below it the note goes to
+    the LLM workflow.
+    """
+
+    def __init__(self, log_prior: np.ndarray, feature_log_prob: np.ndarray, threshold: float, metadata: Dict):
+        self.log_prior = log_prior
+        self.feature_log_prob = feature_log_prob
+        self.dim = feature_log_prob.shape[1]
+        self.threshold = threshold
+        self.metadata = metadata
+
+    @property
+    def version(self) -> str:
+        return self.metadata.get("version", "unknown")
+
+    def probabilities(self, note: str) -> np.ndarray:
+        """Posterior over ESI_LEVELS"""
+        scores = self.log_prior.copy()
+        features = note_features(note, self.dim)
+        if features:
+            scores += self.feature_log_prob[:, features].sum(axis=1)
+        scores -= scores.max()
+        probs = np.exp(scores)
+        return probs / probs.sum()
+
+    def predict(self, note: str) -> Prediction:
+        probs = self.probabilities(note)
+        best = int(probs.argmax())
+        high_acuity = float(sum(probs[ESI_LEVELS.index(level)] for level in HIGH_ACUITY_LEVELS))
+        return Prediction(ESI_LEVELS[best], float(probs[best]), high_acuity)
+
+    @classmethod
+    def train(cls, notes: Sequence[str], labels: Sequence[int], dim: int = 1 << 17, alpha: float = 0.1,
+              metadata: Optional[Dict] = None) -> "ESIClassifier":
+        counts = np.zeros((len(ESI_LEVELS), dim), dtype=np.float64)
+        class_counts = np.zeros(len(ESI_LEVELS), dtype=np.float64)
+        for note, label in zip(notes, labels):
+            row = ESI_LEVELS.index(label)
+            class_counts[row] += 1
+            np.add.at(counts[row], note_features(note, dim), 1)
+        smoothed = counts + alpha
+        feature_log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).astype(np.float32)
+        log_prior = np.log((class_counts + 1) / (class_counts.sum() + len(ESI_LEVELS))).astype(np.float32)
+        return cls(log_prior, feature_log_prob, threshold=math.inf, metadata=dict(metadata or {}))
+
+    def save(self, directory: str) -> str:
+        """Write `esi_classifier-<version>.npz` plus its metadata and point LATEST at it"""
+        os.makedirs(directory, exist_ok=True)
+        name = f"esi_classifier-{self.version}"
+        path = os.path.join(directory, f"{name}.npz")
+        np.savez_compressed(path, log_prior=self.log_prior, feature_log_prob=self.feature_log_prob,
+                            threshold=np.array(self.threshold))
+        with open(os.path.join(directory, f"{name}.json"), "w") as f:
+            # JSON has no infinity: "no cut-off reached the target precision" is written as null
+            json.dump({**self.metadata, "threshold": None if math.isinf(self.threshold) else self.threshold},
+                      f, indent=2, allow_nan=False)
+        tmp = os.path.join(directory, "LATEST.tmp")
+        with open(tmp, "w") as f:
+            f.write(f"{name}.npz\n")
+        os.replace(tmp, os.path.join(directory, "LATEST"))
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "ESIClassifier":
+        """Load an artifact file, or the LATEST one when given its directory"""
+        if os.path.isdir(path):
+            with open(os.path.join(path, "LATEST")) as f:
+                path = os.path.join(path, f.read().strip())
+        with np.load(path) as data:
+            log_prior = data["log_prior"]
+            feature_log_prob = data["feature_log_prob"]
+            threshold = float(data["threshold"])
+        metadata_path = path[:-len(".npz")] + ".json"
+        metadata = {}
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            if "threshold" in metadata and metadata["threshold"] is None:
+                metadata["threshold"] = math.inf
+        return cls(log_prior, feature_log_prob, threshold, metadata)
+
+def choose_threshold(confidences: Iterable[float], correct: Iterable[bool], target_precision: float,
+                     min_accepted: int = 20) -> float:
+    """Lowest confidence cut-off whose accepted hold-out cases reach target_precision (inf if none does)"""
+    pairs = sorted(zip(confidences, correct), reverse=True)
+    best = math.inf
+    hits = 0
+    for accepted, (confidence, ok) in enumerate(pairs, start=1):
+        hits += ok
+        if accepted >= min_accepted and hits / accepted >= target_precision:
+            best = confidence
+    return best
+
+class TriageCascade:
+    """Tiered triage: the local classifier finalizes confident notes, the LLM workflow gets the rest.
+
+    Modes: `off`; `shadow` (classify every note, always run the LLM, and track
+    how often the classifier would have agreed); `on` (skip the LLM when the
+    classifier's confidence clears the artifact's threshold).
+
+    Undertriage costs far more than overtriage, so an ESI 3-5 prediction is
+    never finalized while ESI 1-2 together hold at least `max_high_acuity`
+    of the probability, however confident the top class is.
+    """
+
+    def __init__(self, mode: str, model_path: str, threshold: Optional[float] = None,
+                 max_high_acuity: float = 0.05):
+        self.mode = mode
+        self.model_path = model_path
+        self.threshold_override = threshold
+        self.max_high_acuity = max_high_acuity
+        self._model: Optional[ESIClassifier] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats = {"classified": 0, "finalized": 0, "escalated": 0, "guarded": 0, "predict_us_total": 0.0,
+                       "shadow_compared": 0, "shadow_agreed": 0, "shadow_confident": 0, "shadow_confident_agreed": 0,
+                       "shadow_undertriaged": 0, "shadow_high_acuity_missed": 0}
+
+    @property
+    def model(self) -> Optional[ESIClassifier]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._model = ESIClassifier.load(self.model_path)
+                        logger.info("Loaded ESI classifier %s", self._model.version)
+                    except (OSError, KeyError, ValueError) as e:
+                        logger.warning("ESI classifier unavailable (%s); every note goes to the LLM", e)
+                    self._loaded = True
+        return self._model
+
+    @property
+    def threshold(self) -> float:
+        if self.threshold_override is not None:
+            return self.threshold_override
+        return self.model.threshold if self.model is not None else math.inf
+
+    def classify(self, note: str) -> Optional[Prediction]:
+        if self.mode not in ("shadow", "on") or self.model is None:
+            return None
+        started = time.perf_counter()
+        prediction = self.model.predict(note)
+        with self._lock:
+            self._stats["classified"] += 1
+            self._stats["predict_us_total"] += (time.perf_counter() - started) * 1e6
+        return prediction
+
+    def _guarded(self, prediction: Prediction) -> bool:
+        """A low-acuity call while a high-acuity one is still plausible"""
+        return prediction.esi_level not in HIGH_ACUITY_LEVELS and prediction.high_acuity >= self.max_high_acuity
+
+    def _would_finalize(self, prediction: Prediction) -> bool:
+        return prediction.confidence >= self.threshold and not self._guarded(prediction)
+
+    def finalize(self, prediction: Optional[Prediction]) -> bool:
+        """Whether this prediction is confident enough to skip the LLM"""
+        if self.mode != "on" or prediction is None:
+            return False
+        confident = self._would_finalize(prediction)
+        with self._lock:
+            self._stats["finalized" if confident else "escalated"] += 1
+            self._stats["guarded"] += prediction.confidence >= self.threshold and not confident
+        return confident
+
+    def record_shadow(self, prediction: Optional[Prediction], llm_esi_level):
+        if self.mode != "shadow" or prediction is None or not isinstance(llm_esi_level, int):
+            return
+        esi_level, confidence = prediction.esi_level, prediction.confidence
+        agreed = esi_level == llm_esi_level
+        confident = self._would_finalize(prediction)
+        # Higher ESI number = lower acuity than the LLM assigned
+        undertriaged = confident and esi_level > llm_esi_level
+        with self._lock:
+            self._stats["shadow_compared"] += 1
+            self._stats["shadow_agreed"] += agreed
+            self._stats["shadow_confident"] += confident
+            self._stats["shadow_confident_agreed"] += confident and agreed
+            self._stats["shadow_undertriaged"] += undertriaged
+            self._stats["shadow_high_acuity_missed"] += undertriaged and llm_esi_level in HIGH_ACUITY_LEVELS
+        logger.info("ESI classifier shadow: predicted %d (confidence %.3f), LLM %d, %s",
+                    esi_level, confidence, llm_esi_level, "agree" if agreed else "disagree")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        classified = stats.pop("predict_us_total")
+        stats["avg_predict_us"] = round(classified / stats["classified"], 1) if stats["classified"] else None
+        compared = stats["shadow_compared"]
+        confident = stats["shadow_confident"]
+        stats["shadow_agreement"] = round(stats["shadow_agreed"] / compared, 4) if compared else None
+        # What `on` mode would have done: share of notes finalized locally and how often that matched the LLM
+        stats["shadow_would_finalize"] = round(confident / compared, 4) if compared else None
+        stats["shadow_confident_agreement"] = round(stats["shadow_confident_agreed"] / confident, 4) if confident else None
+        # Share of notes `on` mode would have finalized at a lower acuity than the LLM
+        stats["shadow_undertriage_rate"] = round(stats["shadow_undertriaged"] / confident, 4) if confident else None
+        model = self._model
+        return {"mode": self.mode, "model_version": model.version if model else None,
+                "threshold": self.threshold if model and not math.isinf(self.threshold) else None, **stats}
+
+triage_cascade = TriageCascade(
+    os.getenv("TRIAGE_CASCADE_MODE", "off").lower(),
+    os.getenv("ESI_CLASSIFIER_PATH", "models/esi_classifier"),
+    float(os.environ["TRIAGE_CASCADE_THRESHOLD"]) if os.getenv("TRIAGE_CASCADE_THRESHOLD") else None,
+    float(os.getenv("TRIAGE_CASCADE_MAX_HIGH_ACUITY", "0.05")),
+)
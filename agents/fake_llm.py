@@ -0,0 +1,102 @@
+# triage_ai_assistant/agents/fake_llm.py
+
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+def use_fake_llm() -> bool:
+    """LLM_PROVIDER=fake swaps Gemini for FakeTriageLLM (local runs, load and resilience tests)"""
+    return os.getenv("LLM_PROVIDER", "gemini").lower() == "fake"
+
+# Keyword rules the fake nurse/doctor use to pick an ESI level
+_ESI_RULES = [
+    (1, r"unresponsive|not breathing|cardiac arrest|no pulse"),
+    (2, r"chest pain|stroke|shortness of breath|suicidal|severe bleeding"),
+    (4, r"sprain|laceration|earache|sore throat|rash"),
+    (5, r"refill|prescription|paperwork|follow[- ]up"),
+]
+
+def _fake_esi(note: str) -> int:
+    lowered = note.lower()
+    for level, pattern in _ESI_RULES:
+        if re.search(pattern, lowered):
+            return level
+    return 3
+
+class FakeTriageLLM(BaseChatModel):
+    """Deterministic stand-in for Gemini that understands this repo's prompts.
+
+    Latency is `latency_ms` plus uniform `jitter_ms`; `failure_rate` raises a (retryable) ConnectionError on
+    a fraction of calls. Defaults come from FAKE_LLM_LATENCY_MS,
+    FAKE_LLM_JITTER_MS, FAKE_LLM_FAILURE_RATE and FAKE_LLM_CHAT_TURNS.
+    FAKE_LLM_PREFILL_MS_PER_1K adds latency per 1k input tokens not served
+    from a cached prompt prefix.
+    """
+
+    latency_ms: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+    jitter_ms: float = float(os.getenv("FAKE_LLM_JITTER_MS", "50"))
+    failure_rate: float = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+    chat_turns: int = int(os.getenv("FAKE_LLM_CHAT_TURNS", "3"))
+    prefill_ms_per_1k: float = float(os.getenv("FAKE_LLM_PREFILL_MS_PER_1K", "0"))  # charged on uncached input only
+    model: str = "fake-triage"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-triage"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[getattr(t, "name", str(t)) for t in tools], **kwargs)
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[list], prefix: str = "") -> AIMessage:
+        text = "\n".join([prefix] + [str(m.content) for m in messages])
+        if "triage nurse" in text and "Patient Note:" in text:
+            note = text.split("Patient Note:", 1)[1].split("\n", 1)[0]
+            esi = _fake_esi(note)
+            return AIMessage(content=f"Assessment:\nESI Level: {esi}\nReasoning: Symptoms consistent with ESI {esi}.\nConfidence: High")
+        if "ER physician" in text and "Patient Note:" in text:
+            note = text.split("Patient Note:", 1)[1].split("\n", 1)[0]
+            esi = _fake_esi(note)
+            return AIMessage(content=f"Assessment:\n- Agreement: Yes\n- Suggested ESI Level: {esi}\n- Reasoning: Concur with triage.\n- Comment: Clear.")
+        if "running clinical summary" in text:
+            return AIMessage(content="Patient reported: " + " ".join(
+                line for line in text.splitlines() if line.startswith("user:"))[:500])
+        patient_turns = [str(m.content) for m in messages if isinstance(m, HumanMessage)]
+        if tools and "take_note" in tools and len(patient_turns) >= self.chat_turns:
+            return AIMessage(content="", tool_calls=[{
+                "name": "take_note",
+                "args": {"text": "; ".join(patient_turns)},
+                "id": f"call_{uuid.uuid4().hex[:8]}",
+            }])
+        return AIMessage(content="Thank you. Can you tell me more about when this started and how severe it is?")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, tools: Optional[list] = None,
+                  cached_content: Optional[str] = None, **kwargs: Any) -> ChatResult:
+        prefix = ""
+        if cached_content:
+            # Mirrors Gemini context caching: the prefix (and its tools) come from the cache
+            from agents.prompt_cache import prompt_prefix_cache
+            prefix, cached_tools = prompt_prefix_cache.lookup(cached_content)
+            tools = tools or cached_tools
+        cached_tokens = len(prefix) // 4
+        uncached_tokens = sum(len(str(m.content)) for m in messages) // 4
+        latency_ms = self.latency_ms + random.uniform(0, self.jitter_ms) + uncached_tokens / 1000 * self.prefill_ms_per_1k
+        time.sleep(max(0.0, latency_ms) / 1000)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("Injected fake LLM failure")
+        message = self._respond(messages, tools, prefix)
+        prompt_tokens = cached_tokens + uncached_tokens
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": len(str(message.content)) // 4,
+            "total_tokens": prompt_tokens + len(str(message.content)) // 4,
+            "input_token_details": {"cache_read": cached_tokens},
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,178 @@
+# triage_ai_assistant/agents/model_router.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from agents.fake_llm import FakeTriageLLM, use_fake_llm
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Everything needed to build and price one LLM configuration (hashable, so chains are cached per spec)"""
+    model: str
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None  # per-call deadline; None uses LLM_TIMEOUT
+    input_per_1m: float = 0.0  # USD per 1M uncached input tokens
+    cached_input_per_1m: float = 0.0
+    output_per_1m: float = 0.0
+
+    def cost(self, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+        return ((input_tokens - cached_tokens) * self.input_per_1m + cached_tokens * self.cached_input_per_1m
+                + output_tokens * self.output_per_1m) / 1e6
+
+@dataclass(frozen=True)
+class RouteChoice:
+    node: str
+    route: str  # most specific config key that matched, e.g. "nurse" or "nurse@2"
+    spec: ModelSpec
+    variants: Tuple[Tuple[str, str], ...] = ()  # (experiment, arm) for experiments covering this node
+
+    @property
+    def label(self) -> str:
+        """Accounting key: route, model and any experiment arms"""
+        arms = "".join(f"[{exp}={variant}]" for exp, variant in self.variants)
+        return f"{self.route}:{self.spec.model}{arms}"
+
+# Paid-tier list prices (USD per 1M tokens); override or extend under "prices" in the config
+DEFAULT_PRICES = {
+    "gemini-2.0-flash": {"input_per_1m": 0.10, "cached_input_per_1m": 0.025, "output_per_1m": 0.40},
+    "gemini-2.0-flash-lite": {"input_per_1m": 0.075, "cached_input_per_1m": 0.01875, "output_per_1m": 0.30},
+}
+
+SPEC_FIELDS = ("model", "temperature", "max_tokens", "timeout")
+
+class ModelRouter:
+    """Config-driven choice of model settings per graph node, loop iteration and A/B arm.
+
+    Config (JSON):
+
+        {"default": {"model": "gemini-2.0-flash"},
+         "routes": {"nurse": {"model": "gemini-2.0-flash-lite", "max_tokens": 512},
+                    "nurse@2": {"model": "gemini-2.0-flash"},
+                    "doctor": {"temperature": 0.2, "timeout": 20}},
+         "experiments": {"doctor-lite": {"variants": {
+             "control": {"weight": 80},
+             "lite": {"weight": 20, "routes": {"doctor": {"model": "gemini-2.0-flash-lite"}}}}}},
+         "prices": {"gemini-2.0-flash": {"input_per_1m": 0.1, "output_per_1m": 0.4}}}
+
+    Settings layer default < routes[node] < routes["node@k"] (the largest k
+    not above the current iteration, so "@k" applies from iteration k on),
+    then each experiment arm's routes in the same order. Arms are assigned
+    by hashing the experiment name with a unit key (the note for triage,
+    the patient for NurseBot), so a case stays in one arm across its calls.
+    """
+
+    def __init__(self, config: Dict[str, Any], source: str = "built-in"):
+        self.source = source
+        self.default = dict(config.get("default") or {})
+        self.default.setdefault("model", "gemini-2.0-flash")
+        self.routes: Dict[str, Dict[str, Any]] = config.get("routes") or {}
+        self.experiments: Dict[str, Dict[str, Any]] = config.get("experiments") or {}
+        self.prices = {**DEFAULT_PRICES, **(config.get("prices") or {})}
+        for name, experiment in self.experiments.items():
+            if not experiment.get("variants") or sum(v.get("weight", 0) for v in experiment["variants"].values()) <= 0:
+                raise ValueError(f"Experiment '{name}' needs variants with positive total weight")
+        self._lock = threading.Lock()
+        self._assignments: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """LLM_ROUTING_CONFIG is a JSON file path; without it every node uses LLM_MODEL (default gemini-2.0-flash)"""
+        path = os.getenv("LLM_ROUTING_CONFIG")
+        if not path:
+            return cls({"default": {"model": os.getenv("LLM_MODEL", "gemini-2.0-flash")}})
+        with open(path) as f:
+            config = json.load(f)
+        logger.info("Loaded LLM routing config from %s", path)
+        return cls(config, source=path)
+
+    def _overlay(self, settings: Dict[str, Any], routes: Dict[str, Dict[str, Any]], node: str,
+                 iteration: Optional[int]) -> Optional[str]:
+        matched = None
+        if node in routes:
+            settings.update(routes[node])
+            matched = node
+        staged = []
+        for key in routes:
+            base, _, start = key.partition("@")
+            if base == node and start.isdigit() and iteration is not None and int(start) <= iteration:
+                staged.append((int(start), key))
+        if staged:
+            key = max(staged)[1]
+            settings.update(routes[key])
+            matched = key
+        return matched
+
+    @staticmethod
+    def _covers(experiment: Dict[str, Any], node: str) -> bool:
+        """Whether any arm of the experiment changes settings for this node"""
+        return any(key.partition("@")[0] == node
+                   for variant in experiment["variants"].values() for key in variant.get("routes") or {})
+
+    def _variant(self, name: str, experiment: Dict[str, Any], unit: str) -> str:
+        variants = experiment["variants"]
+        total = sum(v.get("weight", 0) for v in variants.values())
+        point = int(hashlib.sha256(f"{name}:{unit}".encode("utf-8")).hexdigest()[:8], 16) % total
+        for variant, settings in variants.items():
+            point -= settings.get("weight", 0)
+            if point < 0:
+                return variant
+        return next(iter(variants))
+
+    def select(self, node: str, iteration: Optional[int] = None, unit: Optional[str] = None) -> RouteChoice:
+        settings = dict(self.default)
+        route = self._overlay(settings, self.routes, node, iteration) or node
+        unit = unit or uuid.uuid4().hex
+        arms = []
+        for name, experiment in self.experiments.items():
+            if not self._covers(experiment, node):
+                continue
+            variant = self._variant(name, experiment, unit)
+            self._overlay(settings, experiment["variants"][variant].get("routes") or {}, node, iteration)
+            # Tagged in every arm, control included, so arms can be compared side by side
+            arms.append((name, variant))
+            with self._lock:
+                counts = self._assignments.setdefault(name, {})
+                counts[variant] = counts.get(variant, 0) + 1
+        return RouteChoice(node, route, self._spec(settings), tuple(arms))
+
+    def _spec(self, settings: Dict[str, Any]) -> ModelSpec:
+        prices = self.prices.get(settings["model"], {})
+        return ModelSpec(**{k: settings.get(k) for k in SPEC_FIELDS},
+                         **{k: float(v) for k, v in prices.items() if k in ("input_per_1m", "cached_input_per_1m", "output_per_1m")})
+
+    @property
+    def default_spec(self) -> ModelSpec:
+        return self._spec(self.default)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            assignments = {name: dict(counts) for name, counts in self._assignments.items()}
+        return {"config": self.source, "default_model": self.default["model"], "routes": sorted(self.routes),
+                "experiment_selections": assignments}
+
+def build_llm(spec: ModelSpec):
+    """LLM client for one spec; the fake LLM keeps the spec's model name so accounting still separates routes"""
+    if use_fake_llm():
+        return FakeTriageLLM(model=spec.model)
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+    options = {"temperature": spec.temperature, "max_output_tokens": spec.max_tokens, "timeout": spec.timeout}
+    return ChatGoogleGenerativeAI(
+        model=spec.model,
+        google_api_key=api_key,
+        **{k: v for k, v in options.items() if v is not None}
+    )
+
+model_router = ModelRouter.from_env()
@@ -1,22 +1,22 @@
 # triage_ai_assistant/agents/nursebot.py
-from typing import Annotated
+import operator
+from typing import Annotated, Optional, Protocol
 from typing_extensions import TypedDict
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import HumanMessage
 from langchain_core.messages.ai import AIMessage
 from langchain_core.tools import tool
-import os
-
-def get_llm():
-    """Get LLM instance with API key loaded from environment"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables")
-    return ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        google_api_key=api_key
-    )
+from agents.context_window import ContextWindowManager
+from agents.resilience import guarded_invoke
+from agents.prompt_cache import PrefixCachedChain
+from agents.admission import current_patient
+from agents.model_router import ModelSpec, build_llm, model_router
+
+def get_llm(spec: Optional[ModelSpec] = None):
+    """Get LLM instance for a routed model spec (default: the router's default model)"""
+    return build_llm(spec or model_router.default_spec)
 
 # Tool for note-taking
 @tool
@@ -32,8 +32,10 @@ def get_llm_with_tools():
 
 class SymptomState(TypedDict):
     messages: Annotated[list, add_messages]  # Stores conversation history
-    notes: list[str]  # Collected notes from patient
+    notes: Annotated[list[str], operator.add]  # Collected notes from patient
     finished: bool
+    summary: str  # Running clinical summary of messages no longer sent verbatim
+    summarized: int  # Number of leading messages folded into summary
 
 NURSEBOT_SYSINT = (
     "system",
@@ -43,30 +45,83 @@ NURSEBOT_SYSINT = (
     "Once done, don't forget to record symptoms by calling take_note('symptom description'). \n\n"
 )
 
+SUMMARY_SYSINT = (
+    "You maintain a running clinical summary of a conversation between a triage nurse assistant and a patient. "
+    "Update the existing summary with the new messages. Keep every symptom, onset, duration, severity, "
+    "relevant history and medication the patient mentioned, and note which questions were already asked. "
+    "Be concise and factual. Return only the updated summary."
+)
+
+# Built once; the static instructions (and take_note) form a cacheable prompt prefix
+chat_chain = PrefixCachedChain("chat", NURSEBOT_SYSINT[1], get_llm, tools=[take_note])
+summary_chain = PrefixCachedChain(
+    "summary", SUMMARY_SYSINT, get_llm,
+    human_template="Existing summary:\n{summary}\n\nNew messages:\n{transcript}\n\n"
+                   "Keep the updated summary under {max_words} words."
+)
+
+def summarize_turns(summary: str, turns: list[tuple[str, str]], max_tokens: int) -> str:
+    """Fold newly evicted turns into the running summary, condensed to about max_tokens"""
+    transcript = "\n".join(f"{role}: {text}" for role, text in turns) or "(none; condense the existing summary)"
+    # ~0.75 words per token
+    inputs = {"summary": summary or "(none)", "transcript": transcript, "max_words": max(20, max_tokens * 3 // 4)}
+    choice = model_router.select("summary", unit=current_patient.get())
+    response = guarded_invoke(lambda: summary_chain.invoke(inputs, choice), route=choice.label, timeout=choice.spec.timeout)
+    return response.content
+
+# Keeps per-call prompt size bounded as conversations grow
+context_window = ContextWindowManager(summarize_turns)
+
+def route_chat_turn(messages: list):
+    """Chat turns are iterations numbered from 1 (the reply to the opening message); the patient is the A/B unit"""
+    patient_turns = sum(1 for m in messages if isinstance(m, HumanMessage))
+    return model_router.select("chat", iteration=patient_turns + 1, unit=current_patient.get())
+
 WELCOME_MSG = "Welcome to the MedMacs Hospital. Type `q` to quit. How may I help you today?"
 
-def human_node(state: SymptomState) -> SymptomState:
-    last_message = state["messages"][-1]
-    print(f"Assistant: {last_message.content}")
-    user_input = input("User: ").strip()
+class ChatIO(Protocol):
+    """Where the graph sends assistant messages and reads patient replies"""
 
-    if user_input.lower() in {"q", "quit", "exit", "thank you"}:
-        return {**state, "finished": True}
+    def send(self, text: str) -> None: ...
 
-    return {
-        **state,
-        "messages": state["messages"] + [("user", user_input)]
-    }
+    def receive(self) -> Optional[str]:
+        """Next patient reply, or None when the patient has left"""
+        ...
+
+class ConsoleIO:
+    def send(self, text: str) -> None:
+        print(f"Assistant: {text}")
+
+    def receive(self) -> Optional[str]:
+        return input("User: ")
+
+QUIT_WORDS = {"q", "quit", "exit", "thank you"}
 
-def chatbot_node(state: SymptomState) -> SymptomState:
-    llm_with_tools = get_llm_with_tools()  # Get LLM instance here
-    
+# Nodes return only what changed; the reducers on SymptomState append messages and notes
+def human_node(state: SymptomState, config: RunnableConfig) -> dict:
+    io = config.get("configurable", {}).get("io") or ConsoleIO()
+    io.send(state["messages"][-1].content)
+    user_input = io.receive()
+
+    if user_input is None or user_input.strip().lower() in QUIT_WORDS:
+        return {"finished": True}
+
+    return {"messages": [("user", user_input.strip())]}
+
+def chatbot_node(state: SymptomState) -> dict:
+    summary = state.get("summary", "")
+    summarized = state.get("summarized", 0)
     if state["messages"]:
-        response = llm_with_tools.invoke([NURSEBOT_SYSINT] + state["messages"])
+        prompt, summary, summarized = context_window.build(
+            NURSEBOT_SYSINT, state["messages"], summary=summary, folded=summarized
+        )
+        choice = route_chat_turn(state["messages"])
+        response = guarded_invoke(lambda: chat_chain.invoke_messages(prompt[1:], choice),
+                                  route=choice.label, timeout=choice.spec.timeout)
     else:
         response = AIMessage(content=WELCOME_MSG)
 
-    new_notes = state.get("notes", [])
+    new_notes = []
     finished = state.get("finished", False)
 
     if hasattr(response, "tool_calls") and response.tool_calls:
@@ -77,16 +132,17 @@ def chatbot_node(state: SymptomState) -> SymptomState:
             
 
     return {
-        **state,
-        "messages": state["messages"] + [response],
+        "messages": [response],
         "notes": new_notes,
-        "finished": finished
+        "finished": finished,
+        "summary": summary,
+        "summarized": summarized
     }
 
 def handle_chat(messages: list[str]) -> str:
-    llm_with_tools = get_llm_with_tools()  # Get LLM instance here
-    history = [("system", NURSEBOT_SYSINT)] + [("user", msg) for msg in messages]
-    response = llm_with_tools.invoke(history)
+    history = [HumanMessage(content=msg) for msg in messages]
+    choice = route_chat_turn(history)
+    response = guarded_invoke(lambda: chat_chain.invoke_messages(history, choice), route=choice.label, timeout=choice.spec.timeout)
     return response.content
 
 # Export llm_with_tools as a function for backward compatibility
@@ -106,8 +162,12 @@ graph_builder.add_conditional_edges("chatbot", maybe_exit_chatbot_node)
 
 chat_with_human_graph = graph_builder.compile()
 
-def run_chat(config = {"recursion_limit": 100}):
-    state = chat_with_human_graph.invoke({"messages": [], "notes": [], "finished": False}, config)
+def run_chat(io: Optional[ChatIO] = None, recursion_limit: int = 100):
+    """Run one intake conversation; console I/O unless another adapter is given"""
+    config = {"recursion_limit": recursion_limit, "configurable": {"io": io or ConsoleIO()}}
+    state = chat_with_human_graph.invoke(
+        {"messages": [], "notes": [], "finished": False, "summary": "", "summarized": 0}, config
+    )
     return state
 
 if __name__ == "__main__":
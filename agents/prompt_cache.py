@@ -0,0 +1,265 @@
+# triage_ai_assistant/agents/prompt_cache.py
+
+import abc
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from agents.context_window import estimate_tokens
+from agents.fake_llm import use_fake_llm
+from agents.model_router import ModelSpec, RouteChoice, model_router
+from agents.resilience import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+class PrefixCache(abc.ABC):
+    """Provider-side cache of a static prompt prefix (system instructions plus tool declarations).
+
+    `resolve` returns the name of a cached-content resource holding the prefix,
+    creating or re-creating it when missing or about to expire, or None when
+    caching is off, the prefix is below the provider's minimum size, it has
+    tool declarations a provider can't cache (`caches_tools`), or the
+    provider rejected it (retried after `retry_after` seconds).
+    """
+
+    caches_tools = True
+
+    def __init__(self, enabled: bool, min_tokens: int, ttl: float, retry_after: float = 300.0):
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "hits": 0, "below_min_tokens": 0, "tools_not_cached": 0, "errors": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def resolve(self, model: str, system_text: str, tools: Sequence[Any] = ()) -> Optional[str]:
+        if not self.enabled:
+            return None
+        if estimate_tokens(system_text) < self.min_tokens:
+            self._count("below_min_tokens")
+            return None
+        if tools and not self.caches_tools:
+            self._count("tools_not_cached")
+            return None
+        tool_names = ",".join(getattr(t, "name", str(t)) for t in tools)
+        key = hashlib.sha256(f"{model}\0{tool_names}\0{system_text}".encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            name, valid_until = self._entries.get(key, (None, 0.0))
+            if valid_until > now:
+                if name is not None:
+                    self._stats["hits"] += 1
+                return name
+        try:
+            name = self._create(model, system_text, tools)
+        except Exception as e:
+            logger.warning("Prompt prefix caching failed for %s, sending the full prompt: %s", model, e)
+            self._count("errors")
+            with self._lock:
+                self._entries[key] = (None, now + self.retry_after)
+            return None
+        with self._lock:
+            # Stop using the resource a minute before the provider expires it
+            self._entries[key] = (name, now + max(self.ttl - 60, self.ttl / 2))
+            self._stats["created"] += 1
+        logger.info("Cached %d-token prompt prefix for %s as %s", estimate_tokens(system_text), model, name)
+        return name
+
+    @abc.abstractmethod
+    def _create(self, model: str, system_text: str, tools: Sequence[Any]) -> str:
+        """Create the provider resource for this prefix and return its name"""
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.enabled, "min_tokens": self.min_tokens, **self._stats,
+                    "entries": sum(1 for name, _ in self._entries.values() if name)}
+
+class GeminiPrefixCache(PrefixCache):
+    """Gemini explicit context caching (cachedContents), for system instructions only.
+
+    Tool declarations would have to live in the cache too, and
+    langchain-google-genai has no public way to convert them, so prompts
+    with tools are sent in full.
+    """
+
+    caches_tools = False
+
+    def _create(self, model: str, system_text: str, tools: Sequence[Any]) -> str:
+        from google.ai.generativelanguage_v1beta import CacheServiceClient, CachedContent, Content, Part
+
+        client = CacheServiceClient(client_options={"api_key": os.getenv("GOOGLE_API_KEY")})
+        cached = client.create_cached_content(cached_content=CachedContent(
+            model=model if model.startswith("models/") else f"models/{model}",
+            system_instruction=Content(parts=[Part(text=system_text)]),
+            ttl=timedelta(seconds=int(self.ttl)),
+        ))
+        return cached.name
+
+class FakePrefixCache(PrefixCache):
+    """In-process stand-in used with the fake LLM, which reads prefixes back via `lookup`"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._contents: Dict[str, Tuple[str, List[str]]] = {}
+
+    def _create(self, model: str, system_text: str, tools: Sequence[Any]) -> str:
+        name = f"cachedContents/fake-{hashlib.sha256(system_text.encode('utf-8')).hexdigest()[:16]}"
+        self._contents[name] = (system_text, [getattr(t, "name", str(t)) for t in tools])
+        return name
+
+    def lookup(self, name: str) -> Tuple[str, List[str]]:
+        return self._contents[name]
+
+class NodeUsage:
+    """Per-route LLM call accounting: tokens (cached vs. not), cost, and latency with and without a cached prefix.
+
+    Routes are RouteChoice labels, so each node/iteration route, model and
+    A/B arm is reported separately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+
+    def record(self, route: str, response: Any, latency: float, cached: bool, spec: Optional[ModelSpec] = None):
+        usage = getattr(response, "usage_metadata", None) or {}
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        cost = spec.cost(input_tokens, cached_tokens, output_tokens) if spec is not None else 0.0
+        with self._lock:
+            r = self._routes.setdefault(route, {
+                "calls": 0, "cached_calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0,
+                "cost_usd": 0.0, "latency_s": 0.0, "cached_latency_s": 0.0,
+            })
+            tracker = self._latency.setdefault(route, LatencyTracker(window=500))
+            r["calls"] += 1
+            r["input_tokens"] += input_tokens
+            r["output_tokens"] += output_tokens
+            r["cached_tokens"] += cached_tokens
+            r["cost_usd"] += cost
+            if cached:
+                r["cached_calls"] += 1
+                r["cached_latency_s"] += latency
+            else:
+                r["latency_s"] += latency
+        tracker.record(latency)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            routes = {route: dict(r) for route, r in self._routes.items()}
+            trackers = dict(self._latency)
+        report = {}
+        for route, r in routes.items():
+            p50 = trackers[route].percentile(50, min_samples=1)
+            p95 = trackers[route].percentile(95, min_samples=1)
+            uncached_calls = r["calls"] - r["cached_calls"]
+            avg_uncached = r["latency_s"] / uncached_calls if uncached_calls else None
+            avg_cached = r["cached_latency_s"] / r["cached_calls"] if r["cached_calls"] else None
+            report[route] = {
+                "calls": r["calls"],
+                "cached_calls": r["cached_calls"],
+                "input_tokens": r["input_tokens"],
+                "cached_tokens": r["cached_tokens"],
+                "output_tokens": r["output_tokens"],
+                "cached_token_ratio": round(r["cached_tokens"] / r["input_tokens"], 4) if r["input_tokens"] else 0.0,
+                "cost_usd": round(r["cost_usd"], 6),
+                "cost_usd_per_call": round(r["cost_usd"] / r["calls"], 8),
+                "p50_latency_ms": round(1000 * p50, 1),
+                "p95_latency_ms": round(1000 * p95, 1),
+                "avg_latency_ms": round(1000 * avg_uncached, 1) if avg_uncached is not None else None,
+                "avg_cached_latency_ms": round(1000 * avg_cached, 1) if avg_cached is not None else None,
+                "latency_saved_ms_per_call": round(1000 * (avg_uncached - avg_cached), 1)
+                if avg_uncached is not None and avg_cached is not None else None,
+            }
+        return report
+
+class PrefixCachedChain:
+    """A prompt | llm chain built once per model spec, whose static system prefix is served from the provider cache when possible.
+
+    With `human_template`, `invoke` takes template variables; without it,
+    `invoke_messages` takes the conversation that follows the static system
+    message. When a cached prefix is in use the request carries only the
+    variable part (and no tool declarations, which live in the cache).
+    Both take the RouteChoice the model router picked for the call
+    (default: the router's settings for this chain's route).
+    """
+
+    def __init__(self, route: str, system_text: str, llm_factory: Callable[[ModelSpec], Any],
+                 human_template: Optional[str] = None, tools: Sequence[Any] = ()):
+        self.route = route
+        self.system_text = system_text
+        self.llm_factory = llm_factory
+        self.tools = list(tools)
+        self.system_message = SystemMessage(content=system_text)
+        self.full_prompt = ChatPromptTemplate.from_messages(
+            [("system", system_text), ("human", human_template)]) if human_template else None
+        self.case_prompt = ChatPromptTemplate.from_messages([("human", human_template)]) if human_template else None
+        self._built: Dict[ModelSpec, Tuple[Any, Any]] = {}  # spec -> (llm, full chain)
+        self._cached_chains: Dict[ModelSpec, Tuple[str, Any]] = {}  # spec -> (cache name, cached chain)
+        self._lock = threading.Lock()
+
+    def _build(self, spec: ModelSpec) -> Tuple[Any, Any]:
+        with self._lock:
+            if spec not in self._built:
+                llm = self.llm_factory(spec)
+                runnable = llm.bind_tools(self.tools) if self.tools else llm
+                self._built[spec] = (llm, self.full_prompt | runnable if self.full_prompt is not None else runnable)
+            return self._built[spec]
+
+    def _chain(self, spec: ModelSpec) -> Tuple[Any, bool]:
+        llm, full_chain = self._built.get(spec) or self._build(spec)
+        name = prompt_prefix_cache.resolve(getattr(llm, "model", "unknown"), self.system_text, self.tools)
+        if name is None:
+            return full_chain, False
+        cached_name, chain = self._cached_chains.get(spec, (None, None))
+        if cached_name != name:
+            runnable = llm.bind(cached_content=name)
+            chain = self.case_prompt | runnable if self.case_prompt is not None else runnable
+            self._cached_chains[spec] = (name, chain)
+        return chain, True
+
+    def _run(self, payload_for: Callable[[bool], Any], choice: Optional[RouteChoice]):
+        choice = choice or model_router.select(self.route)
+        chain, cached = self._chain(choice.spec)
+        started = time.perf_counter()
+        response = chain.invoke(payload_for(cached))
+        llm_usage.record(choice.label, response, time.perf_counter() - started, cached, choice.spec)
+        return response
+
+    def invoke(self, inputs: Dict[str, Any], choice: Optional[RouteChoice] = None):
+        return self._run(lambda cached: inputs, choice)
+
+    def invoke_messages(self, messages: list, choice: Optional[RouteChoice] = None):
+        def payload(cached: bool) -> list:
+            if not cached:
+                return [self.system_message, *messages]
+            # The request may not carry its own system instruction next to cached content
+            return [HumanMessage(content=m.content) if isinstance(m, SystemMessage) else m for m in messages]
+        return self._run(payload, choice)
+
+# Off by default: every prompt prefix is far below Gemini's minimum, so today only the fake LLM benefits
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_PREFIX_CACHE", "false").lower() in ("1", "true", "yes")
+
+def _make_prefix_cache() -> PrefixCache:
+    ttl = float(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+    if use_fake_llm():
+        return FakePrefixCache(PROMPT_CACHE_ENABLED, int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "0")), ttl)
+    # Gemini rejects explicit caches below its minimum prefix size
+    return GeminiPrefixCache(PROMPT_CACHE_ENABLED, int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "4096")), ttl)
+
+prompt_prefix_cache = _make_prefix_cache()
+llm_usage = NodeUsage()
@@ -0,0 +1,296 @@
+# triage_ai_assistant/agents/resilience.py
+
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Optional
+
+import httpx
+
+from agents.admission import LLMOverloadedError, llm_admission
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("LLM provider circuit is open")
+        self.retry_after = retry_after
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when an attempt's deadline passes while its calls are still running"""
+
+# Provider status codes worth another attempt; 400/401/403/404 won't change on retry
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+def is_transient(error: BaseException) -> bool:
+    """Network failures and provider overload/5xx; auth and bad-request errors are not"""
+    if isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError)):
+        return True
+    # google.api_core exceptions carry the HTTP status as `code`, httpx errors on their response
+    code = getattr(error, "code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(code, int) and code in TRANSIENT_STATUS_CODES
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; half-open after `reset_timeout`"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probing:
+                self._probing = True  # let exactly one probe through
+                return
+            self._stats["rejected"] += 1
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(retry_after or 1.0)
+
+    def cancel_probe(self):
+        """The probe never reached the provider (e.g. it was shed); allow another"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self._stats["opened"] += 1
+                    logger.warning("LLM circuit opened after %d consecutive failures", self._failures)
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self._state(), "consecutive_failures": self._failures, **self._stats}
+
+class LatencyTracker:
+    """Sliding window of recent call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+class ResilientInvoker:
+    """Per-call deadline, hedging, jittered retries and a circuit breaker for LLM calls.
+
+    A hedge is a second identical request fired when the first hasn't returned
+    within the `hedge_percentile` latency of recent calls on the same route;
+    whichever finishes first wins. Calls shed by admission control are never
+    retried or hedged past, and don't count against the breaker.
+
+    Threads can't be cancelled, so a call that outlives its deadline (or
+    loses a hedge race) keeps running in the background. It gives its
+    concurrency slot back when its attempt ends, and counts as abandoned
+    until it returns. Abandoned calls share one budget across routes, kept
+    to at most half the worker pool so live calls always have threads; once
+    it is spent, new attempts are shed. A timed-out attempt is not retried,
+    because retrying would only add more load behind the call that is still
+    running, and neither is a non-transient error (see `is_transient`).
+    """
+
+    def __init__(
+        self,
+        timeout: float = float(os.getenv("LLM_TIMEOUT", "30")),
+        hedge_percentile: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+        max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2")),
+        backoff_base: float = float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+        backoff_max: float = float(os.getenv("LLM_BACKOFF_MAX", "8")),
+        breaker: Optional[CircuitBreaker] = None,
+        max_abandoned: int = int(os.getenv("LLM_MAX_ABANDONED", "8")),
+        max_workers: int = 32,
+    ):
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile  # 0 disables hedging
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_abandoned = max(1, min(max_abandoned, max_workers // 2))
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._abandoned: Dict[str, int] = {}  # per route, calls still running after their attempt ended
+        self._abandoned_total = 0
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "timeouts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0,
+                       "abandoned": 0, "shed_abandoned": 0}
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _tracker(self, route: str) -> LatencyTracker:
+        with self._lock:
+            return self._latency.setdefault(route, LatencyTracker())
+
+    def _submit(self, fn: Callable[[], Any]):
+        ctx = contextvars.copy_context()  # keep current_patient etc. visible in the worker
+        start = time.perf_counter()
+
+        def run():
+            result = ctx.run(fn)
+            return result, time.perf_counter() - start
+        return self._executor.submit(run)
+
+    def _abandon(self, route: str, futures):
+        """Track calls left running when their attempt ended, until they return"""
+        if not futures:
+            return
+        with self._lock:
+            self._abandoned[route] = self._abandoned.get(route, 0) + len(futures)
+            self._abandoned_total += len(futures)
+            self._stats["abandoned"] += len(futures)
+
+        def settled(_):
+            with self._lock:
+                self._abandoned[route] -= 1
+                self._abandoned_total -= 1
+        for fut in futures:
+            fut.add_done_callback(settled)
+
+    def _attempt(self, fn: Callable[[], Any], route: str, timeout: float,
+                 slot: Callable[[], ContextManager]) -> Any:
+        with self._lock:
+            shed = self._abandoned_total >= self.max_abandoned
+            if shed:
+                self._stats["shed_abandoned"] += 1
+        if shed:
+            raise LLMOverloadedError("abandoned_calls", timeout)
+        tracker = self._tracker(route)
+        pending = set()
+        # Slots are held by this thread and released when the attempt ends, not by the worker threads
+        with ExitStack() as slots:
+            slots.enter_context(slot())
+            deadline = time.monotonic() + timeout
+            primary = self._submit(fn)
+            pending.add(primary)
+            hedge_delay = tracker.percentile(self.hedge_percentile) if self.hedge_percentile else None
+            if hedge_delay is not None:
+                done, _ = wait(pending, timeout=min(hedge_delay, timeout))
+                if not done:
+                    try:
+                        slots.enter_context(slot())
+                    except LLMOverloadedError:
+                        pass  # no capacity for a hedge: keep waiting on the primary
+                    else:
+                        self._count("hedges")
+                        pending.add(self._submit(fn))
+            error: Optional[BaseException] = None
+            try:
+                while pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        try:
+                            result, elapsed = fut.result()
+                        except Exception as e:
+                            error = e
+                            continue
+                        tracker.record(elapsed)
+                        if fut is not primary:
+                            self._count("hedge_wins")
+                        return result
+            finally:
+                self._abandon(route, pending)
+        if error is not None and not pending:
+            raise error
+        self._count("timeouts")
+        raise LLMTimeoutError(f"LLM call on route '{route}' exceeded {timeout:.1f}s deadline")
+
+    def invoke(self, fn: Callable[[], Any], route: str = "default", timeout: Optional[float] = None,
+               slot: Callable[[], ContextManager] = nullcontext) -> Any:
+        """`timeout` overrides the per-attempt deadline for this call (e.g. from the model router);
+        `slot` is entered around each primary and hedge request, e.g. an admission slot"""
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self.breaker.allow()
+            try:
+                result = self._attempt(fn, route, timeout or self.timeout, slot)
+            except LLMOverloadedError:
+                self.breaker.cancel_probe()
+                raise
+            except LLMTimeoutError:
+                # The timed-out call is still running; a retry would only pile on
+                self.breaker.record_failure()
+                self._count("failures")
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or not is_transient(e):
+                    self._count("failures")
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                logger.warning("LLM call on route '%s' failed (%s), retry %d in %.2fs", route, e, attempt + 1, delay)
+                self._count("retries")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            routes = list(self._latency.items())
+            stats["abandoned_in_flight"] = {route: n for route, n in self._abandoned.items() if n}
+        stats["breaker"] = self.breaker.stats()
+        stats["p95_latency_s"] = {route: t.percentile(95, min_samples=1) for route, t in routes}
+        return stats
+
+llm_invoker = ResilientInvoker()
+
+def guarded_invoke(fn: Callable[[], Any], route: str = "default", timeout: Optional[float] = None) -> Any:
+    """Run one LLM call under admission control and the resilience policy"""
+    return llm_invoker.invoke(fn, route=route, timeout=timeout, slot=llm_admission.slot)
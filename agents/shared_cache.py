@@ -0,0 +1,270 @@
+# triage_ai_assistant/agents/shared_cache.py
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+class InMemoryBackend:
+    """The Redis commands the cache uses, in process memory.
+
+    The default backend (one process: the shared tier is just a bigger LRU), and a
+    stand-in for Redis in tests: several SharedStores on one backend behave like
+    several workers on one Redis, pub/sub included.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+        self._subscribers: Dict[str, List[Callable[[bytes], None]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] and item[1] < time.monotonic():
+                del self._data[key]
+                return None
+            return item[0]
+
+    def set(self, key: str, value: bytes, ex: Optional[float] = None):
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, now + ex if ex else 0.0)
+            if len(self._data) > self.max_keys:
+                self._data = {k: v for k, v in self._data.items() if not v[1] or v[1] >= now}
+                while len(self._data) > self.max_keys:
+                    del self._data[next(iter(self._data))]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def publish(self, channel: str, message: bytes):
+        with self._lock:
+            handlers = list(self._subscribers[channel])
+        for handler in handlers:
+            handler(message)
+
+    def subscribe(self, channel: str, handler: Callable[[bytes], None]):
+        with self._lock:
+            self._subscribers[channel].append(handler)
+
+class RedisBackend:
+    """Redis (or any Redis-protocol server) via redis-py, with short timeouts so a slow server degrades to a miss"""
+
+    def __init__(self, url: str, timeout: float = 0.25):
+        import redis  # optional dependency, only needed for a redis:// SHARED_CACHE_URL
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        # Subscriptions block on reads, so they get a connection without the short socket timeout
+        self._subscriber = redis.Redis.from_url(url, socket_connect_timeout=timeout)
+        self._thread = None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ex: Optional[float] = None):
+        self.client.set(key, value, px=int(ex * 1000) if ex else None)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def publish(self, channel: str, message: bytes):
+        self.client.publish(channel, message)
+
+    def subscribe(self, channel: str, handler: Callable[[bytes], None]):
+        pubsub = self._subscriber.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{channel: lambda message: handler(message["data"])})
+
+        def on_error(error, pubsub, thread):
+            # redis-py reconnects and resubscribes on the next read
+            logger.warning("Shared cache subscription error: %s", error)
+            time.sleep(1.0)
+        self._thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=on_error)
+
+class TwoTierCache:
+    """A namespace of the shared store with a local LRU in front.
+
+    Lookups try the local tier, then the shared tier (filling the local one),
+    else miss. Writes go to both tiers and publish an invalidation so other
+    processes drop their local copy; `local_ttl` bounds how stale a local copy
+    can get if such a message is lost. Values are stored as orjson bytes, so
+    every hit returns a fresh object that callers may mutate.
+    """
+
+    def __init__(self, store: "SharedStore", namespace: str, ttl: float, local_ttl: float, local_size: int):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self._local: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "sets": 0, "invalidations_received": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self.store.prefix}:{self.namespace}:{key}"
+
+    def _put_local(self, key: str, data: bytes):
+        with self._lock:
+            self._local[key] = (data, time.monotonic() + min(self.local_ttl, self.ttl))
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        data = None
+        with self._lock:
+            item = self._local.get(key)
+            if item is not None:
+                if item[1] > time.monotonic():
+                    self._local.move_to_end(key)
+                    self._stats["local_hits"] += 1
+                    data = item[0]
+                else:
+                    del self._local[key]
+        if data is not None:
+            return orjson.loads(data)
+        data = self.store.call(self.store.backend.get, self._shared_key(key))
+        with self._lock:
+            self._stats["shared_hits" if data is not None else "misses"] += 1
+        if data is None:
+            return None
+        self._put_local(key, data)
+        return orjson.loads(data)
+
+    def set(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        data = orjson.dumps(value, default=str)
+        self._put_local(key, data)
+        with self._lock:
+            self._stats["sets"] += 1
+        self.store.call(self.store.backend.set, self._shared_key(key), data, ex=self.ttl)
+        self.store.publish(self.namespace, key)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._local.pop(key, None)
+        self.store.call(self.store.backend.delete, self._shared_key(key))
+        self.store.publish(self.namespace, key)
+
+    def drop_local(self, key: str):
+        with self._lock:
+            self._local.pop(key, None)
+            self._stats["invalidations_received"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._local)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        reached_shared = stats["shared_hits"] + stats["misses"]
+        stats["local_hit_ratio"] = round(stats["local_hits"] / lookups, 4) if lookups else None
+        stats["shared_hit_ratio"] = round(stats["shared_hits"] / reached_shared, 4) if reached_shared else None
+        stats["hit_ratio"] = round((stats["local_hits"] + stats["shared_hits"]) / lookups, 4) if lookups else None
+        return {"enabled": self.enabled, "ttl_s": self.ttl, **stats}
+
+class SharedStore:
+    """Cross-worker cache: one backend, one invalidation channel, any number of TwoTierCache namespaces.
+
+    Shared-tier errors never fail the caller: the call counts as a miss and
+    the shared tier is skipped for `retry_after` seconds, leaving the local tiers.
+    """
+
+    def __init__(self, backend, url: str = "memory://", prefix: str = "clinical-agents", retry_after: float = 5.0):
+        self.backend = backend
+        self.url = url
+        self.prefix = prefix
+        self.channel = f"{prefix}:invalidate"
+        self.retry_after = retry_after
+        self.origin = uuid.uuid4().hex
+        self._caches: Dict[str, TwoTierCache] = {}
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._subscribed = False
+        self._stats = {"errors": 0, "skipped_while_down": 0}
+
+    @classmethod
+    def from_env(cls) -> "SharedStore":
+        """SHARED_CACHE_URL: memory:// (default, this process only) or redis://host:6379/0"""
+        url = os.getenv("SHARED_CACHE_URL", "memory://")
+        prefix = os.getenv("SHARED_CACHE_PREFIX", "clinical-agents")
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            return cls(RedisBackend(url), url=url.split("@")[-1], prefix=prefix)
+        return cls(InMemoryBackend(), prefix=prefix)
+
+    def cache(self, namespace: str, ttl: float, local_ttl: float = float(os.getenv("SHARED_CACHE_LOCAL_TTL", "30")),
+              local_size: int = 1000) -> TwoTierCache:
+        with self._lock:
+            if namespace not in self._caches:
+                self._caches[namespace] = TwoTierCache(self, namespace, ttl, local_ttl, local_size)
+            return self._caches[namespace]
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        if time.monotonic() < self._down_until:
+            with self._lock:
+                self._stats["skipped_while_down"] += 1
+            return None
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            self._down_until = time.monotonic() + self.retry_after
+            with self._lock:
+                self._stats["errors"] += 1
+            logger.warning("Shared cache unavailable, using local tier for %.0fs: %s", self.retry_after, e)
+            return None
+
+    def publish(self, namespace: str, key: str):
+        message = orjson.dumps({"origin": self.origin, "ns": namespace, "key": key})
+        self.call(self.backend.publish, self.channel, message)
+
+    def _on_message(self, message: bytes):
+        try:
+            event = orjson.loads(message)
+        except orjson.JSONDecodeError:
+            return
+        if event.get("origin") == self.origin:
+            return
+        cache = self._caches.get(event.get("ns"))
+        if cache is not None:
+            cache.drop_local(event.get("key"))
+
+    def start(self):
+        """Subscribe to invalidations from other processes (until then only local_ttl bounds staleness)"""
+        with self._lock:
+            if self._subscribed:
+                return
+            self._subscribed = True
+        try:
+            self.backend.subscribe(self.channel, self._on_message)
+        except Exception as e:
+            with self._lock:
+                self._subscribed = False
+            logger.error("Shared cache subscription failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            caches = dict(self._caches)
+            stats = dict(self._stats)
+        return {"backend": self.url, "subscribed": self._subscribed,
+                "shared_tier_down": time.monotonic() < self._down_until, **stats,
+                "caches": {name: cache.stats() for name, cache in caches.items()}}
+
+shared_store = SharedStore.from_env()
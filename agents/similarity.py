@@ -0,0 +1,143 @@
+# triage_ai_assistant/agents/similarity.py
+
+import logging
+import os
+import random
+import threading
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agents.singleflight import normalize_note
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def shingles(note: str, size: int = 3) -> set:
+    """Word n-gram shingles of the normalized note, hashed to 32-bit ints"""
+    words = [w.strip(".,;:!?()\"'") for w in normalize_note(note).split()]
+    words = [w for w in words if w]
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+class MinHashLSHIndex:
+    """In-memory MinHash/LSH index over past notes for near-duplicate lookup.
+
+    Pure Python and CPU-only: each note is reduced to `num_perm` MinHash values,
+    split into `bands` LSH buckets. A query only scores notes that share at
+    least one bucket, so lookups stay cheap as the history grows.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 7):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._lock = threading.RLock()
+        self._signatures: Dict[Any, Tuple[int, ...]] = {}
+        self._payloads: Dict[Any, dict] = {}
+        self._buckets: List[Dict[Tuple[int, ...], set]] = [defaultdict(set) for _ in range(bands)]
+
+    def signature(self, note: str) -> Tuple[int, ...]:
+        hashed = shingles(note)
+        if not hashed:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed)
+            for a, b in self._perms
+        )
+
+    def _bands(self, sig: Tuple[int, ...]):
+        for i in range(self.bands):
+            yield i, sig[i * self.rows:(i + 1) * self.rows]
+
+    def add(self, key: Any, note: str, payload: Optional[dict] = None):
+        sig = self.signature(note)
+        with self._lock:
+            if key in self._signatures:
+                self.remove(key)
+            self._signatures[key] = sig
+            self._payloads[key] = payload or {}
+            for i, band in self._bands(sig):
+                self._buckets[i][band].add(key)
+
+    def remove(self, key: Any) -> bool:
+        with self._lock:
+            sig = self._signatures.pop(key, None)
+            if sig is None:
+                return False
+            self._payloads.pop(key, None)
+            for i, band in self._bands(sig):
+                bucket = self._buckets[i].get(band)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[i][band]
+            return True
+
+    def rebuild(self, rows: Iterable[Tuple[Any, str, dict]]):
+        with self._lock:
+            self._signatures.clear()
+            self._payloads.clear()
+            for buckets in self._buckets:
+                buckets.clear()
+            for key, note, payload in rows:
+                self.add(key, note, payload)
+        logger.info("Note similarity index built with %d notes", len(self))
+
+    def query(self, note: str) -> Optional[Tuple[Any, float, dict]]:
+        """Return (key, estimated Jaccard similarity, payload) of the closest note"""
+        sig = self.signature(note)
+        with self._lock:
+            candidates = set()
+            for i, band in self._bands(sig):
+                candidates |= self._buckets[i].get(band, set())
+            best = None
+            for key in candidates:
+                other = self._signatures[key]
+                score = sum(1 for x, y in zip(sig, other) if x == y) / self.num_perm
+                if best is None or score > best[1]:
+                    best = (key, score, self._payloads[key])
+            return best
+
+    def __len__(self):
+        with self._lock:
+            return len(self._signatures)
+
+# How run_triage_workflow uses close matches: "off", "seed" or "shortcircuit"
+SIMILARITY_MODE = os.getenv("TRIAGE_SIMILARITY_MODE", "off").lower()
+SIMILARITY_THRESHOLD = float(os.getenv("TRIAGE_SIMILARITY_THRESHOLD", "0.9"))
+
+# Marks results reused from a prior assessment; they are never indexed themselves
+SIMILAR_CASE_REASONING_PREFIX = "Near-duplicate of prior assessment"
+# Stored diagnoses are "NURSE REASONING: ...\nDOCTOR INPUT: ..."
+DOCTOR_INPUT_MARKER = "DOCTOR INPUT: "
+
+note_index = MinHashLSHIndex()
+
+def index_payload(esi_level: int, diagnosis: str) -> Optional[dict]:
+    """Index metadata for a stored assessment: only the prior doctor's input, so reuse doesn't nest prefixes.
+
+    None for assessments that were themselves reused from a near-duplicate.
+    """
+    if SIMILAR_CASE_REASONING_PREFIX in diagnosis.split(DOCTOR_INPUT_MARKER, 1)[0]:
+        return None
+    return {"esi_level": esi_level, "doctor_input": diagnosis.rsplit(DOCTOR_INPUT_MARKER, 1)[-1]}
+
+def find_similar(note: str, threshold: float = SIMILARITY_THRESHOLD) -> Optional[Tuple[Any, float, dict]]:
+    """Closest prior note above threshold; every score is logged for audit"""
+    match = note_index.query(note)
+    if match is None:
+        return None
+    key, score, payload = match
+    logger.info("Note similarity: closest assessment %s score=%.3f threshold=%.2f mode=%s",
+                key, score, threshold, SIMILARITY_MODE)
+    return match if score >= threshold else None
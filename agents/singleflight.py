@@ -0,0 +1,98 @@
+# triage_ai_assistant/agents/singleflight.py
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def normalize_note(note: str) -> str:
+    """Normalize a clinical note so trivially different submissions share a key"""
+    return re.sub(r"\s+", " ", note or "").strip().lower()
+
+def note_key(note: str) -> str:
+    """Stable registry key for a clinical note"""
+    return hashlib.sha256(normalize_note(note).encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """In-flight request registry: concurrent callers with the same key share one execution.
+
+    The registry is backed by `concurrent.futures.Future`, so callers on worker
+    threads (FastAPI sync endpoints) and callers on an asyncio loop can wait on
+    the same execution.
+    """
+
+    def __init__(self, name: str, cost: Optional[Callable[[Any], int]] = None):
+        self.name = name
+        self._cost = cost  # number of LLM calls one execution of the result took
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._stats = {"executions": 0, "coalesced": 0, "saved_llm_calls": 0}
+
+    def _join(self, key: str):
+        """Return (future, is_leader) for key"""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self._stats["coalesced"] += 1
+                return fut, False
+            fut = Future()
+            self._calls[key] = fut
+            self._stats["executions"] += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: Future, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def _record_saved(self, result: Any):
+        saved = self._cost(result) if self._cost else 1
+        with self._lock:
+            self._stats["saved_llm_calls"] += saved
+        logger.info("%s: coalesced duplicate request, saved %d LLM calls", self.name, saved)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn once per key among concurrent thread callers"""
+        fut, leader = self._join(key)
+        if not leader:
+            result = fut.result()
+            self._record_saved(result)
+            return result
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result=result)
+        return result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of do(); shares the registry with thread callers"""
+        fut, leader = self._join(key)
+        if not leader:
+            result = await asyncio.wrap_future(fut)
+            self._record_saved(result)
+            return result
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result=result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
@@ -0,0 +1,205 @@
+# triage_ai_assistant/agents/speculative.py
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from agents.admission import llm_admission
+from agents.triageagent import get_final_esi, review_triage, run_provisional_triage
+
+logger = logging.getLogger(__name__)
+
+# Negations ("not", "no", "without", ...) are content: "not breathing" must not match "breathing"
+_STOPWORDS = frozenset(
+    "the and for with that this have has had was were are been but you your since about from into "
+    "when what then than very some also just like feel feels felt any all it's its i'm".split()
+)
+
+_NEGATIONS = frozenset("no not nor never none without denies negative".split())
+
+def content_tokens(text: str) -> set:
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("n't", " not"))
+    return {t for t in words if t in _NEGATIONS or (len(t) > 2 and t not in _STOPWORDS)}
+
+def provisional_note(patient_turns: List[str]) -> str:
+    return "; ".join(t.strip() for t in patient_turns if t.strip())
+
+def _llm_calls(state: dict) -> int:
+    """Nurse plus doctor per finished iteration, one nurse call for a run that stopped mid-loop"""
+    if "shortcut" in state:
+        return 0
+    return 2 * state.get("iteration", 0) or 1
+
+@dataclass
+class Speculation:
+    note: str
+    chars: int
+    future: Future
+    started: float = field(default_factory=time.monotonic)
+
+@dataclass
+class Session:
+    speculations: int = 0
+    current: Optional[Speculation] = None
+    touched: float = field(default_factory=time.monotonic)
+
+class SpeculativeTriage:
+    """Provisional triage in the background while the NurseBot chat is still running.
+
+    Once the patient has said enough (`min_chars` over at least `min_turns`
+    replies), a workflow run starts on the patient's turns so far, and again
+    if they grow by `regrow` (at most `max_per_session` times), as long as
+    LLM admission is below `max_utilization`. On the final turn:
+    - hit: the final note adds no content words (at most `max_new_tokens`, default 0), so the provisional
+      result is reused;
+    - delta: anything new goes to the doctor, who reviews the provisional nurse assessment against the final note;
+    - miss: nothing usable, so the full workflow runs.
+    Speculative LLM calls whose result was never used are counted as wasted.
+    """
+
+    def __init__(self, enabled: bool, min_chars: int = 120, min_turns: int = 2, regrow: float = 1.5,
+                 max_per_session: int = 3, max_new_tokens: int = 0, max_utilization: float = 0.5,
+                 wait: float = 30.0, ttl: float = 900.0, workers: int = 4, max_sessions: int = 5000):
+        self.enabled = enabled
+        self.min_chars = min_chars
+        self.min_turns = min_turns
+        self.regrow = regrow
+        self.max_per_session = max_per_session
+        self.max_new_tokens = max_new_tokens
+        self.max_utilization = max_utilization
+        self.wait = wait
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # Rate budgets are charged per request by the routers, so speculative calls never spend
+        # the patient's; they only take concurrency slots, and only while utilization is low
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculative-triage")
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"started": 0, "skipped_busy": 0, "failed": 0, "hits": 0, "deltas": 0, "misses": 0,
+                       "speculative_llm_calls": 0, "wasted_llm_calls": 0, "saved_llm_calls": 0}
+        self._final_wait: Dict[str, List[float]] = {"hit": [], "delta": [], "miss": []}
+
+    def _waste(self, speculation: Optional[Speculation]):
+        """Count a speculation's calls as wasted once it finishes, if it is dropped unused"""
+        if speculation is None:
+            return
+
+        def wasted(fut: Future):
+            if fut.exception() is None:
+                with self._lock:
+                    self._stats["wasted_llm_calls"] += _llm_calls(fut.result())
+        speculation.future.add_done_callback(wasted)
+
+    def _run(self, note: str) -> dict:
+        try:
+            state = run_provisional_triage(note)
+        except Exception as e:
+            with self._lock:
+                self._stats["failed"] += 1
+            logger.warning("Speculative triage failed: %s", e)
+            raise
+        with self._lock:
+            self._stats["speculative_llm_calls"] += _llm_calls(state)
+        return state
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.touched < self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            self._waste(session.current)
+
+    def observe(self, session_key: str, patient_turns: List[str]):
+        """Called after every non-final chat turn with the patient's messages so far"""
+        if not self.enabled:
+            return
+        note = provisional_note(patient_turns)
+        if len(patient_turns) < self.min_turns or len(note) < self.min_chars:
+            return
+        busy = llm_admission.utilization() >= self.max_utilization
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.setdefault(session_key, Session())
+            self._sessions.move_to_end(session_key)
+            session.touched = now
+            current = session.current
+            if session.speculations >= self.max_per_session:
+                return
+            if current is not None and (not current.future.done() or len(note) < current.chars * self.regrow):
+                return
+            if busy:
+                # Speculation only uses spare LLM capacity
+                self._stats["skipped_busy"] += 1
+                return
+            session.speculations += 1
+            session.current = Speculation(note, len(note), self._executor.submit(self._run, note))
+            self._stats["started"] += 1
+        self._waste(current)
+
+    def _record(self, outcome: str, started: float, saved_calls: int = 0):
+        with self._lock:
+            self._stats[{"hit": "hits", "delta": "deltas", "miss": "misses"}[outcome]] += 1
+            self._stats["saved_llm_calls"] += saved_calls
+            samples = self._final_wait[outcome]
+            samples.append(time.perf_counter() - started)
+            if len(samples) > 1000:
+                del samples[:500]
+
+    def finalize(self, session_key: str, final_note: str) -> Optional[dict]:
+        """Triage result for the final note built from the session's speculation, or None (run the full workflow)"""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        with self._lock:
+            session = self._sessions.pop(session_key, None)
+        speculation = session.current if session else None
+        if speculation is None:
+            self._record("miss", started)
+            return None
+        try:
+            state = speculation.future.result(timeout=self.wait)
+        except Exception:
+            # Failed, or still running past the wait: its calls are wasted if it ever finishes
+            self._waste(speculation)
+            self._record("miss", started)
+            return None
+        if "shortcut" in state:
+            self._record("miss", started)
+            return None
+        new_tokens = content_tokens(final_note) - content_tokens(speculation.note)
+        if len(new_tokens) <= self.max_new_tokens:
+            self._record("hit", started, saved_calls=_llm_calls(state))
+            return {**get_final_esi(state), "speculative": "hit"}
+        result = review_triage(final_note, state)
+        # The provisional nurse pass stands in for the first nurse call of a fresh run
+        self._record("delta", started, saved_calls=1)
+        return {**result, "speculative": "delta"}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            waits = {k: list(v) for k, v in self._final_wait.items()}
+            stats["sessions"] = len(self._sessions)
+        finals = stats["hits"] + stats["deltas"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / finals, 4) if finals else None
+        stats["reuse_rate"] = round((stats["hits"] + stats["deltas"]) / finals, 4) if finals else None
+        stats["waste_ratio"] = round(stats["wasted_llm_calls"] / stats["speculative_llm_calls"], 4) \
+            if stats["speculative_llm_calls"] else None
+        stats["avg_final_wait_ms"] = {k: round(1000 * sum(v) / len(v), 1) if v else None for k, v in waits.items()}
+        return {"enabled": self.enabled, **stats}
+
+speculative_triage = SpeculativeTriage(
+    os.getenv("SPECULATIVE_TRIAGE", "false").lower() in ("1", "true", "yes"),
+    min_chars=int(os.getenv("SPECULATIVE_MIN_CHARS", "120")),
+    min_turns=int(os.getenv("SPECULATIVE_MIN_TURNS", "2")),
+    max_new_tokens=int(os.getenv("SPECULATIVE_MAX_NEW_TOKENS", "0")),
+    max_utilization=float(os.getenv("SPECULATIVE_MAX_UTILIZATION", "0.5")),
+)
@@ -1,28 +1,27 @@
 # triage_ai_assistant/agents/triage_engine.py
 
-from typing import Dict, Any
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import Dict, Any, Optional
 from langgraph.graph import StateGraph, END
+from agents.singleflight import SingleFlight, note_key
+from agents.similarity import SIMILAR_CASE_REASONING_PREFIX, SIMILARITY_MODE, find_similar
+from agents.resilience import guarded_invoke
+from agents.checkpoints import triage_checkpoints
+from agents.prompt_cache import PrefixCachedChain
+from agents.model_router import ModelSpec, build_llm, model_router
+from agents.esi_classifier import CLASSIFIER_REASONING_PREFIX, triage_cascade
+from agents.shared_cache import shared_store
+import asyncio
 import os
 import re
+import uuid
 
-def get_llm():
-    """Get LLM instance with API key loaded from environment"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables")
-    return ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        google_api_key=api_key
-    )
-
-# Enhanced prompt for the triage nurse
-nurse_prompt = ChatPromptTemplate.from_template("""
-You are an experienced ER triage nurse. Your task is to assess the Emergency Severity Index (ESI) for a new patient.
+def get_llm(spec: Optional[ModelSpec] = None):
+    """Get LLM instance for a routed model spec (default: the router's default model)"""
+    return build_llm(spec or model_router.default_spec)
 
-Patient Note: {note}
-Doctor’s Previous Input (if any): {doctor_msg}
+# Static instructions come first and are identical on every call, so the
+# provider can serve them from a cached prefix; the case follows.
+NURSE_SYSINT = """You are an experienced ER triage nurse. Your task is to assess the Emergency Severity Index (ESI) for a new patient.
 
 Step-by-step reasoning:
 1. Summarize the key symptoms and risks.
@@ -34,16 +33,12 @@ Your structured response:
 Assessment:
 ESI Level: X
 Reasoning: ...
-Confidence: High/Medium/Low
-""")
+Confidence: High/Medium/Low"""
 
-# Enhanced prompt for the doctor
-doctor_prompt = ChatPromptTemplate.from_template("""
-You are an ER physician reviewing a triage assessment.
+NURSE_CASE = """Patient Note: {note}
+Doctor’s Previous Input (if any): {doctor_msg}"""
 
-Patient Note: {note}
-Nurse’s ESI Assessment:
-{nurse_msg}
+DOCTOR_SYSINT = """You are an ER physician reviewing a triage assessment.
 
 Step-by-step:
 1. Restate main clinical concerns.
@@ -56,8 +51,15 @@ Assessment:
 - Agreement: Yes/No
 - Suggested ESI Level: X (if different)
 - Reasoning: ...
-- Comment: ...
-""")
+- Comment: ..."""
+
+DOCTOR_CASE = """Patient Note: {note}
+Nurse’s ESI Assessment:
+{nurse_msg}"""
+
+# Built once and reused by every workflow run
+nurse_chain = PrefixCachedChain("nurse", NURSE_SYSINT, get_llm, human_template=NURSE_CASE)
+doctor_chain = PrefixCachedChain("doctor", DOCTOR_SYSINT, get_llm, human_template=DOCTOR_CASE)
 
 def extract_esi_from_response(response_text: str) -> dict:
     """Extract ESI level, reasoning, and confidence from structured LLM output"""
@@ -83,26 +85,36 @@ def check_agreement(nurse_response: str, doctor_response: str) -> bool:
     doctor_esi = extract_esi_from_response(doctor_response).get("esi_level")
     return nurse_esi == doctor_esi if nurse_esi and doctor_esi else False
 
+def add_token_usage(usage: Optional[dict], response) -> dict:
+    """Accumulate provider-reported token usage across workflow steps"""
+    usage = dict(usage or {"input_tokens": 0, "output_tokens": 0})
+    metadata = getattr(response, "usage_metadata", None) or {}
+    usage["input_tokens"] += metadata.get("input_tokens", 0)
+    usage["output_tokens"] += metadata.get("output_tokens", 0)
+    return usage
+
 def nurse_step(state: Dict[str, Any]) -> Dict[str, Any]:
-    llm = get_llm()  # Get LLM instance here
     inputs = {
         "note": state["note"],
         "doctor_msg": state.get("doctor_msg", "")
     }
-    response = (nurse_prompt | llm).invoke(inputs)
+    # The note is the A/B unit, so every step of a case runs in the same arm
+    choice = model_router.select("nurse", iteration=state.get("iteration", 0) + 1, unit=state["note"])
+    response = guarded_invoke(lambda: nurse_chain.invoke(inputs, choice), route=choice.label, timeout=choice.spec.timeout)
     return {
         **state,
         "nurse_msg": response.content,
-        "nurse_assessment": extract_esi_from_response(response.content)
+        "nurse_assessment": extract_esi_from_response(response.content),
+        "token_usage": add_token_usage(state.get("token_usage"), response)
     }
 
 def doctor_step(state: Dict[str, Any]) -> Dict[str, Any]:
-    llm = get_llm()  # Get LLM instance here
     inputs = {
         "note": state["note"],
         "nurse_msg": state["nurse_msg"]
     }
-    response = (doctor_prompt | llm).invoke(inputs)
+    choice = model_router.select("doctor", iteration=state.get("iteration", 0) + 1, unit=state["note"])
+    response = guarded_invoke(lambda: doctor_chain.invoke(inputs, choice), route=choice.label, timeout=choice.spec.timeout)
     agreement = check_agreement(state["nurse_msg"], response.content)
 
     return {
@@ -110,7 +122,8 @@ def doctor_step(state: Dict[str, Any]) -> Dict[str, Any]:
         "doctor_msg": response.content,
         "doctor_assessment": extract_esi_from_response(response.content),
         "agreement": agreement,
-        "iteration": state.get("iteration", 0) + 1
+        "iteration": state.get("iteration", 0) + 1,
+        "token_usage": add_token_usage(state.get("token_usage"), response)
     }
 
 def should_continue(state: Dict[str, Any]) -> str:
@@ -119,6 +132,14 @@ def should_continue(state: Dict[str, Any]) -> str:
         return END
     return "Nurse"
 
+ESI_DESCRIPTIONS = {
+    1: "Immediate - Life-threatening",
+    2: "Emergent - High risk, don't delay",
+    3: "Urgent - Stable but needs attention",
+    4: "Less Urgent - Stable, minor issue",
+    5: "Non-Urgent - Can wait"
+}
+
 def get_final_esi(result: dict) -> dict:
     """Summarize final triage decision and reasoning"""
     nurse_esi = result.get("nurse_assessment", {}).get("esi_level")
@@ -138,21 +159,14 @@ def get_final_esi(result: dict) -> dict:
         final_esi = "Unable to determine"
         consensus = "No consensus reached"
 
-    esi_descriptions = {
-        1: "Immediate - Life-threatening",
-        2: "Emergent - High risk, don't delay",
-        3: "Urgent - Stable but needs attention",
-        4: "Less Urgent - Stable, minor issue",
-        5: "Non-Urgent - Can wait"
-    }
-
     return {
         "final_esi_level": final_esi,
-        "esi_description": esi_descriptions.get(final_esi, "Assessment pending"),
+        "esi_description": ESI_DESCRIPTIONS.get(final_esi, "Assessment pending"),
         "consensus_reached": consensus,
         "nurse_reasoning": result.get("nurse_assessment", {}).get("reasoning", ""),
         "doctor_input": result.get("doctor_assessment", {}).get("reasoning", ""),
-        "iterations_needed": result.get("iteration", 0)
+        "iterations_needed": result.get("iteration", 0),
+        "token_usage": result.get("token_usage", {"input_tokens": 0, "output_tokens": 0})
     }
 
 def generate_patient_friendly_summary(result: dict) -> str:
@@ -190,9 +204,210 @@ workflow.add_conditional_edges("Doctor", should_continue)
 
 app = workflow.compile()
 
-def run_triage_workflow(note: str) -> dict:
-    result = app.invoke({"note": note})
-    return get_final_esi(result)
+# Same loop entered at the doctor review, for re-checking an existing nurse assessment against a longer note
+review_workflow = StateGraph(state_schema=dict)
+review_workflow.add_node("Nurse", nurse_step)
+review_workflow.add_node("Doctor", doctor_step)
+review_workflow.set_entry_point("Doctor")
+review_workflow.add_edge("Nurse", "Doctor")
+review_workflow.add_conditional_edges("Doctor", should_continue)
+review_app = review_workflow.compile()
+
+# Same graph, checkpointed after every node under the triage run id
+checkpointed_app = workflow.compile(checkpointer=triage_checkpoints.saver) if triage_checkpoints.enabled else None
+
+def _llm_calls(result: dict) -> int:
+    """Each loop iteration is one nurse call plus one doctor call.
+
+    Classifier and near-duplicate shortcuts report zero iterations: they made no LLM calls,
+    so a caller joining one saved none.
+    """
+    return 2 * result.get("iterations_needed", 0)
+
+# Concurrent identical notes share one workflow execution
+triage_flight = SingleFlight("triage", cost=_llm_calls)
+
+def _similar_case_result(assessment_id, score: float, match: dict) -> dict:
+    """Final result reused from a near-identical prior assessment"""
+    esi_level = match.get("esi_level")
+    return {
+        "final_esi_level": esi_level,
+        "esi_description": ESI_DESCRIPTIONS.get(esi_level, "Assessment pending"),
+        "consensus_reached": f"Yes - Matched prior assessment #{assessment_id} (similarity {score:.2f})",
+        "nurse_reasoning": f"{SIMILAR_CASE_REASONING_PREFIX} #{assessment_id}",
+        "doctor_input": match.get("doctor_input", ""),
+        "iterations_needed": 0,
+        "token_usage": {"input_tokens": 0, "output_tokens": 0}
+    }
+
+def _classifier_result(esi_level: int, confidence: float) -> dict:
+    """Final result for a note the local classifier was confident about"""
+    return {
+        "final_esi_level": esi_level,
+        "esi_description": ESI_DESCRIPTIONS.get(esi_level, "Assessment pending"),
+        "consensus_reached": f"Yes - Local classifier (confidence {confidence:.2f})",
+        "nurse_reasoning": f"{CLASSIFIER_REASONING_PREFIX} {triage_cascade.model.version}: "
+                           f"ESI {esi_level} with confidence {confidence:.3f}",
+        "doctor_input": "Not consulted (high-confidence local classification)",
+        "iterations_needed": 0,
+        "token_usage": {"input_tokens": 0, "output_tokens": 0}
+    }
+
+def _shadow_compare(prediction, result: dict) -> dict:
+    if result.get("iterations_needed"):  # only compare against an actual LLM decision
+        triage_cascade.record_shadow(prediction, result.get("final_esi_level"))
+    return result
+
+def _completed_llm_calls(snapshot) -> int:
+    """LLM calls already checkpointed for a run: two per finished iteration, plus a pending doctor step's nurse call"""
+    calls = 2 * snapshot.values.get("iteration", 0)
+    if "Doctor" in snapshot.next:
+        calls += 1
+    return calls
+
+def _initial_state(note: str) -> tuple[dict, Optional[dict]]:
+    """Workflow input, or a finished result when a near-duplicate short-circuits it"""
+    state = {"note": note}
+    if SIMILARITY_MODE not in ("seed", "shortcircuit"):
+        return state, None
+    similar = find_similar(note)
+    if similar is None:
+        return state, None
+    assessment_id, score, match = similar
+    if SIMILARITY_MODE == "shortcircuit" and match.get("esi_level"):
+        return state, _similar_case_result(assessment_id, score, match)
+    state["doctor_msg"] = (
+        f"A very similar prior case (similarity {score:.2f}) was triaged as "
+        f"ESI Level {match.get('esi_level')}. Prior doctor input: {match.get('doctor_input', '')}"
+    )
+    return state, None
+
+def _run_checkpointed(note: str, run_id: str) -> dict:
+    """Run the workflow under run_id, continuing from its last checkpoint if it has one"""
+    config = {"configurable": {"thread_id": run_id}}
+    snapshot = checkpointed_app.get_state(config)
+    if snapshot.values:
+        if note is not None and note_key(snapshot.values.get("note", "")) != note_key(note):
+            raise ValueError(f"Triage run {run_id} belongs to a different note")
+        triage_checkpoints.record_resume(run_id, _completed_llm_calls(snapshot), finished=not snapshot.next)
+        result = checkpointed_app.invoke(None, config) if snapshot.next else snapshot.values
+    else:
+        if note is None:
+            raise KeyError(run_id)
+        state, shortcut = _initial_state(note)
+        if shortcut is not None:
+            return {**shortcut, "run_id": run_id}
+        triage_checkpoints.begin(run_id)
+        result = checkpointed_app.invoke(state, config)
+    triage_checkpoints.finish(run_id)
+    return {**get_final_esi(result), "run_id": run_id}
+
+# Finished results by note key, shared across workers: a resubmitted note is answered without running the
+# workflow again. Off by default: it would hand one patient's triage decision to any other patient whose
+# note matches (client retries are covered per caller by Idempotency-Key). Stored without the run id,
+# which belongs to the run that produced it; every caller gets its own back.
+triage_results = shared_store.cache("triage", ttl=float(os.getenv("TRIAGE_RESULT_TTL", "0")))
+
+def _shareable(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k != "run_id"}
+
+def run_triage_workflow(note: str, run_id: Optional[str] = None) -> dict:
+    """Triage a note. Passing the run id of an interrupted run resumes it from its last completed step."""
+    run_id = run_id or uuid.uuid4().hex
+    key = note_key(note)
+    cached = triage_results.get(key)
+    if cached is not None:
+        return {**cached, "run_id": run_id}
+
+    def execute():
+        prediction = triage_cascade.classify(note)
+        if triage_cascade.finalize(prediction):
+            return _classifier_result(prediction.esi_level, prediction.confidence)
+        if checkpointed_app is not None:
+            return _shadow_compare(prediction, _run_checkpointed(note, run_id))
+        state, shortcut = _initial_state(note)
+        if shortcut is not None:
+            return shortcut
+        result = app.invoke(state)
+        return _shadow_compare(prediction, get_final_esi(result))
+
+    def execute_and_share():
+        result = _shareable(execute())
+        triage_results.set(key, result)
+        return result
+    # Callers joining an in-flight run also get their own run id
+    return {**triage_flight.do(key, execute_and_share), "run_id": run_id}
+
+async def arun_triage_workflow(note: str, run_id: Optional[str] = None) -> dict:
+    run_id = run_id or uuid.uuid4().hex
+    key = note_key(note)
+    # The shared tier is a network round trip
+    cached = await asyncio.to_thread(triage_results.get, key)
+    if cached is not None:
+        return {**cached, "run_id": run_id}
+
+    async def execute():
+        prediction = triage_cascade.classify(note)
+        if triage_cascade.finalize(prediction):
+            return _classifier_result(prediction.esi_level, prediction.confidence)
+        if checkpointed_app is not None:
+            # The SQLite/Postgres savers are synchronous
+            return _shadow_compare(prediction, await asyncio.to_thread(_run_checkpointed, note, run_id))
+        state, shortcut = _initial_state(note)
+        if shortcut is not None:
+            return shortcut
+        result = await app.ainvoke(state)
+        return _shadow_compare(prediction, get_final_esi(result))
+
+    async def execute_and_share():
+        result = _shareable(await execute())
+        await asyncio.to_thread(triage_results.set, key, result)
+        return result
+    return {**await triage_flight.ado(key, execute_and_share), "run_id": run_id}
+
+def run_provisional_triage(note: str) -> dict:
+    """Uncheckpointed run that keeps the raw workflow state, so a later note can be reviewed against it"""
+    state, shortcut = _initial_state(note)
+    if shortcut is not None:
+        return {"shortcut": shortcut}
+    return app.invoke(state)
+
+def review_triage(note: str, provisional: dict) -> dict:
+    """Triage `note` starting from a provisional run's nurse assessment.
+
+    The doctor reviews that assessment against the full note; only if they
+    disagree does the loop go back to the nurse. One LLM call when they agree.
+    """
+    state = {
+        "note": note,
+        "nurse_msg": provisional["nurse_msg"],
+        "nurse_assessment": provisional["nurse_assessment"],
+        "iteration": 0,
+        "token_usage": {"input_tokens": 0, "output_tokens": 0},
+    }
+    return get_final_esi(review_app.invoke(state))
+
+def resume_triage_run(run_id: str) -> dict:
+    """Finish a checkpointed run without the original note; KeyError if the run is unknown"""
+    if checkpointed_app is None:
+        raise KeyError(run_id)
+    return _run_checkpointed(None, run_id)
+
+def triage_run_state(run_id: str) -> Optional[dict]:
+    """Progress of a checkpointed run, or None if it is unknown"""
+    if checkpointed_app is None:
+        return None
+    snapshot = checkpointed_app.get_state({"configurable": {"thread_id": run_id}})
+    if not snapshot.values:
+        return None
+    return {
+        "run_id": run_id,
+        "status": triage_checkpoints.run_status(run_id) or "unknown",
+        "completed": not snapshot.next,
+        "next_step": snapshot.next[0] if snapshot.next else None,
+        "iterations": snapshot.values.get("iteration", 0),
+        "completed_llm_calls": _completed_llm_calls(snapshot),
+    }
 
 def display_esi_result(result: dict):
     """Console display for ESI outcome"""
@@ -0,0 +1,52 @@
+import hashlib
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+# Patient data: browsers may keep it but must revalidate, and shared caches must not store it
+CACHE_CONTROL = os.getenv("API_CACHE_CONTROL", "private, no-cache")
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag over a resource's change watermark (ids, updated_at, counts and the query that selected it)"""
+    digest = hashlib.sha256(orjson.dumps(parts, default=str)).hexdigest()[:32]
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix on the client's tag still matches"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+class ConditionalGets:
+    """304 Not Modified for GETs whose ETag the client already has; the body is only built on a miss"""
+
+    def __init__(self, cache_control: str = CACHE_CONTROL):
+        self.cache_control = cache_control
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def respond(self, resource: str, if_none_match: Optional[str], etag: str, body: Callable[[], Any]) -> Response:
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        hit = etag_matches(if_none_match, etag)
+        with self._lock:
+            counts = self._stats.setdefault(resource, {"not_modified": 0, "full": 0})
+            counts["not_modified" if hit else "full"] += 1
+        if hit:
+            return Response(status_code=304, headers=headers)
+        return ORJSONResponse(body(), headers=headers)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stats = {resource: dict(counts) for resource, counts in self._stats.items()}
+        for counts in stats.values():
+            total = counts["not_modified"] + counts["full"]
+            counts["not_modified_ratio"] = round(counts["not_modified"] / total, 4) if total else 0.0
+        return stats
+
+conditional_gets = ConditionalGets()
@@ -0,0 +1,272 @@
+import heapq
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import UTC, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.logging import logger
+
+# Sort key: (tier, score, assessment id). ESI 1 is tier 0 and never outranked; everyone else is
+# ordered by esi_level * aging + arrival time.
+QueueKey = Tuple[int, float, int]
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=UTC)).timestamp()
+    return datetime.fromisoformat(str(value)).timestamp()
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Optional[QueueKey], levels: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * levels
+        self.width: List[int] = [1] * levels  # level-0 steps to next[level]
+
+class RankedKeys:
+    """Sorted set of queue keys: an indexable skip list.
+
+    Insert, remove and rank (how many keys sort before a key) are O(log n)
+    expected, with no shifting of a flat array; iterating from the front
+    walks the bottom level.
+    """
+
+    MAX_LEVELS = 24  # enough for ~16M keys; more still works, just with longer searches
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._size = 0
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVELS and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def add(self, key: QueueKey):
+        chain: List[_Node] = [self._head] * self.MAX_LEVELS
+        steps = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        levels = self._level()
+        new = _Node(key, levels)
+        distance = 0  # from chain[level] to the new node's predecessor on level 0
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level], prev.next[level] = prev.next[level], new
+            new.width[level] = prev.width[level] - distance
+            prev.width[level] = distance + 1
+            distance += steps[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key: QueueKey) -> bool:
+        chain: List[_Node] = [self._head] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            return False
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+        return True
+
+    def rank(self, key: QueueKey) -> int:
+        """Number of keys sorting before `key`"""
+        node, rank = self._head, 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                rank += node.width[level]
+                node = node.next[level]
+        return rank
+
+    def first(self, count: int) -> List[QueueKey]:
+        keys, node = [], self._head.next[0]
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class EDQueue:
+    """In-memory "who to see next" index over waiting assessments.
+
+    Each ESI level is worth `aging_minutes` of waiting time: an ESI 3 patient
+    who has waited that long ranks with an ESI 2 patient arriving now. Since
+    every waiting patient ages at the same rate, the order only depends on
+    esi_level * aging + arrival time, which never changes after insertion, so
+    the index is a sorted set (RankedKeys) kept up to date from creates and
+    deletes in O(log n) instead of being re-sorted.
+    `aging_minutes=0` turns aging off (strict ESI, then arrival). ESI 1
+    always comes first. Assessments older than `window_hours` leave the
+    queue; `rebuild` reloads it from the database.
+    """
+
+    def __init__(self, aging_minutes: float = 60.0, window_hours: float = 12.0):
+        # Without aging a level is worth more than any arrival-time difference
+        self.level_seconds = aging_minutes * 60 if aging_minutes > 0 else 1e10
+        self.window_seconds = window_hours * 3600
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._keys = RankedKeys()
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._by_user: Dict[int, set] = defaultdict(set)
+        self._arrivals: List[Tuple[float, int]] = []  # (arrival, id) min-heap for window expiry, lazily cleaned
+        self._replay: Optional[List[Tuple[str, Any]]] = None
+        self._stats = {"added": 0, "removed": 0, "expired": 0, "rebuilds": 0, "reads": 0}
+        self._read_time = 0.0
+
+    def key(self, assessment_id: int, esi_level: int, arrival: float) -> QueueKey:
+        return (0 if esi_level == 1 else 1, esi_level * self.level_seconds + arrival, assessment_id)
+
+    def _insert(self, entry: Dict[str, Any]):
+        assessment_id = entry["assessment_id"]
+        if assessment_id in self._entries:
+            self._delete(assessment_id)
+        key = self.key(assessment_id, entry["esi_level"], entry["arrival"])
+        entry["key"] = key
+        self._keys.add(key)
+        self._entries[assessment_id] = entry
+        self._by_user[entry["user_id"]].add(assessment_id)
+        heapq.heappush(self._arrivals, (entry["arrival"], assessment_id))
+
+    def _delete(self, assessment_id: int) -> bool:
+        entry = self._entries.pop(assessment_id, None)
+        if entry is None:
+            return False
+        self._keys.remove(entry["key"])
+        user_entries = self._by_user[entry["user_id"]]
+        user_entries.discard(assessment_id)
+        if not user_entries:
+            del self._by_user[entry["user_id"]]
+        return True
+
+    def _expire(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._arrivals and self._arrivals[0][0] < cutoff:
+            arrival, assessment_id = heapq.heappop(self._arrivals)
+            entry = self._entries.get(assessment_id)
+            if entry is not None and entry["arrival"] == arrival:
+                self._delete(assessment_id)
+                self._stats["expired"] += 1
+
+    @staticmethod
+    def entry(assessment_id: int, user_id: int, esi_level: int, created_at: Any) -> Dict[str, Any]:
+        arrival = _timestamp(created_at) if created_at is not None else time.time()
+        return {"assessment_id": assessment_id, "user_id": user_id, "esi_level": esi_level, "arrival": arrival,
+                "created_at": datetime.fromtimestamp(arrival, UTC).isoformat()}
+
+    def add(self, assessment_id: int, user_id: int, esi_level: int, created_at: Any = None):
+        entry = self.entry(assessment_id, user_id, esi_level, created_at)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("add", dict(entry)))
+            if entry["arrival"] >= time.time() - self.window_seconds:
+                self._insert(entry)
+                self._stats["added"] += 1
+
+    def remove(self, assessment_id: int):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(("remove", assessment_id))
+            if self._delete(assessment_id):
+                self._stats["removed"] += 1
+
+    def rebuild(self, load: Callable[[], Iterable[Dict[str, Any]]]):
+        """Replace the index with rows from `load`; adds and removes that land while it reads are re-applied"""
+        with self._rebuild_lock:
+            with self._lock:
+                self._replay = []
+            try:
+                entries = [self.entry(row["id"], row["user_id"], row["esi_level"], row["created_at"]) for row in load()]
+            except Exception:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                replay, self._replay = self._replay, None
+                self._keys, self._entries, self._by_user, self._arrivals = RankedKeys(), {}, defaultdict(set), []
+                cutoff = time.time() - self.window_seconds
+                for entry in entries:
+                    if entry["arrival"] >= cutoff:
+                        self._insert(entry)
+                for op, arg in replay:
+                    if op == "add":
+                        self._insert(arg)
+                    else:
+                        self._delete(arg)
+                self._stats["rebuilds"] += 1
+                size = len(self._keys)
+        logger.info("ED queue rebuilt", extra={"queue_size": size})
+
+    def _view(self, entry: Dict[str, Any], position: int, now: float) -> Dict[str, Any]:
+        return {
+            "position": position,
+            "assessment_id": entry["assessment_id"],
+            "user_id": entry["user_id"],
+            "esi_level": entry["esi_level"],
+            "created_at": entry["created_at"],
+            "waiting_minutes": round((now - entry["arrival"]) / 60, 1),
+        }
+
+    def snapshot(self, limit: int = 20, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Top `limit` waiting patients, plus the given patient's own entries with their positions"""
+        started = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            top = [self._view(self._entries[key[2]], i + 1, now) for i, key in enumerate(self._keys.first(limit))]
+            patient = None
+            if user_id is not None:
+                patient = sorted(
+                    (self._view(self._entries[aid], self._keys.rank(self._entries[aid]["key"]) + 1, now)
+                     for aid in self._by_user.get(user_id, ())),
+                    key=lambda view: view["position"],
+                )
+            size = len(self._keys)
+            self._stats["reads"] += 1
+            self._read_time += time.perf_counter() - started
+        return {"size": size, "top": top, "patient": patient}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._keys)
+            stats["avg_read_us"] = round(1e6 * self._read_time / stats["reads"], 1) if stats["reads"] else None
+        return stats
+
+    def start_refresh(self, refresh: Callable[[], None],
+                      interval: float = float(os.getenv("ED_QUEUE_REFRESH_INTERVAL", "60"))):
+        """Periodic rebuild, picking up assessments written by other instances"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    refresh()
+                except Exception as e:
+                    logger.error("ED queue refresh failed: %s", e)
+        threading.Thread(target=loop, name="ed-queue-refresh", daemon=True).start()
+
+ed_queue = EDQueue(
+    aging_minutes=float(os.getenv("ED_QUEUE_AGING_MINUTES", "60")),
+    window_hours=float(os.getenv("ED_QUEUE_WINDOW_HOURS", "12")),
+)
@@ -8,16 +8,26 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+from app.storage import STORAGE_BACKEND, get_sqlite_client
+
 # Get Supabase credentials - fallback to local development settings if not in env
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 
-logger.info(f"Initializing Supabase client with URL: {supabase_url}")
+if STORAGE_BACKEND == "sqlite":
+    logger.info("Using embedded SQLite storage backend")
+else:
+    logger.info(f"Initializing Supabase client with URL: {supabase_url}")
 
 def get_supabase_client() -> Client:
     """Get Supabase client instance"""
-    logger.info("Creating Supabase client")
     return create_client(supabase_url, supabase_key)
 
+def get_storage_client() -> Client:
+    """Storage client for the backend selected by STORAGE_BACKEND (supabase or sqlite)"""
+    if STORAGE_BACKEND == "sqlite":
+        return get_sqlite_client()
+    return get_supabase_client()
+
 # Create FastAPI dependency
-SupabaseDep = Annotated[Client, Depends(get_supabase_client)]
+SupabaseDep = Annotated[Client, Depends(get_storage_client)]
@@ -0,0 +1,93 @@
+import csv
+import io
+import orjson
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List
+
+EXPORT_COLUMNS = ["id", "notes", "esi_level", "diagnosis", "user_id", "created_at", "updated_at"]
+
+Chunks = Iterable[List[Dict[str, Any]]]
+
+def encode_csv(chunks: Chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def encode_ndjson(chunks: Chunks) -> Iterator[bytes]:
+    for rows in chunks:
+        yield b"".join(
+            orjson.dumps({k: row.get(k) for k in EXPORT_COLUMNS}, option=orjson.OPT_APPEND_NEWLINE)
+            for row in rows
+        )
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are handed off after each row group"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def encode_parquet(chunks: Chunks) -> Iterator[bytes]:
+    """One Parquet row group per chunk, streamed as it is written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("notes", pa.string()),
+        ("esi_level", pa.int32()),
+        ("diagnosis", pa.string()),
+        ("user_id", pa.int64()),
+        ("created_at", pa.string()),
+        ("updated_at", pa.string()),
+    ])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="snappy")
+    try:
+        for rows in chunks:
+            table = pa.Table.from_pylist([{k: row.get(k) for k in EXPORT_COLUMNS} for row in rows], schema=schema)
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def gzip_stream(stream: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for data in stream:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+ENCODERS = {
+    "csv": (encode_csv, "text/csv"),
+    "ndjson": (encode_ndjson, "application/x-ndjson"),
+    "parquet": (encode_parquet, "application/vnd.apache.parquet"),
+}
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from agents.singleflight import SingleFlight
+from app.logging import logger
+
+@dataclass
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: Any
+    expires_at: float
+
+def request_fingerprint(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _is_unique_violation(error: Exception) -> bool:
+    """True when an insert clashed with an existing key (Postgres 23505 via PostgREST, or SQLite)"""
+    if isinstance(error, sqlite3.IntegrityError):
+        return "UNIQUE" in str(error)
+    return getattr(error, "code", None) == "23505"
+
+class IdempotencyStore:
+    """Replays the stored response for a repeated Idempotency-Key.
+
+    Completed responses live in an in-memory LRU in front of the
+    `idempotency_keys` table. Duplicates arriving while the original is still
+    running wait for it: on the same worker through a single-flight registry,
+    across workers by polling the row the original claimed. The claiming
+    worker renews the row's heartbeat every `lease / 3` seconds while it
+    runs, so a claim is only taken over once its worker has stopped renewing
+    it for `lease` seconds, however long the run itself takes.
+    """
+
+    def __init__(
+        self,
+        ttl: float = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")),
+        max_entries: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+        wait_timeout: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "120")),
+        lease: float = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "300")),
+        poll_interval: float = 0.25,
+    ):
+        self.ttl = ttl
+        self.lease = lease
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._cache: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight("idempotency", cost=lambda stored: 0)
+        self._stats = {"executed": 0, "replayed_memory": 0, "replayed_db": 0, "waited": 0, "purged": 0}
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _cache_get(self, cache_key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._cache.get(cache_key)
+            if stored is None:
+                return None
+            if stored.expires_at < time.time():
+                del self._cache[cache_key]
+                return None
+            self._cache.move_to_end(cache_key)
+            return stored
+
+    def _cache_put(self, cache_key: str, stored: StoredResponse):
+        with self._lock:
+            self._cache[cache_key] = stored
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _from_row(row: Dict[str, Any]) -> StoredResponse:
+        expires_at = row["expires_at"]
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        return StoredResponse(
+            request_hash=row["request_hash"],
+            status_code=row["status_code"],
+            body=json.loads(row["response"]),
+            expires_at=expires_at.timestamp()
+        )
+
+    def _select(self, session, scope: str, key: str) -> Optional[Dict[str, Any]]:
+        response = (
+            session.table("idempotency_keys")
+            .select("status,request_hash,status_code,response,created_at,expires_at,heartbeat_at")
+            .eq("scope", scope)
+            .eq("key", key)
+            .gt("expires_at", datetime.now(UTC).isoformat())
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    def _claim(self, session, scope: str, key: str, request_hash: str) -> bool:
+        """Insert an in-progress row; False if another request already holds the key.
+
+        An expired row the purger hasn't removed yet is deleted and the insert retried once.
+        """
+        for _ in range(2):
+            now = datetime.now(UTC)
+            try:
+                session.table("idempotency_keys").insert({
+                    "scope": scope,
+                    "key": key,
+                    "request_hash": request_hash,
+                    "status": "in_progress",
+                    "created_at": now.isoformat(),
+                    "expires_at": (now + timedelta(seconds=self.ttl)).isoformat()
+                }).execute()
+                return True
+            except Exception as e:
+                if not _is_unique_violation(e):
+                    raise
+            expired = (
+                session.table("idempotency_keys").delete()
+                .eq("scope", scope).eq("key", key).lt("expires_at", now.isoformat())
+                .execute()
+            )
+            if not expired.data:
+                return False
+        return False
+
+    def _release(self, session, scope: str, key: str):
+        try:
+            session.table("idempotency_keys").delete().eq("scope", scope).eq("key", key).execute()
+        except Exception as e:
+            logger.error(f"Failed to release idempotency key {scope}/{key}: {e}")
+
+    def _lease_expired(self, row: Dict[str, Any]) -> bool:
+        renewed_at = row.get("heartbeat_at") or row["created_at"]
+        if isinstance(renewed_at, str):
+            renewed_at = datetime.fromisoformat(renewed_at)
+        return renewed_at.timestamp() + self.lease < time.time()
+
+    def _keep_lease(self, session, scope: str, key: str) -> threading.Event:
+        """Renew the claim until the returned event is set"""
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease / 3):
+                try:
+                    session.table("idempotency_keys").update({"heartbeat_at": datetime.now(UTC).isoformat()}) \
+                        .eq("scope", scope).eq("key", key).eq("status", "in_progress").execute()
+                except Exception as e:
+                    logger.error(f"Failed to renew idempotency lease for {scope}/{key}: {e}")
+        threading.Thread(target=renew, name="idempotency-lease", daemon=True).start()
+        return done
+
+    def _wait_for_other_worker(self, session, scope: str, key: str) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + self.wait_timeout
+        self._count("waited")
+        while time.monotonic() < deadline:
+            row = self._select(session, scope, key)
+            if row is None:
+                return None  # original failed and released the key
+            if row["status"] == "completed":
+                return self._from_row(row)
+            if self._lease_expired(row):
+                # The worker holding the key died; let this request take it over
+                self._release(session, scope, key)
+                return None
+            time.sleep(self.poll_interval)
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    def _execute(self, session, scope: str, key: str, request_hash: str,
+                 fn: Callable[[], Tuple[int, Any]]) -> StoredResponse:
+        for _ in range(2):
+            row = self._select(session, scope, key)
+            if row is not None and row["status"] == "completed":
+                self._count("replayed_db")
+                return self._from_row(row)
+            if row is None and self._claim(session, scope, key, request_hash):
+                break
+            stored = self._wait_for_other_worker(session, scope, key)
+            if stored is not None:
+                self._count("replayed_db")
+                return stored
+        else:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+        lease = self._keep_lease(session, scope, key)
+        try:
+            status_code, body = fn()
+        except BaseException:
+            self._release(session, scope, key)
+            raise
+        finally:
+            lease.set()
+        self._count("executed")
+        stored = StoredResponse(request_hash, status_code, body, time.time() + self.ttl)
+        try:
+            session.table("idempotency_keys").update({
+                "status": "completed",
+                "status_code": status_code,
+                "response": json.dumps(body, default=str)
+            }).eq("scope", scope).eq("key", key).execute()
+        except Exception as e:
+            logger.error(f"Failed to persist idempotent response for {scope}/{key}: {e}")
+        return stored
+
+    def run(self, session, scope: str, key: str, payload: Any, fn: Callable[[], Tuple[int, Any]]) -> JSONResponse:
+        """Run fn once per (scope, key); fn returns (status_code, JSON-serializable body)"""
+        request_hash = request_fingerprint(payload)
+        cache_key = f"{scope}:{key}"
+        executed = []
+
+        def execute():
+            executed.append(True)
+            return fn()
+
+        stored = self._cache_get(cache_key)
+        if stored is None:
+            # Same-worker duplicates join the leader's execution instead of polling the table
+            stored = self._flight.do(cache_key, lambda: self._execute(session, scope, key, request_hash, execute))
+            self._cache_put(cache_key, stored)
+        else:
+            self._count("replayed_memory")
+        replayed = not executed
+        if stored.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+        return JSONResponse(
+            status_code=stored.status_code,
+            content=stored.body,
+            headers={"Idempotent-Replayed": "true" if replayed else "false"}
+        )
+
+    def purge_expired(self, session) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, v in self._cache.items() if v.expires_at < now]
+            for k in expired:
+                del self._cache[k]
+        response = session.table("idempotency_keys").delete().lt("expires_at", datetime.now(UTC).isoformat()).execute()
+        purged = len(expired) + len(response.data or [])
+        self._count("purged", purged)
+        return purged
+
+    def start_purger(self, client_factory: Callable, interval: float = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))):
+        """Background TTL cleanup of the in-memory cache and the table"""
+        def loop():
+            while True:
+                try:
+                    self.purge_expired(client_factory())
+                except Exception as e:
+                    logger.error(f"Idempotency key cleanup failed: {e}")
+                time.sleep(interval)
+        threading.Thread(target=loop, name="idempotency-purger", daemon=True).start()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "cached": len(self._cache)}
+
+idempotency_store = IdempotencyStore()
@@ -1,5 +1,203 @@
+import atexit
 import logging
+import os
+import queue
+import random
+import threading
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
\ No newline at end of file
+import orjson
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName", "color_message"}
+
+def _truncate(text: str, limit: int) -> str:
+    if limit and len(text) > limit:
+        return f"{text[:limit]}...[{len(text) - limit} more chars]"
+    return text
+
+def _parse_mapping(spec: str) -> Dict[str, str]:
+    """"a.b=0.1,c=WARNING" -> {"a.b": "0.1", "c": "WARNING"}"""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): value.strip() for name, value in pairs}
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per record (or a plain line with `json_output=False`), long values truncated.
+
+    Runs on the listener thread, so %-style arguments are only rendered there.
+    """
+
+    def __init__(self, json_output: bool = True, max_chars: int = 2000):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.json_output = json_output
+        self.max_chars = max_chars
+
+    def fields(self, record: logging.LogRecord) -> Dict:
+        return {key: _truncate(value, self.max_chars) if isinstance(value, str) else value
+                for key, value in vars(record).items() if key not in _RECORD_ATTRS and not key.startswith("_")}
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = _truncate(record.getMessage(), self.max_chars)
+        if not self.json_output:
+            record.message = message
+            record.asctime = self.formatTime(record)
+            line = self.formatMessage(record) + "".join(f" {k}={v}" for k, v in self.fields(record).items())
+            if record.exc_info:
+                line += "\n" + self.formatException(record.exc_info)
+            return line
+        # Cloud Logging (Cloud Run) reads severity, message and time from JSON lines on stderr
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": message,
+            **self.fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = _truncate(self.formatException(record.exc_info), 4 * self.max_chars)
+        return orjson.dumps(entry, default=lambda v: _truncate(str(v), self.max_chars)).decode()
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of sub-WARNING records per logger (the most specific configured prefix wins)"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}
+        self.sampled_out = 0  # unlocked: approximate under contention, but no lock on the logging call
+
+    def rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread as-is (no formatting on the caller).
+
+    When the queue is full, records below WARNING are dropped. WARNING and above
+    wait up to `block_timeout` seconds for room, then are written synchronously
+    through `fallback` (the listener's own output handler), so errors are never lost.
+    """
+
+    def __init__(self, log_queue: queue.Queue, fallback: Optional[logging.Handler] = None,
+                 block_timeout: float = 0.05):
+        super().__init__(log_queue)
+        self.fallback = fallback
+        self.block_timeout = block_timeout
+        # Unlocked counters, as in SamplingFilter
+        self.enqueued = 0
+        self.dropped = 0
+        self.written_directly = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same-process queue: nothing needs pickling, so rendering is left to the formatter.
+        # Arguments are rendered when the listener gets to them; don't log objects you mutate right after.
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+            return
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+        try:
+            self.queue.put(record, timeout=self.block_timeout)
+            self.enqueued += 1
+        except queue.Full:
+            if self.fallback is None:
+                self.dropped += 1
+                return
+            # StreamHandler.handle takes its own lock, so this can't interleave with the listener's writes
+            self.fallback.handle(record)
+            self.written_directly += 1
+
+class LogPipeline:
+    """Root logging setup: callers enqueue, one background listener formats and writes.
+
+    Settings: LOG_LEVEL (default INFO), LOG_LEVELS ("httpx=WARNING,agents=DEBUG"),
+    LOG_SAMPLING ("uvicorn.access=0.05,app=0.5", applied below WARNING),
+    LOG_FORMAT (json or text), LOG_MAX_CHARS (per message/field, default 2000),
+    LOG_ASYNC (default true) and LOG_QUEUE_SIZE (default 10000).
+    """
+
+    def __init__(self):
+        self.level = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.levels = _parse_mapping(os.getenv("LOG_LEVELS", ""))
+        self.sampling = {name: float(rate) for name, rate in _parse_mapping(os.getenv("LOG_SAMPLING", "")).items()}
+        self.json_output = os.getenv("LOG_FORMAT", "json").lower() == "json"
+        self.max_chars = int(os.getenv("LOG_MAX_CHARS", "2000"))
+        self.async_enabled = os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+        self.queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        self.handler: Optional[logging.Handler] = None
+        self.sampler = SamplingFilter(self.sampling)
+        self._listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    def start(self, stream=None):
+        with self._lock:
+            if self.handler is not None:
+                return
+            output = logging.StreamHandler(stream)
+            output.setFormatter(StructuredFormatter(self.json_output, self.max_chars))
+            if self.async_enabled:
+                self.handler = NonBlockingQueueHandler(queue.Queue(self.queue_size), fallback=output)
+                self._listener = QueueListener(self.handler.queue, output, respect_handler_level=False)
+                self._listener.start()
+            else:
+                self.handler = output
+            self.handler.addFilter(self.sampler)
+            root = logging.getLogger()
+            for existing in list(root.handlers):
+                root.removeHandler(existing)
+            root.addHandler(self.handler)
+            root.setLevel(self.level)
+            for name, level in self.levels.items():
+                logging.getLogger(name).setLevel(level.upper())
+            # uvicorn installs its own synchronous handlers (access log on every request) before importing the app
+            for name in ("uvicorn", "uvicorn.access"):
+                uvicorn_logger = logging.getLogger(name)
+                if uvicorn_logger.handlers:
+                    uvicorn_logger.handlers = [self.handler]
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Flush queued records and stop the listener"""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+
+    def stats(self) -> Dict:
+        handler = self.handler
+        stats = {"async": isinstance(handler, NonBlockingQueueHandler), "format": "json" if self.json_output else "text",
+                 "sampled_out": self.sampler.sampled_out}
+        if isinstance(handler, NonBlockingQueueHandler):
+            stats.update(enqueued=handler.enqueued, dropped=handler.dropped, written_directly=handler.written_directly,
+                         queue_depth=handler.queue.qsize())
+        return stats
+
+log_pipeline = LogPipeline()
+log_pipeline.start()
+logger = logging.getLogger(__name__)
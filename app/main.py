@@ -1,16 +1,31 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse
+from agents.admission import LLMOverloadedError
+from agents.resilience import CircuitOpenError
+from agents.checkpoints import triage_checkpoints
 from agents.triageagent import run_triage_workflow
 from agents.nursebot import NURSEBOT_SYSINT, WELCOME_MSG, llm_with_tools
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from app.engine import SupabaseDep
+from app.engine import SupabaseDep, get_storage_client
+from app.storage import STORAGE_BACKEND
+from app.repository.AssessmentRepository import AssessmentRepository
+from app.repository.AssessmentWriteBuffer import WRITE_BEHIND_ENABLED, assessment_write_buffer
+from app.idempotency import idempotency_store
+from app.ed_queue import ed_queue
+from agents.shared_cache import shared_store
+from app.replicas import ReadSessionMiddleware, read_replicas
+from app.logging import logger
 from app.routers.AssessmentRouter import AssessmentRouter
 from app.routers.TriageRouter import TriageRouter
 from app.routers.UserRouter import UserRouter
+from app.routers.MetricsRouter import MetricsRouter
+from app.routers.QueueRouter import QueueRouter
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(
     title="AI Triage API",
-    ignore_trailing_slash=True
+    ignore_trailing_slash=True,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for Cloud Run
@@ -22,10 +37,103 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Read-your-writes stickiness is keyed on the calling client
+app.add_middleware(ReadSessionMiddleware)
+
 # Routers
 app.include_router(AssessmentRouter, prefix="/api/v1")
 app.include_router(TriageRouter, prefix="/api/v1")
 app.include_router(UserRouter, prefix="/api/v1")
+app.include_router(MetricsRouter, prefix="/api/v1")
+app.include_router(QueueRouter, prefix="/api/v1")
+
+@app.exception_handler(LLMOverloadedError)
+def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    """Shed load with 429 instead of letting requests pile up behind the LLM"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Service is busy, please retry shortly", "reason": exc.reason},
+        headers={"Retry-After": str(max(1, int(min(exc.retry_after, 3600) + 0.999)))}
+    )
+
+@app.on_event("startup")
+def build_note_index():
+    """Load past notes into the near-duplicate similarity index"""
+    try:
+        AssessmentRepository(get_storage_client()).load_note_index()
+    except Exception as e:
+        logger.error(f"Failed to build note similarity index: {e}")
+
+@app.on_event("startup")
+def build_ed_queue():
+    """Load waiting patients into the ED queue and keep it refreshed"""
+    try:
+        AssessmentRepository(get_storage_client()).load_ed_queue()
+    except Exception as e:
+        logger.error("Failed to build ED queue: %s", e)
+    ed_queue.start_refresh(lambda: AssessmentRepository(get_storage_client()).load_ed_queue())
+
+@app.exception_handler(TimeoutError)
+def llm_timeout_handler(request: Request, exc: TimeoutError):
+    """An LLM call ran past its deadline (not retried while it is still running)"""
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "Triage service timed out, please retry shortly"}
+    )
+
+@app.exception_handler(CircuitOpenError)
+def llm_circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Fail fast while the LLM provider is degraded"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Triage service temporarily unavailable, please retry shortly"},
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))}
+    )
+
+@app.on_event("startup")
+def ensure_assessment_partitions():
+    """Create upcoming monthly partitions in case pg_cron isn't scheduling it"""
+    if STORAGE_BACKEND != "supabase":
+        return
+    try:
+        get_storage_client().rpc("ensure_assessments_partitions", {"months_ahead": 3}).execute()
+    except Exception as e:
+        logger.error(f"Failed to ensure assessment partitions: {e}")
+
+@app.on_event("startup")
+def start_shared_cache():
+    """Listen for cache invalidations from other workers"""
+    shared_store.start()
+
+@app.on_event("startup")
+def start_replica_probe():
+    """Measure read replica lag before routing reads to them"""
+    read_replicas.start()
+
+@app.on_event("startup")
+def start_write_behind():
+    """Replay journaled assessments and start the background flusher"""
+    if WRITE_BEHIND_ENABLED:
+        assessment_write_buffer.start()
+
+@app.on_event("startup")
+def start_idempotency_purger():
+    """Expire stored Idempotency-Key responses past their TTL"""
+    idempotency_store.start_purger(get_storage_client)
+
+@app.on_event("startup")
+def start_checkpoint_gc():
+    """Drop checkpoints of finished and abandoned triage runs"""
+    triage_checkpoints.start_gc()
+
+@app.on_event("shutdown")
+def stop_replica_probe():
+    read_replicas.stop()
+
+@app.on_event("shutdown")
+def stop_write_behind():
+    if WRITE_BEHIND_ENABLED:
+        assessment_write_buffer.stop()
 
 @app.get("/")
 def root():
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from datetime import datetime, timezone
 from typing import List, Dict, Optional
 from enum import Enum
 
@@ -15,11 +15,21 @@ class ChatResponse(BaseModel):
 
 class TriageRequest(BaseModel):
     note: str
+    run_id: Optional[str] = Field(None, max_length=128)  # retrying with the same run id resumes its checkpoint
 
 class TriageResponse(BaseModel):
     esi: str
     diagnosis: str
     iterations: int
+    run_id: Optional[str] = None
+
+class TriageRunState(BaseModel):
+    run_id: str
+    status: str
+    completed: bool
+    next_step: Optional[str] = None
+    iterations: int
+    completed_llm_calls: int
 
 class PatientAssessment(BaseModel):
     id: Optional[int] = None
@@ -30,16 +40,61 @@ class PatientAssessment(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    def model_dump(self, **kwargs):
-        data = super().model_dump(**kwargs)
-        # Remove None values to let database defaults handle them
-        return {k: v for k, v in data.items() if v is not None and k != 'id'}
+    def insert_payload(self) -> dict:
+        # Leave None values and id out to let database defaults handle them
+        return self.model_dump(mode="json", exclude_none=True, exclude={"id"})
 
     class Config:
         json_encoders = {
             datetime: lambda dt: dt.isoformat()
         }
 
+class AssessmentFilters(BaseModel):
+    user_id: Optional[int] = None
+    esi_level: Optional[int] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    @field_validator("created_after", "created_before")
+    @classmethod
+    def assume_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Stored timestamps are UTC; a bound without an offset is read as UTC too
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+class AssessmentSearchResult(PatientAssessment):
+    rank: float
+    notes_headline: str
+    diagnosis_headline: str
+
+class AssessmentSearchPage(BaseModel):
+    query: str
+    results: List[AssessmentSearchResult]
+    limit: int
+    has_more: bool
+    # Pass back as after_rank/after_id to fetch the next page
+    next_after_rank: Optional[float] = None
+    next_after_id: Optional[int] = None
+
+class QueueEntry(BaseModel):
+    position: int
+    assessment_id: int
+    user_id: int
+    esi_level: int
+    created_at: datetime
+    waiting_minutes: float
+
+class QueueView(BaseModel):
+    size: int
+    top: List[QueueEntry]
+    patient: Optional[List[QueueEntry]] = None
+
 class UserType(str, Enum):
     PATIENT = "patient"
     STAFF = "staff"
@@ -54,9 +109,8 @@ class User(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    def model_dump(self, **kwargs):
-        data = super().model_dump(**kwargs)
-        return {k: v for k, v in data.items() if v is not None and k != 'id'}
+    def insert_payload(self) -> dict:
+        return self.model_dump(mode="json", exclude_none=True, exclude={"id"})
 
     class Config:
         json_encoders = {
@@ -0,0 +1,232 @@
+import contextvars
+import hashlib
+import hmac
+import itertools
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from supabase import create_client
+
+from app.logging import logger
+from app.storage import STORAGE_BACKEND
+
+# Who is reading, set per request from a server-issued X-Read-Session token, so a client's own writes stay
+# visible to it
+read_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("read_session", default=None)
+
+READ_SESSION_HEADER = "X-Read-Session"
+# Shared by every instance so any of them accepts the others' tokens; SUPABASE_KEY already is
+_READ_SESSION_SECRET = hashlib.sha256(
+    ("read-session:" + (os.getenv("READ_SESSION_SECRET") or os.getenv("SUPABASE_KEY") or secrets.token_hex(32)))
+    .encode("utf-8")
+).digest()
+
+def _sign(session_id: str) -> str:
+    return hmac.new(_READ_SESSION_SECRET, session_id.encode("ascii"), hashlib.sha256).hexdigest()[:32]
+
+def issue_read_session() -> Tuple[str, str]:
+    """A new session id and the token a client sends back to keep it"""
+    session_id = secrets.token_hex(16)
+    return session_id, f"{session_id}.{_sign(session_id)}"
+
+def verify_read_session(token: str) -> Optional[str]:
+    """The session id of a token this service issued, else None"""
+    session_id, _, signature = token.partition(".")
+    if not session_id.isalnum() or len(session_id) != 32 or not hmac.compare_digest(signature, _sign(session_id)):
+        return None
+    return session_id
+
+@dataclass
+class Replica:
+    url: str
+    client: Any
+    lag: Optional[float] = None  # seconds behind the primary, None until the first good probe
+    latency: Optional[float] = None  # probe round trip (EWMA), seconds
+    healthy: bool = False
+    reads: int = 0
+    probe_failures: int = 0
+
+class ReadReplicas:
+    """Sends repository reads to Postgres read replicas; writes stay on the primary.
+
+    Replicas are Supabase/PostgREST endpoints sharing the primary's key. A
+    background probe calls `replica_lag()` on each one every `probe_interval`
+    seconds; a replica more than `max_lag` seconds behind, not streaming
+    from the primary (lag unknown), or whose last probe failed, gets no reads
+    until its next good probe. `policy` picks among the rest: round_robin, or
+    least_latency by probe round trip. Reads go to the primary when no
+    replica qualifies, and for `sticky_seconds` after the same client's last
+    write (at least `max_lag` plus a probe interval, since a replica can fall
+    that far behind between probes, so any replica that qualifies afterwards
+    already has the write).
+    """
+
+    def __init__(self, urls: List[str], key: Optional[str], policy: str = "round_robin", max_lag: float = 5.0,
+                 sticky_seconds: float = 5.0, probe_interval: float = 5.0,
+                 client_factory: Callable[[str, str], Any] = create_client, max_sessions: int = 10000):
+        if policy not in ("round_robin", "least_latency"):
+            raise ValueError(f"Unknown replica policy '{policy}'")
+        self.policy = policy
+        self.max_lag = max_lag
+        self.sticky_seconds = max(sticky_seconds, max_lag + probe_interval)
+        self.probe_interval = probe_interval
+        self.max_sessions = max_sessions
+        self.replicas = [Replica(url, client_factory(url, key)) for url in urls]
+        self._writes: Dict[str, float] = {}
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"primary_sticky": 0, "primary_fallback": 0, "writes_recorded": 0}
+
+    @classmethod
+    def from_env(cls) -> "ReadReplicas":
+        """SUPABASE_READ_URLS (comma separated) with the primary's SUPABASE_KEY; only for the supabase backend"""
+        urls = [url.strip() for url in os.getenv("SUPABASE_READ_URLS", "").split(",") if url.strip()]
+        if STORAGE_BACKEND != "supabase":
+            urls = []
+        return cls(
+            urls,
+            os.getenv("SUPABASE_KEY"),
+            policy=os.getenv("REPLICA_POLICY", "round_robin").lower(),
+            max_lag=float(os.getenv("REPLICA_MAX_LAG", "5")),
+            sticky_seconds=float(os.getenv("READ_YOUR_WRITES_SECONDS", "5")),
+            probe_interval=float(os.getenv("REPLICA_PROBE_INTERVAL", "5")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def record_write(self, session_key: Optional[str] = None, delay: float = 0.0):
+        """Pin the client's reads to the primary until its write has reached the replicas.
+
+        `delay` is how much later the write may reach the primary (deferred writes).
+        """
+        if not self.enabled:
+            return
+        session_key = session_key or read_session.get()
+        if session_key is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._writes[session_key] = max(now + delay, self._writes.get(session_key, now))
+            self._stats["writes_recorded"] += 1
+            if len(self._writes) > self.max_sessions:
+                self._writes = {k: t for k, t in self._writes.items() if now - t < self.sticky_seconds}
+
+    def reader(self, primary: Any) -> Any:
+        """Client for a read query: a replica in sync enough for this client, else the primary"""
+        if not self.enabled:
+            return primary
+        session_key = read_session.get()
+        now = time.monotonic()
+        with self._lock:
+            if session_key is not None and now - self._writes.get(session_key, float("-inf")) < self.sticky_seconds:
+                self._stats["primary_sticky"] += 1
+                return primary
+            candidates = [r for r in self.replicas if r.healthy and r.lag is not None and r.lag <= self.max_lag]
+            if not candidates:
+                self._stats["primary_fallback"] += 1
+                return primary
+            if self.policy == "least_latency":
+                replica = min(candidates, key=lambda r: r.latency)
+            else:
+                replica = candidates[next(self._rr) % len(candidates)]
+            replica.reads += 1
+        return replica.client
+
+    def probe(self):
+        """Measure lag and round trip for every replica"""
+        for replica in self.replicas:
+            started = time.perf_counter()
+            try:
+                lag = replica.client.rpc("replica_lag", {}).execute().data
+            except Exception as e:
+                with self._lock:
+                    replica.healthy = False
+                    replica.probe_failures += 1
+                logger.warning("Read replica probe failed for %s: %s", replica.url, e)
+                continue
+            elapsed = time.perf_counter() - started
+            if lag is None:
+                # No WAL receiver: disconnected from the primary, so its lag is unknown
+                with self._lock:
+                    replica.lag = None
+                    replica.healthy = False
+                logger.warning("Read replica %s is not streaming from the primary", replica.url)
+                continue
+            with self._lock:
+                replica.lag = float(lag)
+                replica.latency = elapsed if replica.latency is None else 0.7 * replica.latency + 0.3 * elapsed
+                replica.healthy = True
+
+    def _run(self):
+        while not self._stopping.wait(self.probe_interval):
+            self.probe()
+
+    def start(self):
+        """Probe once, so routing starts right away, then keep probing in the background"""
+        if not self.enabled or self._thread is not None:
+            return
+        self.probe()
+        self._thread = threading.Thread(target=self._run, name="replica-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            replicas = [{"url": r.url, "healthy": r.healthy, "lag_s": r.lag,
+                         "latency_ms": round(1000 * r.latency, 1) if r.latency is not None else None,
+                         "reads": r.reads, "probe_failures": r.probe_failures} for r in self.replicas]
+            stats = dict(self._stats)
+        replica_reads = sum(r["reads"] for r in replicas)
+        primary_reads = stats["primary_sticky"] + stats["primary_fallback"]
+        total = replica_reads + primary_reads
+        return {"enabled": True, "policy": self.policy, "max_lag_s": self.max_lag, **stats,
+                "replica_read_ratio": round(replica_reads / total, 4) if total else None, "replicas": replicas}
+
+class ReadSessionMiddleware:
+    """Sets `read_session` for each HTTP request (plain ASGI, so no per-request task or body wrapping).
+
+    The key comes from a signed X-Read-Session token this service issued, never from a client-chosen
+    value or an address (behind a proxy every client would share one). A request without a valid token
+    gets a fresh session and its token in the response; clients that send it back keep read-your-writes,
+    and the rest simply never share stickiness with anyone else.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = dict(scope["headers"]).get(READ_SESSION_HEADER.lower().encode("ascii"))
+        session_id = verify_read_session(token.decode("latin-1")) if token else None
+        if session_id is not None:
+            read_session.set(session_id)
+            await self.app(scope, receive, send)
+            return
+        session_id, issued = issue_read_session()
+        read_session.set(session_id)
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []),
+                                      (READ_SESSION_HEADER.lower().encode("ascii"), issued.encode("ascii"))]
+            await send(message)
+        await self.app(scope, receive, send_with_token)
+
+read_replicas = ReadReplicas.from_env()
@@ -1,12 +1,53 @@
-from app.models import PatientAssessment
-from datetime import datetime, UTC
+import os
+from app.models import PatientAssessment, AssessmentSearchResult, AssessmentFilters
+from datetime import datetime, UTC, timedelta
 from app.engine import SupabaseDep
-from typing import Optional, List
+from app.replicas import read_replicas
+from app.ed_queue import ed_queue
+from typing import Optional, List, Tuple, Iterator, Dict, Any
+from pydantic import TypeAdapter
+from agents.similarity import index_payload, note_index
+
+# Explicit column list keeps the generated search_vector off the wire
+ASSESSMENT_COLUMNS = "id,notes,esi_level,diagnosis,user_id,created_at,updated_at"
+QUEUE_COLUMNS = "id,user_id,esi_level,created_at"
+
+# Search ranks at most this many of the newest matches, so a common term can't rank the whole table
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "2000"))
+
+# Rows come from our own table, so a list is validated in one pydantic-core pass
+_assessment_list = TypeAdapter(List[PatientAssessment])
+
+def index_assessment(assessment: PatientAssessment):
+    """Keep the near-duplicate note index and the ED queue in step with stored assessments"""
+    payload = index_payload(assessment.esi_level, assessment.diagnosis)
+    if payload is not None:
+        note_index.add(assessment.id, assessment.notes, payload)
+    ed_queue.add(assessment.id, assessment.user_id, assessment.esi_level, assessment.created_at)
+
+def apply_filters(query, filters: Optional[AssessmentFilters]):
+    """Apply the list/export filters to a Supabase query builder"""
+    if filters is None:
+        return query
+    if filters.user_id is not None:
+        query = query.eq("user_id", filters.user_id)
+    if filters.esi_level is not None:
+        query = query.eq("esi_level", filters.esi_level)
+    if filters.created_after is not None:
+        query = query.gte("created_at", filters.created_after.isoformat())
+    if filters.created_before is not None:
+        query = query.lt("created_at", filters.created_before.isoformat())
+    return query
 
 class AssessmentRepository:
     def __init__(self, session: SupabaseDep):
         self.session = session
 
+    @property
+    def reads(self):
+        """Client for read queries: a read replica unless this client just wrote or the replicas lag"""
+        return read_replicas.reader(self.session)
+
     def create(self, notes: str, esi_level: int, diagnosis: str, user_id: int) -> PatientAssessment:
         assessment = PatientAssessment(
             notes=notes,
@@ -14,20 +55,111 @@ class AssessmentRepository:
             diagnosis=diagnosis,
             user_id=user_id
         )
-        response = self.session.table("assessments").insert(assessment.model_dump()).execute()
-        return PatientAssessment(**response.data[0])
+        response = self.session.table("assessments").insert(assessment.insert_payload()).execute()
+        read_replicas.record_write()
+        created = PatientAssessment(**response.data[0])
+        index_assessment(created)
+        return created
+
+    def get_all_rows(self, filters: Optional[AssessmentFilters] = None) -> List[Dict[str, Any]]:
+        """Raw rows for read paths that serialize straight back out, in id order so equal data gives equal bytes"""
+        query = apply_filters(self.reads.table("assessments").select(ASSESSMENT_COLUMNS), filters)
+        return query.order("id").execute().data
+
+    def watermark(self, filters: Optional[AssessmentFilters] = None) -> Dict[str, Any]:
+        """Row count, max id and max updated_at of the filtered set: changes whenever a listing's rows do"""
+        filters = filters or AssessmentFilters()
+        response = self.reads.rpc("assessments_watermark", {
+            "p_user_id": filters.user_id,
+            "p_esi_level": filters.esi_level,
+            "p_created_after": filters.created_after.isoformat() if filters.created_after else None,
+            "p_created_before": filters.created_before.isoformat() if filters.created_before else None,
+        }).execute()
+        return response.data[0] if response.data else {}
+
+    def recent_filters(self, days: int, filters: Optional[AssessmentFilters] = None) -> AssessmentFilters:
+        """Filters narrowed to the last `days` days"""
+        filters = (filters or AssessmentFilters()).model_copy()
+        since = datetime.now(UTC) - timedelta(days=days)
+        if filters.created_after is None or filters.created_after < since:
+            filters.created_after = since
+        return filters
 
-    def get_all(self) -> List[PatientAssessment]:
-        response = self.session.table("assessments").select("*").execute()
-        return [PatientAssessment(**item) for item in response.data]
+    def get_all(self, filters: Optional[AssessmentFilters] = None) -> List[PatientAssessment]:
+        return _assessment_list.validate_python(self.get_all_rows(filters))
 
-    def get_by_id(self, assessment_id: int) -> Optional[PatientAssessment]:
-        response = self.session.table("assessments").select("*").eq("id", assessment_id).execute()
+    def iter_rows(self, chunk_size: int = 500, after_id: int = 0,
+                  filters: Optional[AssessmentFilters] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Stream raw assessment rows in id order, one chunk at a time (keyset pagination)"""
+        while True:
+            query = self.reads.table("assessments").select(ASSESSMENT_COLUMNS).gt("id", after_id)
+            response = apply_filters(query, filters).order("id").limit(chunk_size).execute()
+            if not response.data:
+                return
+            yield response.data
+            if len(response.data) < chunk_size:
+                return
+            after_id = response.data[-1]["id"]
+
+    def iter_all(self, chunk_size: int = 500, after_id: int = 0,
+                 filters: Optional[AssessmentFilters] = None) -> Iterator[List[PatientAssessment]]:
+        """Stream assessments in id order, one chunk at a time"""
+        for rows in self.iter_rows(chunk_size, after_id, filters):
+            yield _assessment_list.validate_python(rows)
+
+    def get_by_id(self, assessment_id: int, created_at: Optional[datetime] = None) -> Optional[PatientAssessment]:
+        """Look up an assessment; passing created_at lets Postgres prune to a single partition"""
+        query = self.reads.table("assessments").select(ASSESSMENT_COLUMNS).eq("id", assessment_id)
+        if created_at is not None:
+            query = query.eq("created_at", created_at.isoformat())
+        response = query.execute()
         return PatientAssessment(**response.data[0]) if response.data else None
 
+    def get_recent_rows(self, days: int, filters: Optional[AssessmentFilters] = None) -> List[Dict[str, Any]]:
+        """Rows from the last `days` days; the created_at bound keeps the scan to recent partitions"""
+        return self.get_all_rows(self.recent_filters(days, filters))
+
+    def search(self, query: str, limit: int = 20, after_rank: Optional[float] = None,
+               after_id: Optional[int] = None) -> Tuple[List[AssessmentSearchResult], bool]:
+        """Full-text search over notes and diagnoses, ranked and highlighted.
+
+        Pages continue after the (rank, id) of the previous page's last row.
+        Returns the page of results and whether another page exists.
+        """
+        response = self.reads.rpc("search_assessments", {
+            "q": query,
+            "page_limit": limit + 1,  # one extra row tells us if there is a next page
+            "after_rank": after_rank,
+            "after_id": after_id,
+            "max_candidates": SEARCH_MAX_CANDIDATES
+        }).execute()
+        rows = response.data or []
+        return [AssessmentSearchResult(**item) for item in rows[:limit]], len(rows) > limit
+
+    def load_note_index(self):
+        """Rebuild the near-duplicate note index from the assessments table"""
+        note_index.rebuild(
+            (a.id, a.notes, payload)
+            for a in self.get_all()
+            if (payload := index_payload(a.esi_level, a.diagnosis)) is not None
+        )
+
+    def load_ed_queue(self):
+        """Rebuild the ED queue from assessments inside its waiting window (four columns, recent partitions only).
+
+        Reads the primary: the rebuild replaces the whole index, so a lagging replica would drop patients
+        created since its last replayed write.
+        """
+        since = datetime.now(UTC) - timedelta(seconds=ed_queue.window_seconds)
+        ed_queue.rebuild(lambda: self.session.table("assessments").select(QUEUE_COLUMNS)
+                         .gte("created_at", since.isoformat()).order("id").execute().data)
+
     def delete_by_id(self, assessment_id: int) -> bool:
-        assessment = self.get_by_id(assessment_id)
-        if assessment:
-            self.session.table("assessments").delete().eq("id", assessment_id).execute()
+        # Single statement: a lookup first would scan every partition a second time
+        response = self.session.table("assessments").delete().eq("id", assessment_id).execute()
+        if response.data:
+            read_replicas.record_write()
+            note_index.remove(assessment_id)
+            ed_queue.remove(assessment_id)
             return True
         return False
@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import UTC, datetime
+from typing import Callable, Dict, List, Optional
+
+from app.engine import get_storage_client
+from app.logging import logger
+from app.models import PatientAssessment
+from app.replicas import read_replicas
+from app.repository.AssessmentRepository import AssessmentRepository, index_assessment
+
+def _is_data_error(error: Exception) -> bool:
+    """True when the database rejected the rows themselves, so retrying the same batch cannot succeed"""
+    if isinstance(error, (sqlite3.IntegrityError, sqlite3.DataError)):
+        return True
+    # Postgres SQLSTATE classes 22 (data exception) and 23 (integrity constraint violation), via PostgREST
+    return str(getattr(error, "code", "") or "")[:2] in ("22", "23")
+
+class AssessmentWriteBuffer:
+    """Write-behind buffer for assessment inserts.
+
+    Each enqueued assessment is first committed to a local SQLite journal (WAL
+    mode), so it survives a process crash, and is then inserted into Supabase
+    in batches by a background flusher. Anything left in the journal at
+    startup is replayed. Each row carries a write key and its creation time,
+    so a batch re-sent after a crash between the Supabase insert and the
+    journal delete is skipped as a duplicate. If a batch is rejected for its
+    data (a constraint or type error), its rows are retried one by one and
+    the ones still rejected move to the journal's dead_letter table instead
+    of blocking the rows behind them; any other error retries with backoff.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable,
+        journal_path: str = os.getenv("ASSESSMENT_JOURNAL_PATH", ".data/assessment_journal.db"),
+        batch_size: int = int(os.getenv("ASSESSMENT_FLUSH_BATCH", "100")),
+        flush_interval: float = float(os.getenv("ASSESSMENT_FLUSH_INTERVAL", "0.5")),
+    ):
+        self.client_factory = client_factory
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._latencies = deque(maxlen=500)
+        self._stats = {"enqueued": 0, "flushed": 0, "batches": 0, "failures": 0, "replayed": 0, "dead_lettered": 0,
+                       "last_batch_s": 0.0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.journal_path, check_same_thread=False, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")  # durable across process crashes in WAL mode
+            conn.execute(
+                "create table if not exists pending ("
+                "seq integer primary key autoincrement, payload text not null, enqueued_at real not null)"
+            )
+            conn.execute(
+                "create table if not exists dead_letter ("
+                "seq integer primary key, payload text not null, enqueued_at real not null, "
+                "error text not null, failed_at real not null)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def enqueue(self, assessment: PatientAssessment) -> int:
+        """Journal the assessment and return its journal sequence number"""
+        now = datetime.now(UTC)
+        payload = {
+            **assessment.insert_payload(),
+            "write_key": str(uuid.uuid4()),
+            # Part of the dedupe key (assessments is partitioned on created_at), so fixed at enqueue time
+            "created_at": now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}+00:00",
+        }
+        with self._lock:
+            cur = self._connect().execute(
+                "insert into pending (payload, enqueued_at) values (?, ?)", (json.dumps(payload), now.timestamp())
+            )
+            self._stats["enqueued"] += 1
+        self._wake.set()
+        return cur.lastrowid
+
+    def _next_batch(self) -> List[tuple]:
+        with self._lock:
+            return self._connect().execute(
+                "select seq, payload, enqueued_at from pending order by seq limit ?", (self.batch_size,)
+            ).fetchall()
+
+    @staticmethod
+    def _insert(client, rows: List[dict]) -> List[dict]:
+        # Rows already stored by an interrupted flush are skipped rather than duplicated
+        return client.table("assessments").upsert(
+            rows, on_conflict="write_key,created_at", ignore_duplicates=True
+        ).execute().data or []
+
+    def _dead_letter(self, entry: tuple, error: Exception):
+        seq, payload, enqueued_at = entry
+        with self._lock:
+            conn = self._connect()
+            conn.execute("begin immediate")
+            conn.execute(
+                "insert or replace into dead_letter (seq, payload, enqueued_at, error, failed_at) values (?, ?, ?, ?, ?)",
+                (seq, payload, enqueued_at, str(error)[:2000], time.time())
+            )
+            conn.execute("delete from pending where seq = ?", (seq,))
+            conn.execute("commit")
+            self._stats["dead_lettered"] += 1
+        logger.error(f"Assessment write-behind row {seq} moved to the dead-letter table: {error}")
+
+    def _flush_rows(self, client, batch: List[tuple]) -> List[dict]:
+        """Insert a rejected batch row by row, dead-lettering the rows that are rejected on their own"""
+        inserted = []
+        for entry in batch:
+            try:
+                inserted.extend(self._insert(client, [json.loads(entry[1])]))
+            except Exception as e:
+                if not _is_data_error(e):
+                    raise
+                self._dead_letter(entry, e)
+                continue
+            with self._lock:
+                self._connect().execute("delete from pending where seq = ?", (entry[0],))
+        return inserted
+
+    def flush_once(self, client) -> int:
+        batch = self._next_batch()
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        try:
+            inserted = self._insert(client, [json.loads(payload) for _, payload, _ in batch])
+        except Exception as e:
+            if not _is_data_error(e):
+                raise
+            logger.warning(f"Assessment write-behind batch rejected, retrying row by row: {e}")
+            inserted = self._flush_rows(client, batch)
+        with self._lock:
+            self._connect().execute("delete from pending where seq <= ?", (batch[-1][0],))
+            now = time.time()
+            self._latencies.extend(now - enqueued_at for _, _, enqueued_at in batch)
+            self._stats["flushed"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_batch_s"] = round(time.perf_counter() - started, 4)
+        for row in inserted:
+            index_assessment(PatientAssessment(**row))
+        return len(batch)
+
+    def _run(self):
+        client = self.client_factory()
+        backoff = self.flush_interval
+        while True:
+            try:
+                while self.flush_once(client) == self.batch_size:
+                    pass  # keep draining while full batches are waiting
+                backoff = self.flush_interval
+            except Exception as e:
+                with self._lock:
+                    self._stats["failures"] += 1
+                backoff = min(backoff * 2, 30.0)
+                logger.error(f"Assessment write-behind flush failed, retrying in {backoff:.1f}s: {e}")
+            if self._stopping.is_set() and (self.backlog() == 0 or backoff > self.flush_interval):
+                return
+            self._wake.wait(backoff)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        backlog = self.backlog()
+        if backlog:
+            logger.info(f"Replaying {backlog} journaled assessments")
+            with self._lock:
+                self._stats["replayed"] += backlog
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="assessment-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush what we can before shutdown; the journal keeps the rest"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def backlog(self) -> int:
+        with self._lock:
+            return self._connect().execute("select count(*) from pending").fetchone()[0]
+
+    def dead_letters(self) -> int:
+        with self._lock:
+            return self._connect().execute("select count(*) from dead_letter").fetchone()[0]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self._stats)
+        stats["backlog"] = self.backlog()
+        stats["dead_letter_rows"] = self.dead_letters()
+        stats["flush_latency_p50_s"] = round(latencies[len(latencies) // 2], 4) if latencies else None
+        stats["flush_latency_p95_s"] = round(latencies[int(len(latencies) * 0.95)], 4) if latencies else None
+        stats["running"] = self._thread is not None
+        return stats
+
+WRITE_BEHIND_ENABLED = os.getenv("ASSESSMENT_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+
+assessment_write_buffer = AssessmentWriteBuffer(get_storage_client)
+
+def persist_assessment(session, notes: str, esi_level: int, diagnosis: str, user_id: int) -> Optional[PatientAssessment]:
+    """Store an assessment, deferred through the write-behind buffer when enabled.
+
+    Returns the created assessment in synchronous mode, or None when the insert
+    was journaled for the background flusher.
+    """
+    if WRITE_BEHIND_ENABLED:
+        assessment_write_buffer.enqueue(PatientAssessment(
+            notes=notes,
+            esi_level=esi_level,
+            diagnosis=diagnosis,
+            user_id=user_id
+        ))
+        # Lands on the primary up to a flush interval from now, so stickiness starts from then
+        read_replicas.record_write(delay=assessment_write_buffer.flush_interval)
+        return None
+    return AssessmentRepository(session).create(
+        notes=notes,
+        esi_level=esi_level,
+        diagnosis=diagnosis,
+        user_id=user_id
+    )
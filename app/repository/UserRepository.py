@@ -1,18 +1,53 @@
 from app.models import User, UserType
 from app.engine import SupabaseDep
+from app.replicas import read_replicas
+from agents.shared_cache import shared_store
 from typing import Optional
+import os
+
+# User rows by "id:<id>" and "email:<email>", shared across workers; filled on reads and on create
+user_cache = shared_store.cache("users", ttl=float(os.getenv("USER_CACHE_TTL", "300")))
 
 class UserRepository:
     def __init__(self, session: SupabaseDep):
         self.session = session
 
-    def get_by_email(self, email: str) -> Optional[User]:
-        response = self.session.table("users").select("*").eq("email", email).execute()
-        return User(**response.data[0]) if response.data else None
+    @property
+    def reads(self):
+        """Client for read queries: a read replica unless this client just wrote or the replicas lag"""
+        return read_replicas.reader(self.session)
+
+    @staticmethod
+    def _cache_row(row: dict):
+        user_cache.set(f"id:{row['id']}", row)
+        user_cache.set(f"email:{row['email']}", row)
+
+    def get_by_email(self, email: str, fresh: bool = False) -> Optional[User]:
+        """Look up a user; `fresh` skips the cache and reads the primary, for checks that guard a write"""
+        row = None if fresh else user_cache.get(f"email:{email}")
+        if row is None:
+            client = self.session if fresh else self.reads
+            response = client.table("users").select("*").eq("email", email).execute()
+            if not response.data:
+                return None
+            row = response.data[0]
+            self._cache_row(row)
+        return User(**row)
+
+    def get_row_by_id(self, user_id: int) -> Optional[dict]:
+        """Raw row for read paths that serialize straight back out"""
+        row = user_cache.get(f"id:{user_id}")
+        if row is None:
+            response = self.reads.table("users").select("*").eq("id", user_id).execute()
+            if not response.data:
+                return None
+            row = response.data[0]
+            self._cache_row(row)
+        return row
 
     def get_by_id(self, user_id: int) -> Optional[User]:
-        response = self.session.table("users").select("*").eq("id", user_id).execute()
-        return User(**response.data[0]) if response.data else None
+        row = self.get_row_by_id(user_id)
+        return User.model_validate(row) if row else None
 
     def create(self, name: str, email: str, age: int, gender: str, user_type: UserType) -> User:
         user = User(
@@ -22,5 +57,7 @@ class UserRepository:
             gender=gender,
             user_type=user_type
         )
-        response = self.session.table("users").insert(user.model_dump()).execute()
+        response = self.session.table("users").insert(user.insert_payload()).execute()
+        read_replicas.record_write()
+        self._cache_row(response.data[0])
         return User(**response.data[0]) 
\ No newline at end of file
@@ -1,7 +1,12 @@
-from fastapi import APIRouter
-from app.models import PatientAssessment
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Optional
+from app.models import PatientAssessment, AssessmentSearchPage, AssessmentFilters, ExportFormat
+from app.export import ENCODERS, gzip_stream
 from app.engine import SupabaseDep
 from app.repository.AssessmentRepository import AssessmentRepository
+from app.idempotency import idempotency_store
+from app.conditional import conditional_gets, make_etag
 
 AssessmentRouter = APIRouter(
     prefix="/assessments",
@@ -10,21 +15,97 @@ AssessmentRouter = APIRouter(
 )
 
 @AssessmentRouter.post("", response_model=PatientAssessment)
-def create_assessment(assessment: PatientAssessment, session: SupabaseDep):
+def create_assessment(
+    assessment: PatientAssessment,
+    session: SupabaseDep,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
     """Create a new patient assessment"""
     assessment_repository = AssessmentRepository(session)
-    return assessment_repository.create(
-        notes=assessment.notes,
-        esi_level=assessment.esi_level,
-        diagnosis=assessment.diagnosis,
-        user_id=assessment.user_id
+
+    def create():
+        return assessment_repository.create(
+            notes=assessment.notes,
+            esi_level=assessment.esi_level,
+            diagnosis=assessment.diagnosis,
+            user_id=assessment.user_id
+        )
+
+    if idempotency_key is None:
+        return create()
+    # A retried create returns the original row instead of inserting a duplicate
+    return idempotency_store.run(
+        session, "assessments", idempotency_key, assessment.insert_payload(),
+        lambda: (200, create().model_dump(mode="json"))
     )
 
 @AssessmentRouter.get("", response_model=list[PatientAssessment])
-def get_assessments(session: SupabaseDep):
-    """Get all patient assessments"""
+def get_assessments(
+    session: SupabaseDep,
+    filters: Annotated[AssessmentFilters, Depends()],
+    days: Optional[int] = Query(None, ge=1, description="Only assessments from the last N days"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """Get all patient assessments (304 when the client's ETag is current)"""
+    assessment_repository = AssessmentRepository(session)
+    query_filters = assessment_repository.recent_filters(days, filters) if days is not None else filters
+    # The watermark query replaces the full read when nothing changed. The ETag keys on `days`, not the
+    # moving window bound; rows ageing out of the window change the count. If rows change between the
+    # two reads, the body is newer than its ETag and the client simply refetches next time.
+    watermark = assessment_repository.watermark(query_filters)
+    etag = make_etag("assessments", filters.model_dump(mode="json"), days, watermark)
+    # Trusted DB rows: skip re-validating them through response_model
+    return conditional_gets.respond("assessments", if_none_match, etag,
+                                    lambda: assessment_repository.get_all_rows(query_filters))
+
+@AssessmentRouter.get("/export")
+def export_assessments(
+    session: SupabaseDep,
+    filters: Annotated[AssessmentFilters, Depends()],
+    format: ExportFormat = ExportFormat.CSV,
+    gzip: bool = False,
+    chunk_size: int = Query(1000, ge=100, le=10000)
+):
+    """Stream assessments as CSV, NDJSON or Parquet with constant memory"""
+    encoder, media_type = ENCODERS[format.value]
+    if format == ExportFormat.PARQUET:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Parquet export requires pyarrow")
     assessment_repository = AssessmentRepository(session)
-    return assessment_repository.get_all()
+    stream = encoder(assessment_repository.iter_rows(chunk_size=chunk_size, filters=filters))
+    filename = f"assessments.{format.value}"
+    # Parquet pages are already compressed, so gzip only applies to text formats
+    if gzip and format != ExportFormat.PARQUET:
+        stream = gzip_stream(stream)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@AssessmentRouter.get("/search", response_model=AssessmentSearchPage)
+def search_assessments(
+    session: SupabaseDep,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    after_rank: Optional[float] = Query(None),
+    after_id: Optional[int] = Query(None)
+):
+    """Full-text search over assessment notes and diagnoses, paged by (rank, id) cursor"""
+    if (after_rank is None) != (after_id is None):
+        raise HTTPException(status_code=422, detail="after_rank and after_id must be given together")
+    assessment_repository = AssessmentRepository(session)
+    results, has_more = assessment_repository.search(q, limit=limit, after_rank=after_rank, after_id=after_id)
+    last = results[-1] if has_more else None
+    return AssessmentSearchPage(
+        query=q, results=results, limit=limit, has_more=has_more,
+        next_after_rank=last.rank if last else None,
+        next_after_id=last.id if last else None
+    )
 
 @AssessmentRouter.delete("/{assessment_id}")
 def delete_assessment(assessment_id: int, session: SupabaseDep):
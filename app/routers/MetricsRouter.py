@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from agents.admission import llm_admission
+from agents.resilience import llm_invoker
+from agents.nursebot import context_window
+from agents.triageagent import triage_flight
+from agents.checkpoints import triage_checkpoints
+from agents.prompt_cache import llm_usage, prompt_prefix_cache
+from agents.model_router import model_router
+from agents.esi_classifier import triage_cascade
+from agents.speculative import speculative_triage
+from agents.shared_cache import shared_store
+from app.idempotency import idempotency_store
+from app.logging import log_pipeline
+from app.conditional import conditional_gets
+from app.replicas import read_replicas
+from app.ed_queue import ed_queue
+from app.repository.AssessmentWriteBuffer import WRITE_BEHIND_ENABLED, assessment_write_buffer
+
+MetricsRouter = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    redirect_slashes=True
+)
+
+@MetricsRouter.get("")
+def get_metrics():
+    """Runtime gauges and counters for the LLM-bound request path"""
+    return {
+        "llm_admission": llm_admission.stats(),
+        "llm_resilience": llm_invoker.stats(),
+        "llm_nodes": llm_usage.stats(),
+        "llm_routing": model_router.stats(),
+        "prompt_prefix_cache": prompt_prefix_cache.stats(),
+        "triage_cascade": triage_cascade.stats(),
+        "speculative_triage": speculative_triage.stats(),
+        "shared_cache": shared_store.stats(),
+        "triage_singleflight": triage_flight.stats(),
+        "triage_checkpoints": triage_checkpoints.stats(),
+        "nursebot_context": context_window.stats(),
+        "idempotency": idempotency_store.stats(),
+        "logging": log_pipeline.stats(),
+        "conditional_gets": conditional_gets.stats(),
+        "read_replicas": read_replicas.stats(),
+        "ed_queue": ed_queue.stats(),
+        "assessment_write_behind": assessment_write_buffer.stats() if WRITE_BEHIND_ENABLED else {"enabled": False}
+    }
@@ -0,0 +1,20 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import ORJSONResponse
+from app.models import QueueView
+from app.ed_queue import ed_queue
+
+QueueRouter = APIRouter(
+    prefix="/queue",
+    tags=["queue"],
+    redirect_slashes=True
+)
+
+@QueueRouter.get("", response_model=QueueView)
+def get_queue(
+    limit: int = Query(20, ge=1, le=500, description="How many patients to return from the top"),
+    user_id: Optional[int] = Query(None, description="Also return this patient's positions")
+):
+    """Who to see next: waiting patients by ESI level and time waited, from the in-memory queue index"""
+    # Built from the index, not the database: skip re-validating through response_model
+    return ORJSONResponse(ed_queue.snapshot(limit, user_id))
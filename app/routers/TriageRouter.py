@@ -1,11 +1,17 @@
-from fastapi import APIRouter
-from app.models import TriageRequest, TriageResponse, ChatRequest, ChatResponse
+from fastapi import APIRouter, Header, HTTPException
+from typing import Optional
+from app.models import TriageRequest, TriageResponse, TriageRunState, ChatRequest, ChatResponse
 from app.engine import SupabaseDep
-from agents.triageagent import run_triage_workflow, generate_patient_friendly_summary
-from agents.nursebot import NURSEBOT_SYSINT, WELCOME_MSG, llm_with_tools, get_llm_with_tools
-from app.repository.AssessmentRepository import AssessmentRepository
+from agents.triageagent import run_triage_workflow, resume_triage_run, triage_run_state, generate_patient_friendly_summary
+from agents.nursebot import NURSEBOT_SYSINT, WELCOME_MSG, chat_chain, context_window, route_chat_turn
+from app.repository.AssessmentWriteBuffer import persist_assessment
+from agents.admission import current_patient, llm_admission
+from agents.resilience import guarded_invoke
+from agents.speculative import speculative_triage
+import hashlib
 import re
 from app.logging import logger
+from app.idempotency import idempotency_store
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
 TriageRouter = APIRouter(prefix="/triage")
@@ -35,43 +41,103 @@ def extract_esi_level(esi_str: str) -> int:
         match = re.search(r'\d+', esi_str)
         if match:
             return int(match.group())
-        logger.warning(f"Could not extract ESI level from '{esi_str}', using default value 3")
+        logger.warning("Could not extract ESI level from %r, using default value 3", esi_str)
         return 3
     except Exception as e:
-        logger.error(f"Error extracting ESI level from '{esi_str}': {e}")
+        logger.error("Error extracting ESI level from %r: %s", esi_str, e)
         return 3
 
 
 
 
-@TriageRouter.post("/", response_model=TriageResponse)
-def triage_endpoint(data: TriageRequest, session: SupabaseDep):
-    logger.info(f"Received triage request with note: {data.note}")
+def result_esi_level(result: dict) -> int:
+    final_esi = result['final_esi_level']
+    return final_esi if isinstance(final_esi, int) else extract_esi_level(str(final_esi))
+
+def result_diagnosis(result: dict) -> str:
+    return "NURSE REASONING: " + result['nurse_reasoning'] + "\nDOCTOR INPUT: " + result['doctor_input']
+
+def run_triage(data: TriageRequest, session, run_id: Optional[str] = None) -> TriageResponse:
+    # Notes are patient data: only their size goes out at INFO, the text at DEBUG (truncated by the log pipeline)
+    logger.info("Received triage request", extra={"note_chars": len(data.note), "run_id": run_id})
+    logger.debug("Triage note: %s", data.note)
     if is_prompt_injection(data.note):
         logger.warning("Potential prompt injection detected in triage note")
         return TriageResponse(esi="N/A", diagnosis="Prompt injection detected", iterations=0)
+    # Standalone notes aren't tied to a patient record, so only the global limit applies
+    llm_admission.admit()
     try:
-        result = run_triage_workflow(data.note)
-        logger.info(f"Triage workflow result: {result}")
-        esi_level = extract_esi_level(result['esi'])
-        assessment_repository = AssessmentRepository(session)
+        result = run_triage_workflow(data.note, run_id=run_id)
+        logger.debug("Triage workflow result: %s", result)
+        esi_level = result_esi_level(result)
+        diagnosis = result_diagnosis(result)
         # Use system user (id=1) for standalone triage requests
-        assessment_id = assessment_repository.create(
+        assessment = persist_assessment(
+            session,
             notes=data.note,
             esi_level=esi_level,
-            diagnosis=result['diagnosis'],
+            diagnosis=diagnosis,
             user_id=1
         )
-        logger.info(f"Assessment stored successfully with ID: {assessment_id}")
+        logger.info("Triage completed", extra={
+            "esi_level": esi_level, "iterations": result["iterations_needed"],
+            "assessment_id": assessment.id if assessment else None, "run_id": result.get("run_id"),
+        })
     except Exception as e:
-        logger.error(f"Error in triage endpoint: {e}")
+        logger.error("Error in triage endpoint: %s", e)
         raise
-    return TriageResponse(**result)
+    return TriageResponse(
+        esi=f"ESI {esi_level}", diagnosis=diagnosis, iterations=result['iterations_needed'], run_id=result.get('run_id')
+    )
+
+@TriageRouter.post("/", response_model=TriageResponse)
+def triage_endpoint(
+    data: TriageRequest,
+    session: SupabaseDep,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    if idempotency_key is None:
+        return run_triage(data, session, run_id=data.run_id)
+    # A retry after a failed attempt resumes that attempt's checkpoint rather than starting over
+    run_id = data.run_id or "idem-" + hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()[:32]
+    # Client retries replay the stored response instead of re-running the LLM workflow
+    return idempotency_store.run(
+        session, "triage", idempotency_key, data.model_dump(mode="json"),
+        lambda: (200, run_triage(data, session, run_id=run_id).model_dump(mode="json"))
+    )
+
+@TriageRouter.get("/runs/{run_id}", response_model=TriageRunState)
+def get_triage_run(run_id: str):
+    """Checkpointed progress of a triage run"""
+    state = triage_run_state(run_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Triage run not found")
+    return state
+
+@TriageRouter.post("/runs/{run_id}/resume", response_model=TriageResponse)
+def resume_triage(run_id: str):
+    """Finish an interrupted triage run from its last completed step.
+
+    Only the workflow is resumed; to also store the assessment, retry
+    POST /triage/ with the same run_id.
+    """
+    llm_admission.admit()
+    try:
+        result = resume_triage_run(run_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Triage run not found")
+    return TriageResponse(
+        esi=f"ESI {result_esi_level(result)}",
+        diagnosis=result_diagnosis(result),
+        iterations=result['iterations_needed'],
+        run_id=run_id
+    )
 
 @TriageRouter.post("/chat", response_model=ChatResponse)
 def chat_to_triage(data: ChatRequest, session: SupabaseDep):
     if not data.history:
         return ChatResponse(response=WELCOME_MSG, finished=False, notes=[])
+    current_patient.set(str(data.patient_id))
     for msg in data.history:
         if is_prompt_injection(msg["content"]):
             logger.warning("Prompt injection detected in chat history")
@@ -80,14 +146,20 @@ def chat_to_triage(data: ChatRequest, session: SupabaseDep):
                 finished=True,
                 notes=[]
             )
-    messages = [SystemMessage(content=NURSEBOT_SYSINT[1])]
+    messages = []
     for msg in data.history:
         if msg["role"] == "user":
             messages.append(HumanMessage(content=msg["content"]))
         elif msg["role"] == "assistant":
             messages.append(AIMessage(content=msg["content"]))
-    llm_with_tools = get_llm_with_tools()  # Get LLM instance here
-    response = llm_with_tools.invoke(messages)
+    # One admission per chat turn, covering the history summary, the reply and, on the final turn, triage
+    llm_admission.admit()
+    prompt, _, _ = context_window.build(
+        SystemMessage(content=NURSEBOT_SYSINT[1]), messages, session_key=str(data.patient_id)
+    )
+    choice = route_chat_turn(messages)
+    response = guarded_invoke(lambda: chat_chain.invoke_messages(prompt[1:], choice),
+                              route=choice.label, timeout=choice.spec.timeout)
     notes = []
     finished = False
     if hasattr(response, "tool_calls") and response.tool_calls:
@@ -104,28 +176,33 @@ def chat_to_triage(data: ChatRequest, session: SupabaseDep):
                 finished=True,
                 notes=notes
             )
-        triage_result = run_triage_workflow(combined_note)
-        logger.info(f"Full triage result: {triage_result}")
+        triage_result = speculative_triage.finalize(str(data.patient_id), combined_note) \
+            or run_triage_workflow(combined_note)
+        logger.debug("Chat triage result: %s", triage_result)
         try:
             esi_level = int(triage_result['final_esi_level'])
-            assessment_repository = AssessmentRepository(session)
-            assessment_id = assessment_repository.create(
+            assessment = persist_assessment(
+                session,
                 notes=combined_note,
                 esi_level=esi_level,
                 diagnosis="NURSE REASONING: " + triage_result['nurse_reasoning'] + "\nDOCTOR INPUT: " + triage_result['doctor_input'],
                 user_id=data.patient_id
             )
-            logger.info(f"Chat assessment stored successfully with ID: {assessment_id}")
+            logger.info("Chat assessment stored", extra={
+                "esi_level": esi_level, "assessment_id": assessment.id if assessment else None,
+            })
             return ChatResponse(
                 response=generate_patient_friendly_summary(triage_result),
                 finished=True,
                 notes=notes
             )
         except Exception as e:
-            logger.error(f"Failed to store chat assessment: {e}")
+            logger.error("Failed to store chat assessment: %s", e)
             return ChatResponse(
                 response=generate_patient_friendly_summary(triage_result),
                 finished=True,
                 notes=notes
             )
+    # Enough symptom content may already be here: triage it in the background while the chat goes on
+    speculative_triage.observe(str(data.patient_id), [m.content for m in messages if isinstance(m, HumanMessage)])
     return ChatResponse(response=response.content, finished=finished, notes=notes)
\ No newline at end of file
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
 from app.models import User, UserLogin, UserType
 from app.engine import SupabaseDep
 from app.repository.UserRepository import UserRepository
+from app.conditional import conditional_gets, make_etag
+from app.replicas import read_replicas
 
 UserRouter = APIRouter(
     prefix="/users",
@@ -16,6 +19,9 @@ def login_user(user_data: UserLogin, session: SupabaseDep):
     
     # Check if user exists
     existing_user = user_repository.get_by_email(user_data.email)
+    if existing_user is None and read_replicas.enabled:
+        # A replica miss may just be lag: confirm on the primary before creating
+        existing_user = user_repository.get_by_email(user_data.email, fresh=True)
     if existing_user:
         return existing_user
     
@@ -29,10 +35,16 @@ def login_user(user_data: UserLogin, session: SupabaseDep):
     )
 
 @UserRouter.get("/{user_id}", response_model=User)
-def get_user(user_id: int, session: SupabaseDep):
-    """Get user by ID"""
+def get_user(
+    user_id: int,
+    session: SupabaseDep,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """Get user by ID (304 when the client's ETag is current)"""
     user_repository = UserRepository(session)
-    user = user_repository.get_by_id(user_id)
+    user = user_repository.get_row_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    etag = make_etag("user", user["id"], user["updated_at"])
+    # Trusted DB row: skip re-validating it through response_model
+    return conditional_gets.respond("users", if_none_match, etag, lambda: user)
@@ -0,0 +1,375 @@
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+# Mirrors supabase/migrations for SQLite. Timestamps are stored as ISO-8601 UTC text.
+SQLITE_SCHEMA = """
+create table if not exists users (
+    id integer primary key autoincrement,
+    name text not null,
+    email text not null unique,
+    age integer not null,
+    gender text not null,
+    user_type text not null check (user_type in ('patient', 'staff')),
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+create trigger if not exists handle_users_updated_at
+after update on users for each row when new.updated_at = old.updated_at
+begin
+    update users set updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') where id = new.id;
+end;
+
+create table if not exists assessments (
+    id integer primary key autoincrement,
+    notes text not null,
+    esi_level integer not null,
+    diagnosis text not null,
+    user_id integer not null references users(id) on delete cascade,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at text not null default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    write_key text
+);
+
+create index if not exists idx_assessments_user_id on assessments(user_id);
+
+create trigger if not exists handle_assessments_updated_at
+after update on assessments for each row when new.updated_at = old.updated_at
+begin
+    update assessments set updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') where id = new.id;
+end;
+
+-- Full-text search (Postgres uses a tsvector column; SQLite uses an external-content FTS5 table)
+create virtual table if not exists assessments_fts using fts5(
+    diagnosis, notes, content='assessments', content_rowid='id', tokenize='porter'
+);
+
+create trigger if not exists assessments_fts_insert after insert on assessments begin
+    insert into assessments_fts(rowid, diagnosis, notes) values (new.id, new.diagnosis, new.notes);
+end;
+
+create trigger if not exists assessments_fts_delete after delete on assessments begin
+    insert into assessments_fts(assessments_fts, rowid, diagnosis, notes)
+    values ('delete', old.id, old.diagnosis, old.notes);
+end;
+
+create trigger if not exists assessments_fts_update after update of notes, diagnosis on assessments begin
+    insert into assessments_fts(assessments_fts, rowid, diagnosis, notes)
+    values ('delete', old.id, old.diagnosis, old.notes);
+    insert into assessments_fts(rowid, diagnosis, notes) values (new.id, new.diagnosis, new.notes);
+end;
+
+create table if not exists idempotency_keys (
+    scope text not null,
+    key text not null,
+    request_hash text not null,
+    status text not null check (status in ('in_progress', 'completed')),
+    status_code integer,
+    response text,
+    created_at text not null,
+    expires_at text not null,
+    heartbeat_at text,
+    primary key (scope, key)
+);
+
+create index if not exists idx_idempotency_keys_expires_at on idempotency_keys(expires_at);
+
+-- System user referenced by standalone triage requests
+insert or ignore into users (name, email, age, gender, user_type)
+values ('System User', 'system@hospital.com', 30, 'male', 'staff');
+"""
+
+# Compared as text in SQLite, so values bound to them are normalized to the stored format first
+TIMESTAMP_COLUMNS = frozenset({"created_at", "updated_at", "expires_at", "heartbeat_at"})
+
+def sqlite_timestamp(value: Union[str, datetime]) -> str:
+    """ISO-8601 text in the stored format (UTC, milliseconds, +00:00), so text order matches time order"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    value = value.astimezone(UTC)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}+00:00"
+
+def _param(column: str, value: Any) -> Any:
+    if column.strip() in TIMESTAMP_COLUMNS and isinstance(value, (str, datetime)):
+        return sqlite_timestamp(value)
+    return value.value if hasattr(value, "value") else value
+
+@dataclass
+class StorageResponse:
+    data: List[Dict[str, Any]]
+
+class SQLiteQuery:
+    """The subset of the Supabase/PostgREST query builder the repositories use"""
+
+    def __init__(self, client: "SQLiteClient", table: str):
+        self.client = client
+        self.table = table
+        self._action = "select"
+        self._columns = "*"
+        self._rows: List[Dict[str, Any]] = []
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._on_conflict: Optional[List[str]] = None
+        self._merge = False
+
+    def select(self, columns: str = "*"):
+        self._action = "select"
+        self._columns = columns
+        return self
+
+    def insert(self, rows: Union[Dict[str, Any], List[Dict[str, Any]]]):
+        self._action = "insert"
+        self._rows = [rows] if isinstance(rows, dict) else list(rows)
+        return self
+
+    def upsert(self, rows: Union[Dict[str, Any], List[Dict[str, Any]]], on_conflict: str = "",
+               ignore_duplicates: bool = False):
+        """Rows clashing on the `on_conflict` columns are skipped (ignore_duplicates) or update the existing row.
+
+        PostgREST falls back to the primary key without `on_conflict`; here the columns must be named.
+        """
+        if not on_conflict:
+            raise ValueError("SQLite upsert needs on_conflict columns, e.g. upsert(rows, on_conflict=\"id\")")
+        self.insert(rows)
+        self._on_conflict = [c.strip() for c in on_conflict.split(",")]
+        self._merge = not ignore_duplicates
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self._action = "update"
+        self._rows = [values]
+        return self
+
+    def delete(self):
+        self._action = "delete"
+        return self
+
+    def _filter(self, column: str, op: str, value: Any):
+        self._where.append(f"{_ident(column)} {op} ?")
+        self._params.append(_param(column, value))
+        return self
+
+    def eq(self, column: str, value: Any):
+        return self._filter(column, "=", value)
+
+    def gt(self, column: str, value: Any):
+        return self._filter(column, ">", value)
+
+    def gte(self, column: str, value: Any):
+        return self._filter(column, ">=", value)
+
+    def lt(self, column: str, value: Any):
+        return self._filter(column, "<", value)
+
+    def lte(self, column: str, value: Any):
+        return self._filter(column, "<=", value)
+
+    def order(self, column: str, desc: bool = False):
+        self._order.append(f"{_ident(column)} {'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def _where_sql(self) -> str:
+        return f" where {' and '.join(self._where)}" if self._where else ""
+
+    def execute(self) -> StorageResponse:
+        if self._action == "insert":
+            return StorageResponse(self.client.insert(self.table, self._rows, on_conflict=self._on_conflict,
+                                                      merge=self._merge))
+        if self._action == "update":
+            values = self._rows[0]
+            assignments = ", ".join(f"{_ident(c)} = ?" for c in values)
+            params = [_param(c, v) for c, v in values.items()] + self._params
+            sql = f"update {_ident(self.table)} set {assignments}{self._where_sql()} returning *"
+            return StorageResponse(self.client.query(sql, params, write=True))
+        if self._action == "delete":
+            sql = f"delete from {_ident(self.table)}{self._where_sql()} returning *"
+            return StorageResponse(self.client.query(sql, self._params, write=True))
+        columns = "*" if self._columns.strip() == "*" else ", ".join(_ident(c) for c in self._columns.split(","))
+        sql = f"select {columns} from {_ident(self.table)}{self._where_sql()}"
+        if self._order:
+            sql += f" order by {', '.join(self._order)}"
+        if self._limit is not None:
+            sql += f" limit {int(self._limit)}"
+        return StorageResponse(self.client.query(sql, self._params))
+
+class SQLiteRPC:
+    def __init__(self, client: "SQLiteClient", name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> StorageResponse:
+        handler = getattr(self.client, f"rpc_{self.name}", None)
+        if handler is None:
+            raise ValueError(f"Unknown SQLite RPC: {self.name}")
+        return StorageResponse(handler(**self.params))
+
+def _ident(name: str) -> str:
+    name = name.strip()
+    if not name.replace("_", "").isalnum():
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
+
+class SQLiteClient:
+    """Embedded storage backend with the same call shape as the Supabase client.
+
+    One connection per thread in WAL mode, so readers never block the writer.
+    Query text is parameterized and stable, so sqlite3's statement cache
+    reuses the prepared statements across calls.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SQLITE_SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        """Bring databases created by earlier versions up to SQLITE_SCHEMA"""
+        conn = self._conn()
+        columns = {row["name"] for row in conn.execute("pragma table_info(assessments)")}
+        if "write_key" not in columns:
+            conn.execute("alter table assessments add column write_key text")
+        conn.execute(
+            "create unique index if not exists idx_assessments_write_key on assessments(write_key, created_at)"
+        )
+        columns = {row["name"] for row in conn.execute("pragma table_info(idempotency_keys)")}
+        if "heartbeat_at" not in columns:
+            conn.execute("alter table idempotency_keys add column heartbeat_at text")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=256,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.execute("pragma foreign_keys=on")
+            conn.execute("pragma busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> SQLiteRPC:
+        return SQLiteRPC(self, name, params or {})
+
+    def query(self, sql: str, params: Sequence[Any] = (), write: bool = False) -> List[Dict[str, Any]]:
+        conn = self._conn()
+        if write:
+            with self._write_lock:
+                return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def insert(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[List[str]] = None,
+               merge: bool = False) -> List[Dict[str, Any]]:
+        """Insert rows in one transaction.
+
+        With `on_conflict` columns, a row clashing on them is skipped, or with `merge`
+        updates the existing row's other columns (PostgREST's merge-duplicates).
+        """
+        conn = self._conn()
+        target = ", ".join(_ident(c) for c in on_conflict) if on_conflict else None
+        inserted = []
+        with self._write_lock:
+            conn.execute("begin immediate")
+            try:
+                for row in rows:
+                    columns = list(row)
+                    conflict = ""
+                    if target:
+                        updates = [c for c in columns if c not in on_conflict]
+                        if merge and updates:
+                            conflict = (f" on conflict ({target}) do update set "
+                                        + ", ".join(f"{_ident(c)} = excluded.{_ident(c)}" for c in updates))
+                        else:
+                            conflict = f" on conflict ({target}) do nothing"
+                    sql = (f"insert into {_ident(table)} ({', '.join(_ident(c) for c in columns)}) "
+                           f"values ({', '.join('?' for _ in columns)}){conflict} returning *")
+                    values = [_param(c, v) for c, v in row.items()]
+                    inserted.extend(dict(r) for r in conn.execute(sql, values).fetchall())
+                conn.execute("commit")
+            except Exception:
+                conn.execute("rollback")
+                raise
+        return inserted
+
+    def rpc_search_assessments(self, q: str, page_limit: int = 20, after_rank: Optional[float] = None,
+                               after_id: Optional[int] = None,
+                               max_candidates: int = 2000) -> List[Dict[str, Any]]:
+        """SQLite counterpart of the search_assessments Postgres function"""
+        terms = " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+        if not terms:
+            return []
+        return self.query(
+            """
+            with candidates as (
+                select rowid as id, -bm25(assessments_fts, 2.0, 1.0) as rank,
+                       highlight(assessments_fts, 1, '**', '**') as notes_headline,
+                       highlight(assessments_fts, 0, '**', '**') as diagnosis_headline
+                from assessments_fts
+                where assessments_fts match ?
+                order by rowid desc
+                limit ?
+            )
+            select a.id, a.notes, a.esi_level, a.diagnosis, a.user_id, a.created_at, a.updated_at,
+                   c.rank, c.notes_headline, c.diagnosis_headline
+            from candidates c
+            join assessments a on a.id = c.id
+            where ? is null or (c.rank, c.id) < (?, ?)
+            order by c.rank desc, c.id desc
+            limit ?
+            """,
+            (terms, max_candidates, after_rank, after_rank, after_id, page_limit)
+        )
+
+    def rpc_assessments_watermark(self, p_user_id: Optional[int] = None, p_esi_level: Optional[int] = None,
+                                  p_created_after: Optional[str] = None,
+                                  p_created_before: Optional[str] = None) -> List[Dict[str, Any]]:
+        """SQLite counterpart of the assessments_watermark Postgres function"""
+        p_created_after = sqlite_timestamp(p_created_after) if p_created_after else None
+        p_created_before = sqlite_timestamp(p_created_before) if p_created_before else None
+        return self.query(
+            """
+            select count(*) as row_count, max(id) as max_id, max(updated_at) as max_updated_at
+            from assessments
+            where (? is null or user_id = ?)
+              and (? is null or esi_level = ?)
+              and (? is null or created_at >= ?)
+              and (? is null or created_at < ?)
+            """,
+            (p_user_id, p_user_id, p_esi_level, p_esi_level,
+             p_created_after, p_created_after, p_created_before, p_created_before)
+        )
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", ".data/clinical_agents.db")
+
+_sqlite_client: Optional[SQLiteClient] = None
+_sqlite_lock = threading.Lock()
+
+def get_sqlite_client() -> SQLiteClient:
+    global _sqlite_client
+    if _sqlite_client is None:
+        with _sqlite_lock:
+            if _sqlite_client is None:
+                _sqlite_client = SQLiteClient(SQLITE_PATH)
+    return _sqlite_client
@@ -1,4 +1,6 @@
 import os
+import threading
+from collections import OrderedDict
 import streamlit as st
 import requests
 import pandas as pd
@@ -38,6 +40,9 @@ class Config:
     # UI Constants
     SIDEBAR_WIDTH = 300
     CHAT_HEIGHT = 500
+    SEARCH_PAGE_SIZE = 20
+    QUEUE_PAGE_SIZE = 20
+    DASHBOARD_WINDOWS = {"Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "All time": None}
     
     # Colors
     PRIMARY_COLOR = "#1f77b4"
@@ -63,7 +68,10 @@ class SessionStateManager:
             "chat_active": False,
             "finished": False,
             "current_assessment_id": None,
-            "show_help": False
+            "show_help": False,
+            "search_query": "",
+            "search_cursors": [],
+            "read_session": None
         }
         
         for key, val in defaults.items():
@@ -99,6 +107,58 @@ class SessionStateManager:
 # API Service Layer
 # ─────────────────────────────────────────────────────────────────────────────
 
+def client_headers() -> Dict[str, str]:
+    """The read session the API issued to this browser session, which it keys read-your-writes on"""
+    return {"X-Read-Session": st.session_state.read_session} if st.session_state.get("read_session") else {}
+
+def remember_read_session(resp: requests.Response) -> requests.Response:
+    """Keep the read-session token the API hands out on a session's first request"""
+    token = resp.headers.get("X-Read-Session")
+    if token:
+        st.session_state.read_session = token
+    return resp
+
+class ConditionalCache:
+    """Remembers ETag-tagged GET responses and revalidates them with If-None-Match.
+
+    A 304 returns the stored body without the server serializing or sending it again.
+    Shared by all sessions of this Streamlit process (see `get_conditional_cache`).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.http = requests.Session()  # keep-alive across reruns
+        self._entries: "OrderedDict[Tuple, Tuple[str, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_json(self, url: str, params: Optional[Dict] = None, timeout: float = 10):
+        key = (url, tuple(sorted((params or {}).items())))
+        with self._lock:
+            cached = self._entries.get(key)
+        headers = client_headers()
+        if cached:
+            headers["If-None-Match"] = cached[0]
+        resp = remember_read_session(self.http.get(url, params=params, headers=headers, timeout=timeout))
+        if resp.status_code == 304 and cached:
+            with self._lock:
+                self._entries.move_to_end(key)
+            return cached[1]
+        resp.raise_for_status()
+        body = resp.json()
+        etag = resp.headers.get("ETag")
+        if etag:
+            with self._lock:
+                self._entries[key] = (etag, body)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return body
+
+@st.cache_resource
+def get_conditional_cache() -> ConditionalCache:
+    # Module globals are re-created on every script rerun; cache_resource keeps one instance per process
+    return ConditionalCache()
+
 class APIService:
     @staticmethod
     def login_user(name: str, email: str, age: int, gender: str, user_type: str) -> Tuple[bool, Dict]:
@@ -115,9 +175,10 @@ class APIService:
             resp = requests.post(
                 f"{Config.API_URL}/users/login",
                 json=payload,
+                headers=client_headers(),
                 timeout=10
             )
-            resp.raise_for_status()
+            remember_read_session(resp).raise_for_status()
             return True, resp.json()
         except Exception as e:
             return False, {"error": str(e)}
@@ -126,23 +187,53 @@ class APIService:
     def get_user_by_id(user_id: int) -> Tuple[bool, Dict]:
         """Get user information by ID"""
         try:
-            resp = requests.get(f"{Config.API_URL}/users/{user_id}", timeout=10)
-            resp.raise_for_status()
-            return True, resp.json()
+            return True, get_conditional_cache().get_json(f"{Config.API_URL}/users/{user_id}")
         except Exception as e:
             return False, {"error": str(e)}
     
     @staticmethod
-    def fetch_assessments() -> List[Dict]:
-        """Fetch all assessments from API"""
+    def fetch_assessments(days: Optional[int] = None) -> List[Dict]:
+        """Fetch assessments from API, optionally only the last `days` days"""
         try:
-            resp = requests.get(f"{Config.API_URL}/assessments", timeout=10)
-            resp.raise_for_status()
-            return resp.json()
+            params = {"days": days} if days else None
+            return get_conditional_cache().get_json(f"{Config.API_URL}/assessments", params=params)
         except Exception as e:
             st.error(f"Failed to fetch assessments: {str(e)}")
             return []
     
+    @staticmethod
+    def fetch_queue(limit: int = 20) -> Tuple[bool, Dict]:
+        """Waiting patients in the order they should be seen"""
+        try:
+            resp = requests.get(
+                f"{Config.API_URL}/queue",
+                params={"limit": limit},
+                headers=client_headers(),
+                timeout=10
+            )
+            remember_read_session(resp).raise_for_status()
+            return True, resp.json()
+        except Exception as e:
+            return False, {"error": str(e)}
+    
+    @staticmethod
+    def search_assessments(query: str, limit: int = 20, cursor: Optional[Dict] = None) -> Tuple[bool, Dict]:
+        """Full-text search over assessments; cursor is the previous page's next_after_rank/next_after_id"""
+        params = {"q": query, "limit": limit}
+        if cursor:
+            params.update(cursor)
+        try:
+            resp = requests.get(
+                f"{Config.API_URL}/assessments/search",
+                params=params,
+                headers=client_headers(),
+                timeout=10
+            )
+            remember_read_session(resp).raise_for_status()
+            return True, resp.json()
+        except Exception as e:
+            return False, {"error": str(e)}
+    
     @staticmethod
     def send_chat_message(message: str, history: List[Dict], patient_id: int) -> Tuple[bool, Dict]:
         """Send chat message to triage API"""
@@ -156,9 +247,10 @@ class APIService:
             resp = requests.post(
                 f"{Config.API_URL}/triage/chat",
                 json=payload,
+                headers=client_headers(),
                 timeout=30
             )
-            resp.raise_for_status()
+            remember_read_session(resp).raise_for_status()
             return True, resp.json()
         except Exception as e:
             return False, {"error": str(e)}
@@ -379,9 +471,17 @@ class StaffDashboard:
         """Render staff dashboard"""
         st.markdown("### 📊 Staff Dashboard")
         
+        # A bounded window only reads the recent monthly partitions
+        window = st.selectbox(
+            "Time window",
+            list(Config.DASHBOARD_WINDOWS),
+            index=1,
+            key="dashboard_window"
+        )
+        
         # Fetch data
         with st.spinner("📥 Loading assessment data..."):
-            assessments = APIService.fetch_assessments()
+            assessments = APIService.fetch_assessments(Config.DASHBOARD_WINDOWS[window])
         
         if not assessments:
             st.info("📭 No assessments available yet.")
@@ -393,6 +493,9 @@ class StaffDashboard:
         # Dashboard metrics
         StaffDashboard._render_metrics(df)
         
+        # Who to see next
+        StaffDashboard._render_queue()
+        
         # Charts
         col1, col2 = st.columns(2)
         with col1:
@@ -400,6 +503,9 @@ class StaffDashboard:
         with col2:
             StaffDashboard._render_timeline_chart(df)
         
+        # Search
+        StaffDashboard._render_search()
+        
         # Data table
         StaffDashboard._render_assessments_table(df)
     
@@ -491,6 +597,89 @@ class StaffDashboard:
         
         st.plotly_chart(fig, use_container_width=True)
     
+    @staticmethod
+    def _render_search():
+        """Render server-side full-text search over assessments"""
+        st.markdown("**🔎 Search Assessments**")
+        
+        query = st.text_input(
+            "Search notes and diagnoses",
+            placeholder="e.g. chest pain radiating",
+            key="search_input",
+            label_visibility="collapsed"
+        ).strip()
+        
+        # New query starts from the first page
+        if query != st.session_state.search_query:
+            st.session_state.search_query = query
+            st.session_state.search_cursors = []
+        
+        if not query:
+            return
+        
+        # Stack of cursors for the pages before this one; the top is where this page starts
+        cursors = st.session_state.search_cursors
+        cursor = cursors[-1] if cursors else None
+        offset = len(cursors) * Config.SEARCH_PAGE_SIZE
+        success, page = APIService.search_assessments(query, Config.SEARCH_PAGE_SIZE, cursor)
+        if not success:
+            st.error(f"❌ Search failed: {page.get('error', 'Unknown error')}")
+            return
+        
+        results = page.get("results", [])
+        if not results:
+            st.info("No matching assessments found.")
+            return
+        
+        for result in results:
+            with st.container(border=True):
+                st.markdown(
+                    f"**#{result['id']}** · ESI {result['esi_level']} · "
+                    f"{pd.to_datetime(result['created_at']).strftime('%Y-%m-%d %H:%M')}"
+                )
+                st.markdown(f"**Notes:** {result['notes_headline']}")
+                st.markdown(f"**Diagnosis:** {result['diagnosis_headline']}")
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if cursors and st.button("⬅️ Previous", use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Showing results {offset + 1}–{offset + len(results)}")
+        with col3:
+            if page.get("has_more") and st.button("Next ➡️", use_container_width=True):
+                cursors.append({
+                    "after_rank": page["next_after_rank"],
+                    "after_id": page["next_after_id"]
+                })
+                st.rerun()
+    
+    @staticmethod
+    def _render_queue():
+        """Render the live ED queue (ordered server-side by ESI level and time waited)"""
+        st.markdown("**🚑 Who to See Next**")
+        success, queue = APIService.fetch_queue(Config.QUEUE_PAGE_SIZE)
+        if not success:
+            st.error(f"❌ Queue unavailable: {queue.get('error', 'Unknown error')}")
+            return
+        if not queue["top"]:
+            st.info("✅ No patients waiting.")
+            return
+        st.caption(f"{queue['size']} waiting")
+        st.dataframe(
+            pd.DataFrame(queue["top"])[["position", "esi_level", "waiting_minutes", "assessment_id", "user_id"]],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "position": "#",
+                "esi_level": "ESI Level",
+                "waiting_minutes": st.column_config.NumberColumn("Waiting (min)", format="%.0f"),
+                "assessment_id": "Assessment ID",
+                "user_id": "Patient ID"
+            }
+        )
+    
     @staticmethod
     def _render_assessments_table(df: pd.DataFrame):
         """Render assessments data table"""
@@ -30,6 +30,11 @@ print_help() {
     echo "  clean       - Remove virtual environment and cached files"
     echo "  test-api    - Test assessment API endpoints"
     echo "  test-users  - Test users API endpoints"
+    echo "  replay      - Re-triage stored assessments and report ESI agreement (args passed through)"
+    echo "  archive     - Create upcoming assessment partitions and archive expired ones (args passed through)"
+    echo "  chat-bench  - Run scripted NurseBot sessions in-process and report per-turn overhead (args passed through)"
+    echo "  load-test   - Load-test the patient and staff journey and report per-endpoint latency (args passed through)"
+    echo "  train-classifier - Train the local ESI classifier from stored assessments (args passed through)"
     echo "  help        - Show this help message"
 }
 
@@ -199,6 +204,41 @@ test_users_api() {
     echo -e "\n${GREEN}✅ Users API tests complete!${NC}"
 }
 
+# Replay stored assessments through the triage workflow
+replay() {
+    echo -e "${BLUE}🔁 Replaying stored assessments...${NC}"
+    python -m scripts.replay_assessments "$@"
+    echo -e "${GREEN}✅ Replay complete!${NC}"
+}
+
+# Partition maintenance and retention for assessments
+archive() {
+    echo -e "${BLUE}🗄️  Running assessment retention job...${NC}"
+    python -m scripts.archive_assessments "$@"
+    echo -e "${GREEN}✅ Retention job complete!${NC}"
+}
+
+# Headless NurseBot sessions against the fake LLM
+chat_bench() {
+    echo -e "${BLUE}💬 Running scripted NurseBot sessions...${NC}"
+    python -m scripts.nursebot_sessions "$@"
+    echo -e "${GREEN}✅ NurseBot benchmark complete!${NC}"
+}
+
+# Capacity planning: staged load over the full user journey
+load_test() {
+    echo -e "${BLUE}📈 Running load test...${NC}"
+    python -m scripts.load_test "$@"
+    echo -e "${GREEN}✅ Load test complete!${NC}"
+}
+
+# Local ESI classifier for the triage cascade
+train_classifier() {
+    echo -e "${BLUE}🧮 Training ESI classifier...${NC}"
+    python -m scripts.train_esi_classifier "$@"
+    echo -e "${GREEN}✅ Classifier training complete!${NC}"
+}
+
 # Main command router
 case "$1" in
     "install")
@@ -222,6 +262,26 @@ case "$1" in
     "test-users")
         test_users_api
         ;;
+    "replay")
+        shift
+        replay "$@"
+        ;;
+    "archive")
+        shift
+        archive "$@"
+        ;;
+    "chat-bench")
+        shift
+        chat_bench "$@"
+        ;;
+    "load-test")
+        shift
+        load_test "$@"
+        ;;
+    "train-classifier")
+        shift
+        train_classifier "$@"
+        ;;
     *)
         echo -e "${RED}❌ Unknown command: $1${NC}"
         echo "Run './cli.sh help' for usage information"
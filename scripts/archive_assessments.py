@@ -0,0 +1,128 @@
+"""Retention job for the monthly assessments partitions.
+
+Creates upcoming partitions, then detaches every partition older than the
+retention window, archives its rows to a zstd-compressed Parquet file, and
+drops it once the archived row count matches. A partition that was detached
+but not yet archived (e.g. the job died mid-way) is picked up on the next run,
+and a concurrent detach that was interrupted is finalized first.
+
+Rows inserted past the partitions created ahead of time land in the
+assessments_default partition; ensure_assessments_partitions moves them into
+their monthly partition once it is created.
+
+Needs a direct Postgres connection (SUPABASE_DATABASE_URL); PostgREST can't
+detach partitions.
+
+Usage:
+    python -m scripts.archive_assessments [--retention-months 24] [--archive-dir archive/assessments] [--dry-run]
+"""
+
+import argparse
+import os
+import re
+from datetime import date
+
+from dotenv import load_dotenv
+
+PARTITION_PATTERN = re.compile(r"^assessments_y(\d{4})m(\d{2})$")
+COLUMNS = ["id", "notes", "esi_level", "diagnosis", "user_id", "created_at", "updated_at"]
+
+def cutoff_month(retention_months: int, today: date) -> date:
+    """First month that must be kept"""
+    months = today.year * 12 + (today.month - 1) - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+def partition_month(name: str) -> date:
+    match = PARTITION_PATTERN.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+def expired_partitions(conn, cutoff: date):
+    """(name, attached, detach_pending) for every monthly partition table older than cutoff"""
+    attached = {
+        row[0]: row[1] for row in conn.execute(
+            "select c.relname, i.inhdetachpending from pg_inherits i join pg_class c on c.oid = i.inhrelid "
+            "where i.inhparent = 'public.assessments'::regclass"
+        )
+    }
+    tables = [
+        row[0] for row in conn.execute(
+            "select tablename from pg_tables where schemaname = 'public' and tablename ~ '^assessments_y[0-9]{4}m[0-9]{2}$'"
+        )
+    ]
+    return sorted(
+        (name, name in attached, attached.get(name, False)) for name in tables if partition_month(name) < cutoff
+    )
+
+def archive_partition(conn, name: str, archive_dir: str, batch_size: int = 5000) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("notes", pa.string()),
+        ("esi_level", pa.int32()),
+        ("diagnosis", pa.string()),
+        ("user_id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+    ])
+    month = partition_month(name)
+    path = os.path.join(archive_dir, f"assessments_{month:%Y_%m}.parquet")
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    with conn.transaction():
+        # Named cursor = server-side cursor, so the partition streams in batches
+        with conn.cursor(name=f"archive_{name}") as cur:
+            cur.itersize = batch_size
+            cur.execute(f"select {', '.join(COLUMNS)} from public.{name} order by id")
+            with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+                while True:
+                    batch = cur.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    writer.write_table(pa.Table.from_pylist([dict(zip(COLUMNS, row)) for row in batch], schema=schema))
+                    rows += len(batch)
+    os.replace(tmp_path, path)
+    print(f"Archived {rows} rows from {name} to {path}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Create upcoming partitions and archive expired ones")
+    parser.add_argument("--retention-months", type=int, default=int(os.getenv("ASSESSMENT_RETENTION_MONTHS", "24")))
+    parser.add_argument("--months-ahead", type=int, default=3)
+    parser.add_argument("--archive-dir", default=os.getenv("ASSESSMENT_ARCHIVE_DIR", "archive/assessments"))
+    parser.add_argument("--dry-run", action="store_true", help="Only list partitions that would be archived")
+    args = parser.parse_args()
+
+    load_dotenv()
+    import psycopg
+
+    os.makedirs(args.archive_dir, exist_ok=True)
+    with psycopg.connect(os.environ["SUPABASE_DATABASE_URL"], autocommit=True) as conn:
+        created = [row[0] for row in conn.execute("select public.ensure_assessments_partitions(%s)", (args.months_ahead,))]
+        print(f"Partitions ensured: {', '.join(created)}")
+        stray = conn.execute("select count(*) from public.assessments_default").fetchone()[0]
+        if stray:
+            print(f"Warning: {stray} rows in assessments_default fall outside every monthly partition")
+
+        cutoff = cutoff_month(args.retention_months, date.today())
+        for name, attached, detach_pending in expired_partitions(conn, cutoff):
+            if args.dry_run:
+                print(f"Would archive {name}{'' if attached else ' (already detached)'}")
+                continue
+            if detach_pending:
+                # A concurrent detach that was interrupted leaves the partition half-detached;
+                # it can't be detached again, only finalized
+                conn.execute(f"alter table public.assessments detach partition public.{name} finalize")
+            elif attached:
+                # Concurrent detach doesn't block inserts into the current month
+                conn.execute(f"alter table public.assessments detach partition public.{name} concurrently")
+            archived = archive_partition(conn, name, args.archive_dir)
+            expected = conn.execute(f"select count(*) from public.{name}").fetchone()[0]
+            if archived != expected:
+                raise RuntimeError(f"Archived {archived} rows from {name} but it holds {expected}; keeping it")
+            conn.execute(f"drop table public.{name}")
+            print(f"Dropped {name}")
+
+if __name__ == "__main__":
+    main()
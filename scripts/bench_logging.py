@@ -0,0 +1,129 @@
+"""Logging overhead per request on the triage path.
+
+Replays the log records one triage request produces, from many threads, and
+measures the time spent inside logging calls on the request thread. The
+scenarios:
+- `baseline`: the previous setup, with f-strings that format the full note and result and a synchronous
+  StreamHandler.
+- `sync-json`: the current call sites with a synchronous JSON handler.
+- `queue-json`: the current call sites through the queue pipeline.
+- `queue-sampled`: the same, with access logs sampled at `--access-sample`.
+
+For queued scenarios, the time the listener needs to drain what was enqueued
+is reported separately: it is still spent, but off the request thread.
+
+Usage:
+    python -m scripts.bench_logging [--requests 20000] [--threads 16]
+        [--output /tmp/bench.log] [--access-sample 0.1]
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueListener
+
+from app.logging import NonBlockingQueueHandler, SamplingFilter, StructuredFormatter
+
+NOTE = ("58 year old male with crushing substernal chest pain radiating to the left arm for 40 minutes, "
+        "diaphoretic, history of hypertension and type 2 diabetes, takes metformin and lisinopril. ") * 4
+RESULT = {
+    "final_esi_level": 2,
+    "esi_description": "Emergent - High risk situation",
+    "consensus_reached": "Yes - Mutual Agreement",
+    "nurse_reasoning": "Possible acute coronary syndrome; needs ECG within 10 minutes. " * 10,
+    "doctor_input": "Agree with ESI 2, activate chest pain pathway. " * 10,
+    "iterations_needed": 1,
+    "token_usage": {"input_tokens": 812, "output_tokens": 240},
+}
+
+def baseline_request(app_log: logging.Logger, access_log: logging.Logger, i: int):
+    app_log.info("Creating Supabase client")
+    app_log.info(f"Received triage request with note: {NOTE}")
+    app_log.info(f"Triage workflow result: {RESULT}")
+    app_log.info(f"Assessment stored successfully with ID: {i}")
+    access_log.info('%s - "%s %s HTTP/%s" %d', "10.0.0.1:53211", "POST", "/api/v1/triage/", "1.1", 200)
+
+def current_request(app_log: logging.Logger, access_log: logging.Logger, i: int):
+    app_log.info("Received triage request", extra={"note_chars": len(NOTE), "run_id": None})
+    app_log.debug("Triage note: %s", NOTE)
+    app_log.debug("Triage workflow result: %s", RESULT)
+    app_log.info("Triage completed", extra={"esi_level": 2, "iterations": 1, "assessment_id": i, "run_id": None})
+    access_log.info('%s - "%s %s HTTP/%s" %d', "10.0.0.1:53211", "POST", "/api/v1/triage/", "1.1", 200)
+
+def run_scenario(name: str, args, stream) -> dict:
+    if name == "baseline":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+        emit = baseline_request
+    else:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(StructuredFormatter(json_output=True, max_chars=args.max_chars))
+        emit = current_request
+    listener = None
+    caller = handler
+    if name.startswith("queue"):
+        caller = NonBlockingQueueHandler(queue.Queue(args.queue_size))
+        listener = QueueListener(caller.queue, handler)
+        listener.start()
+    sampler = SamplingFilter({"bench.uvicorn.access": args.access_sample} if name == "queue-sampled" else {})
+    caller.addFilter(sampler)
+
+    app_log = logging.getLogger(f"bench.app.{name}")
+    access_log = logging.getLogger("bench.uvicorn.access")
+    for lg in (app_log, access_log):
+        lg.handlers = [caller]
+        lg.propagate = False
+        lg.setLevel(logging.INFO)
+
+    def one(i: int) -> float:
+        started = time.perf_counter()
+        emit(app_log, access_log, i)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        per_request = list(pool.map(one, range(args.requests)))
+    hot_path_wall = time.perf_counter() - started
+    drain_s = 0.0
+    if listener is not None:
+        drain_started = time.perf_counter()
+        listener.stop()
+        drain_s = time.perf_counter() - drain_started
+    handler.flush()
+    per_request.sort()
+    return {
+        "scenario": name,
+        "requests": args.requests,
+        "avg_us_per_request": round(sum(per_request) / len(per_request) * 1e6, 1),
+        "p99_us_per_request": round(per_request[int(0.99 * (len(per_request) - 1))] * 1e6, 1),
+        "hot_path_wall_s": round(hot_path_wall, 3),
+        "listener_drain_s": round(drain_s, 3),
+        "sampled_out": sampler.sampled_out,
+        "dropped": getattr(caller, "dropped", 0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure logging overhead per triage request")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--output", help="Log file to write to (default: a temporary file)")
+    parser.add_argument("--access-sample", type=float, default=0.1)
+    parser.add_argument("--max-chars", type=int, default=2000)
+    parser.add_argument("--queue-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    path = args.output or os.path.join(tempfile.mkdtemp(), "bench.log")
+    results = []
+    for name in ("baseline", "sync-json", "queue-json", "queue-sampled"):
+        with open(path, "w") as stream:
+            results.append(run_scenario(name, args, stream))
+        results[-1]["log_bytes"] = os.path.getsize(path)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Microbenchmark for the assessment read path.
+
+Compares decoding and serializing synthetic `assessments` rows the old way
+(per-row model construction, a second response_model validation pass and
+stdlib JSON) against the fast paths used by the repositories and routers.
+
+Usage:
+    python -m scripts.bench_row_decoding [--rows 100000]
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.models import PatientAssessment
+
+def make_rows(n: int) -> List[dict]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "notes": f"45M chest pain radiating to left arm, episode {i}",
+            "esi_level": i % 5 + 1,
+            "diagnosis": "NURSE REASONING: possible ACS\nDOCTOR INPUT: agree, ECG now",
+            "user_id": i % 1000 + 1,
+            "created_at": (start + timedelta(minutes=i)).isoformat(),
+            "updated_at": (start + timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(1, n + 1)
+    ]
+
+def timed(label: str, fn, baseline: float = None) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    speedup = f"  ({baseline / elapsed:.1f}x)" if baseline else ""
+    print(f"{label:<52}{elapsed * 1000:>10.1f} ms{speedup}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark assessment row decoding and encoding")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    adapter = TypeAdapter(List[PatientAssessment])
+    print(f"Decoding + encoding {args.rows:,} rows\n")
+
+    def legacy():
+        models = [PatientAssessment(**row) for row in rows]
+        # FastAPI response_model: dump, validate again, then encode
+        revalidated = [PatientAssessment.model_validate(m.model_dump()) for m in models]
+        json.dumps([m.model_dump(mode="json") for m in revalidated])
+
+    baseline = timed("legacy: per-row models + response_model + json", legacy)
+    timed("TypeAdapter bulk validate + orjson", lambda: orjson.dumps(adapter.dump_python(
+        adapter.validate_python(rows), mode="json")), baseline)
+    timed("model_construct (no validation) + orjson", lambda: orjson.dumps(
+        [PatientAssessment.model_construct(**row).__dict__ for row in rows]), baseline)
+    timed("raw rows + orjson (GET /assessments path)", lambda: orjson.dumps(rows), baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Check read-replica routing against a primary and its replicas.
+
+Probes each replica in SUPABASE_READ_URLS for lag and round trip, then
+creates a throwaway user through UserRepository and checks that:
+- the same client's immediate read is served by the primary (read-your-writes);
+- each replica shows the row within --timeout seconds (observed replication delay);
+- once the stickiness window has passed, reads go to a replica again.
+The user is deleted on the primary afterwards.
+
+Works with any two Postgres instances in streaming replication, each behind
+its own PostgREST (see README, "Read replicas").
+
+Usage:
+    SUPABASE_READ_URLS=http://127.0.0.1:54331 python -m scripts.check_replicas [--timeout 30]
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from app.engine import get_supabase_client
+from app.models import UserType
+from app.replicas import read_replicas, read_session
+from app.repository.UserRepository import UserRepository
+
+def wait_visible(client, email: str, timeout: float) -> float:
+    """Seconds until the row shows up on this client, or -1 after `timeout`"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if client.table("users").select("id").eq("email", email).execute().data:
+            return round(time.perf_counter() - started, 3)
+        time.sleep(0.05)
+    return -1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Check read-replica routing and read-your-writes")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for a write to reach a replica")
+    args = parser.parse_args()
+    if not read_replicas.enabled:
+        raise SystemExit("No replicas configured: set SUPABASE_READ_URLS (and STORAGE_BACKEND=supabase)")
+
+    read_replicas.probe()
+    primary = get_supabase_client()
+    repository = UserRepository(primary)
+    read_session.set(f"check-{uuid.uuid4().hex[:8]}")
+    email = f"replica-check-{uuid.uuid4().hex[:12]}@example.invalid"
+    user = repository.create(name="Replica check", email=email, age=30, gender="other", user_type=UserType.PATIENT)
+    try:
+        sticky_reader = read_replicas.reader(primary)
+        sticky_read = repository.get_by_email(email)
+        delays = {r.url: wait_visible(r.client, email, args.timeout) for r in read_replicas.replicas}
+        time.sleep(read_replicas.sticky_seconds)
+        read_replicas.probe()
+        routed = read_replicas.reader(primary)
+        after_window = next((r.url for r in read_replicas.replicas if r.client is routed), "primary")
+    finally:
+        primary.table("users").delete().eq("id", user.id).execute()
+
+    print(json.dumps({
+        "read_your_writes": sticky_reader is primary and sticky_read is not None,
+        "replication_delay_s": delays,
+        "reads_after_window": after_window,
+        "routing": read_replicas.stats(),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Capacity-planning load generator for the full user journey.
+
+Simulates concurrent patients and staff against a running API:
+
+- patients log in, hold a multi-turn /triage/chat conversation until
+  NurseBot records its note (which runs triage and stores the assessment),
+  and some also submit a standalone /triage/ note;
+- staff log in and poll the dashboard reads (/assessments, search, users).
+
+Load is applied in stages of increasing concurrent patients (staff scale with
+--staff-ratio). Each stage reports throughput, latency percentiles and errors
+per endpoint and whether every endpoint met the p95 SLO and error budget, so
+the last passing stage is the deployment's capacity. Like the mobile client,
+simulated users retry 429/503 responses after Retry-After.
+
+With --spawn-server a local uvicorn is started with the fake LLM
+(LLM_PROVIDER=fake, latency from --llm-latency-ms) and, with --sqlite, a
+throwaway SQLite database. Any other server settings (admission limits,
+write-behind, ...) are taken from the environment.
+
+Usage:
+    python -m scripts.load_test --spawn-server --sqlite [--stages 5,10,20,40]
+        [--duration 30] [--staff-ratio 0.2] [--triage-ratio 0.3] [--slo-p95-ms 2000] [--max-error-rate 0.01]
+        [--llm-latency-ms 300] [--output load_report.json]
+    python -m scripts.load_test --url http://localhost:8000 --stages 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+PATIENT_REPLIES = [
+    "I have had a headache and a fever since yesterday",
+    "It is about a 6 out of 10",
+    "I also feel nauseous and my neck is stiff",
+    "No, I don't take any medication",
+    "It started suddenly in the evening",
+    "I have not had this before",
+]
+
+TRIAGE_NOTES = [
+    "45-year-old male with chest pain radiating to the left arm, sweating and shortness of breath.",
+    "22-year-old female with a sprained ankle after a fall, able to bear weight, stable vitals.",
+    "70-year-old with sudden confusion and slurred speech starting 30 minutes ago.",
+    "8-year-old with fever of 38.5C and sore throat for two days, eating and drinking normally.",
+    "35-year-old with a small laceration on the forearm, bleeding controlled.",
+]
+
+SEARCH_TERMS = ["chest pain", "fever", "headache", "fall", "shortness of breath"]
+
+class Recorder:
+    """Per-endpoint latency samples, status codes and transport errors"""
+
+    def __init__(self, retries: int = 2):
+        self.retries = retries
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.journeys = Counter()
+
+    def record(self, endpoint: str, latency: float, status: str):
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status] += 1
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                self.record(endpoint, time.perf_counter() - started, type(e).__name__)
+                return None
+            self.record(endpoint, time.perf_counter() - started, str(response.status_code))
+            if response.status_code not in (429, 503) or attempt == self.retries:
+                break
+            # Behave like the mobile client: honour Retry-After, then retry
+            retry_after = min(float(response.headers.get("Retry-After", 1)), 5.0)
+            await asyncio.sleep(retry_after * random.uniform(0.8, 1.2))
+        return response if response.status_code < 400 else None
+
+    def report(self, elapsed: float, slo_p95_ms: float, max_error_rate: float) -> Dict:
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            samples = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            total = sum(statuses.values())
+            errors = sum(n for status, n in statuses.items() if not status.startswith(("2", "3")))
+            p95_ms = _percentile(samples, 95) * 1000
+            endpoints[endpoint] = {
+                "requests": total,
+                "rps": round(total / elapsed, 2) if elapsed else None,
+                "errors": errors,
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "shed_429": statuses.get("429", 0),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(p95_ms, 1),
+                "p99_ms": round(_percentile(samples, 99) * 1000, 1),
+                "max_ms": round(max(samples) * 1000, 1) if samples else 0.0,
+                "statuses": dict(statuses),
+                "meets_slo": p95_ms <= slo_p95_ms and (errors / total if total else 0.0) <= max_error_rate,
+            }
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "journeys": dict(self.journeys),
+            "endpoints": endpoints,
+            "meets_slo": bool(endpoints) and all(e["meets_slo"] for e in endpoints.values()),
+        }
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+async def login(client: httpx.AsyncClient, rec: Recorder, user_type: str) -> Optional[int]:
+    tag = uuid.uuid4().hex[:12]
+    response = await rec.call(client, "POST /users/login", "POST", "/users/login", json={
+        "name": f"Load {user_type} {tag}",
+        "email": f"load-{user_type}-{tag}@example.com",
+        "age": random.randint(18, 90),
+        "gender": random.choice(["male", "female"]),
+        "user_type": user_type,
+    })
+    return response.json()["id"] if response is not None else None
+
+async def think(args):
+    if args.think_ms:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+async def patient_journey(client: httpx.AsyncClient, rec: Recorder, args):
+    patient_id = await login(client, rec, "patient")
+    if patient_id is None:
+        rec.journeys["patient_failed"] += 1
+        await think(args)
+        return
+    response = await rec.call(client, "POST /triage/chat", "POST", "/triage/chat",
+                              json={"message": "", "history": [], "patient_id": patient_id})
+    if response is None:
+        rec.journeys["patient_failed"] += 1
+        await think(args)
+        return
+    history = [{"role": "assistant", "content": response.json()["response"]}]
+    for reply in PATIENT_REPLIES[:args.max_turns]:
+        await think(args)
+        history.append({"role": "user", "content": reply})
+        response = await rec.call(client, "POST /triage/chat", "POST", "/triage/chat",
+                                  json={"message": reply, "history": history, "patient_id": patient_id})
+        if response is None:
+            rec.journeys["patient_failed"] += 1
+            await think(args)
+            return
+        body = response.json()
+        history.append({"role": "assistant", "content": body["response"]})
+        if body["finished"]:
+            rec.journeys["patient_triaged"] += 1
+            break
+    else:
+        rec.journeys["patient_unfinished"] += 1
+    if random.random() < args.triage_ratio:
+        await think(args)
+        await rec.call(client, "POST /triage/", "POST", "/triage/", json={"note": random.choice(TRIAGE_NOTES)},
+                       headers={"Idempotency-Key": uuid.uuid4().hex})
+
+async def staff_journey(client: httpx.AsyncClient, rec: Recorder, args, deadline: float):
+    staff_id = await login(client, rec, "staff")
+    if staff_id is None:
+        rec.journeys["staff_failed"] += 1
+        return
+    while time.monotonic() < deadline:
+        await rec.call(client, "GET /assessments", "GET", "/assessments", params={"days": 1})
+        await rec.call(client, "GET /assessments/search", "GET", "/assessments/search",
+                       params={"q": random.choice(SEARCH_TERMS), "limit": 20})
+        await rec.call(client, "GET /users/{id}", "GET", f"/users/{staff_id}")
+        rec.journeys["staff_refreshes"] += 1
+        await asyncio.sleep(args.staff_poll_s)
+
+async def user_loop(journey, deadline: float, ramp_delay: float):
+    await asyncio.sleep(ramp_delay)
+    while time.monotonic() < deadline:
+        await journey()
+
+async def run_stage(args, patients: int) -> Dict:
+    staff = max(1, round(patients * args.staff_ratio)) if args.staff_ratio > 0 else 0
+    rec = Recorder(retries=args.retries)
+    limits = httpx.Limits(max_connections=patients + staff + 10, max_keepalive_connections=patients + staff + 10)
+    async with httpx.AsyncClient(base_url=f"{args.url.rstrip('/')}/api/v1", timeout=args.timeout, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + args.duration
+        ramp = args.ramp_up / max(patients, 1)
+        tasks = [
+            user_loop(lambda: patient_journey(client, rec, args), deadline, i * ramp) for i in range(patients)
+        ] + [
+            user_loop(lambda: staff_journey(client, rec, args, deadline), deadline, i * ramp) for i in range(staff)
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+    return {"patients": patients, "staff": staff, **rec.report(elapsed, args.slo_p95_ms, args.max_error_rate)}
+
+def spawn_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("LLM_PROVIDER", "fake")
+    env["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    env.setdefault("FAKE_LLM_JITTER_MS", str(args.llm_latency_ms * 0.25))
+    if args.sqlite:
+        directory = tempfile.mkdtemp(prefix="load_test_")
+        env["STORAGE_BACKEND"] = "sqlite"
+        env["SQLITE_PATH"] = os.path.join(directory, "load_test.db")
+        env["TRIAGE_CHECKPOINT_PATH"] = os.path.join(directory, "triage_checkpoints.db")
+    port = args.url.rsplit(":", 1)[-1].split("/")[0]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", port, "--workers", str(args.server_workers),
+         "--log-level", "warning"],
+        env=env
+    )
+    for _ in range(120):
+        try:
+            if httpx.get(args.url, timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("API server did not become ready")
+
+def print_stage(stage: Dict):
+    verdict = "PASS" if stage["meets_slo"] else "FAIL"
+    print(f"\n== {stage['patients']} patients / {stage['staff']} staff, {stage['elapsed_s']}s: {verdict} ==")
+    print(f"{'endpoint':<26}{'reqs':>7}{'rps':>8}{'err%':>7}{'429':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, e in stage["endpoints"].items():
+        print(f"{name:<26}{e['requests']:>7}{e['rps']:>8}{e['error_rate'] * 100:>6.1f}%{e['shed_429']:>6}"
+              f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}")
+    print(f"journeys: {stage['journeys']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the full patient and staff journey")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn-server", action="store_true", help="Start a local API server with the fake LLM")
+    parser.add_argument("--sqlite", action="store_true", help="With --spawn-server, use a throwaway SQLite database")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Fake LLM latency for --spawn-server")
+    parser.add_argument("--stages", default="5,10,20,40", help="Comma-separated concurrent patient counts")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per stage")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds to start all users of a stage")
+    parser.add_argument("--staff-ratio", type=float, default=0.2, help="Staff users per concurrent patient")
+    parser.add_argument("--staff-poll-s", type=float, default=5, help="Dashboard refresh interval")
+    parser.add_argument("--triage-ratio", type=float, default=0.3, help="Share of patients also calling /triage/")
+    parser.add_argument("--max-turns", type=int, default=len(PATIENT_REPLIES))
+    parser.add_argument("--think-ms", type=float, default=3000, help="Mean patient think time between messages")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--retries", type=int, default=2, help="Client retries on 429/503, after Retry-After")
+    parser.add_argument("--slo-p95-ms", type=float, default=2000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Per-endpoint error budget, 429s included")
+    parser.add_argument("--output", help="Write the full report as JSON to this path")
+    args = parser.parse_args()
+
+    server = spawn_server(args) if args.spawn_server else None
+    stages = []
+    try:
+        for patients in (int(n) for n in args.stages.split(",") if n.strip()):
+            stage = asyncio.run(run_stage(args, patients))
+            stages.append(stage)
+            print_stage(stage)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    passing = [s["patients"] for s in stages if s["meets_slo"]]
+    report = {
+        "url": args.url,
+        "slo_p95_ms": args.slo_p95_ms,
+        "llm_latency_ms": args.llm_latency_ms if args.spawn_server else None,
+        "stages": stages,
+        "max_patients_within_slo": max(passing) if passing else None,
+    }
+    print(f"\nMax concurrent patients within p95 <= {args.slo_p95_ms:.0f} ms: {report['max_patients_within_slo']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
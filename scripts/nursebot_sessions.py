@@ -0,0 +1,150 @@
+"""Headless NurseBot load driver.
+
+Runs many scripted intake conversations concurrently through the NurseBot
+graph in-process, with a scripted I/O adapter in place of the console and
+the fake LLM (zero latency by default) in place of Gemini, so what is
+measured is the per-turn overhead of the graph, context window and LLM
+guard rather than the model.
+
+Usage:
+    python -m scripts.nursebot_sessions [--sessions 2000] [--concurrency 64]
+        [--turns 3] [--llm-latency-ms 0] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+SCRIPT = [
+    "I have had chest pain since this morning",
+    "It gets worse when I climb stairs",
+    "About a 7 out of 10, and I feel short of breath",
+    "I take lisinopril for blood pressure",
+    "No allergies that I know of",
+    "It started after breakfast",
+    "No, nothing like this before",
+    "Yes, some sweating too",
+]
+
+def configure_env(args):
+    """Must run before the agents are imported: their settings are read at import time"""
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["FAKE_LLM_JITTER_MS"] = "0"
+    os.environ["FAKE_LLM_CHAT_TURNS"] = str(args.turns)
+    # Admission limits protect the real provider; the driver is the only caller here
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", str(args.concurrency))
+    os.environ.setdefault("LLM_MAX_QUEUE", str(args.concurrency * 4))
+    os.environ.setdefault("LLM_GLOBAL_RATE", "1000000")
+    os.environ.setdefault("LLM_GLOBAL_BURST", "1000000")
+    os.environ.setdefault("LLM_PATIENT_RATE", "1000000")
+    os.environ.setdefault("LLM_PATIENT_BURST", "1000000")
+    os.environ.setdefault("LLM_HEDGE_PERCENTILE", "0")
+
+class ScriptedIO:
+    """Replays canned patient replies and timestamps every turn"""
+
+    def __init__(self, replies: List[str]):
+        self.replies = list(replies)
+        self.transcript: List[str] = []
+        self.turn_latencies: List[float] = []
+        self._replied_at: Optional[float] = None
+
+    def send(self, text: str) -> None:
+        self.end_turn()
+        self.transcript.append(text)
+
+    def receive(self) -> Optional[str]:
+        if not self.replies:
+            return None
+        self._replied_at = time.perf_counter()
+        return self.replies.pop(0)
+
+    def end_turn(self):
+        if self._replied_at is not None:
+            self.turn_latencies.append(time.perf_counter() - self._replied_at)
+            self._replied_at = None
+
+def run_session(session_id: int, turns: int) -> dict:
+    from agents.admission import current_patient
+    from agents.nursebot import run_chat
+
+    current_patient.set(f"session-{session_id}")
+    io = ScriptedIO(SCRIPT[:turns + 1])
+    started = time.perf_counter()
+    try:
+        state = run_chat(io=io)
+        # The last turn ends in a take_note call, which is never sent back through the adapter
+        io.end_turn()
+        return {
+            "ok": True,
+            "turn_latencies": io.turn_latencies,
+            "notes": len(state["notes"]),
+            "messages": len(state["messages"]),
+            "duration_s": time.perf_counter() - started,
+        }
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "turn_latencies": io.turn_latencies,
+                "duration_s": time.perf_counter() - started}
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scripted NurseBot sessions in-process")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--turns", type=int, default=3, help="Patient replies before NurseBot takes its note")
+    parser.add_argument("--llm-latency-ms", type=float, default=0)
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+    if not 1 <= args.turns < len(SCRIPT):
+        parser.error(f"--turns must be between 1 and {len(SCRIPT) - 1}")
+    configure_env(args)
+
+    from agents.nursebot import context_window
+    from agents.resilience import llm_invoker
+
+    run_session(-1, args.turns)  # warm-up: imports, graph compilation
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda i: run_session(i, args.turns), range(args.sessions)))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    latencies = [t for r in results for t in r["turn_latencies"]]
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    report = {
+        "sessions": args.sessions,
+        "completed": len(ok),
+        "with_notes": sum(1 for r in ok if r["notes"]),
+        "concurrency": args.concurrency,
+        "llm_latency_ms": args.llm_latency_ms,
+        "turns": len(latencies),
+        "wall_s": round(elapsed, 3),
+        "turns_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "turn_p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "turn_p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "turn_p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        # Time beyond the injected model latency is the per-turn overhead
+        "overhead_p50_ms": round(max(0.0, _percentile(latencies, 50) * 1000 - args.llm_latency_ms), 3),
+        "errors": errors,
+        "llm_resilience": llm_invoker.stats(),
+        "nursebot_context": context_window.stats(),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Replay stored assessments through the triage workflow.
+
+Re-runs `run_triage_workflow` over the assessment history to measure the
+impact of prompt or loop-policy changes. Assessments are streamed from the
+repository in chunks, replayed across a process or asyncio pool under a rate
+limit, and written to JSONL as they complete. A checkpoint file records the
+last fully replayed chunk so an interrupted run can resume.
+
+Usage:
+    python -m scripts.replay_assessments --output replay.jsonl [--mode process|async]
+        [--workers 4] [--rate 60] [--chunk-size 200] [--limit N] [--parquet replay.parquet]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+# Replays must exercise the full workflow, never reuse a stored result
+os.environ["TRIAGE_SIMILARITY_MODE"] = "off"
+# Replays track their own progress; per-run graph checkpoints would only add writes
+os.environ.setdefault("TRIAGE_CHECKPOINTER", "off")
+
+from agents.triageagent import arun_triage_workflow, run_triage_workflow
+from app.engine import get_storage_client
+from app.models import PatientAssessment
+from app.repository.AssessmentRepository import AssessmentRepository
+
+class RateLimiter:
+    """Spaces out call starts to at most `rate` per minute (0 disables)"""
+
+    def __init__(self, rate: float):
+        self.interval = 60.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+            return wait
+
+    def wait(self):
+        time.sleep(self.delay())
+
+    async def await_slot(self):
+        await asyncio.sleep(self.delay())
+
+def _record(assessment: PatientAssessment, result: Optional[dict], latency: float, error: Optional[str]) -> dict:
+    predicted = result.get("final_esi_level") if result else None
+    return {
+        "assessment_id": assessment.id,
+        "stored_esi_level": assessment.esi_level,
+        "replayed_esi_level": predicted if isinstance(predicted, int) else None,
+        "agreement": predicted == assessment.esi_level,
+        "consensus": result.get("consensus_reached") if result else None,
+        "iterations": result.get("iterations_needed") if result else None,
+        "latency_s": round(latency, 3),
+        "input_tokens": result.get("token_usage", {}).get("input_tokens", 0) if result else 0,
+        "output_tokens": result.get("token_usage", {}).get("output_tokens", 0) if result else 0,
+        "error": error,
+    }
+
+def _replay_one(assessment: PatientAssessment) -> dict:
+    """Process-pool worker: replay a single assessment"""
+    start = time.perf_counter()
+    try:
+        result = run_triage_workflow(assessment.notes)
+        return _record(assessment, result, time.perf_counter() - start, None)
+    except Exception as e:
+        return _record(assessment, None, time.perf_counter() - start, str(e))
+
+async def _areplay_one(assessment: PatientAssessment, limiter: RateLimiter, slots: asyncio.Semaphore) -> dict:
+    async with slots:
+        await limiter.await_slot()
+        start = time.perf_counter()
+        try:
+            result = await arun_triage_workflow(assessment.notes)
+            return _record(assessment, result, time.perf_counter() - start, None)
+        except Exception as e:
+            return _record(assessment, None, time.perf_counter() - start, str(e))
+
+def replay_chunk_process(pool: ProcessPoolExecutor, chunk: List[PatientAssessment], limiter: RateLimiter) -> List[dict]:
+    futures = []
+    for assessment in chunk:
+        limiter.wait()
+        futures.append(pool.submit(_replay_one, assessment))
+    return [f.result() for f in futures]
+
+def replay_chunk_async(chunk: List[PatientAssessment], limiter: RateLimiter, workers: int) -> List[dict]:
+    async def run():
+        slots = asyncio.Semaphore(workers)
+        return await asyncio.gather(*(_areplay_one(a, limiter, slots) for a in chunk))
+    return asyncio.run(run())
+
+def load_checkpoint(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f).get("last_id", 0)
+
+def save_checkpoint(path: str, last_id: int):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"last_id": last_id, "updated_at": time.time()}, f)
+    os.replace(tmp, path)
+
+def load_done_ids(output: str) -> set:
+    """Ids already written by a previous, interrupted run"""
+    done = set()
+    if os.path.exists(output):
+        with open(output) as f:
+            for line in f:
+                if line.strip():
+                    done.add(json.loads(line)["assessment_id"])
+    return done
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def summarize(output: str) -> Dict:
+    """Aggregate report over every record in the output file"""
+    records = []
+    with open(output) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    ok = [r for r in records if r["error"] is None]
+    latencies = [r["latency_s"] for r in ok]
+    scored = [r for r in ok if r["replayed_esi_level"] is not None]
+    confusion = Counter(f"{r['stored_esi_level']}->{r['replayed_esi_level']}" for r in scored)
+    return {
+        "replayed": len(records),
+        "errors": len(records) - len(ok),
+        "esi_agreement": round(sum(r["agreement"] for r in scored) / len(scored), 4) if scored else None,
+        "esi_within_one": round(
+            sum(abs(r["stored_esi_level"] - r["replayed_esi_level"]) <= 1 for r in scored) / len(scored), 4
+        ) if scored else None,
+        "undetermined": len(ok) - len(scored),
+        "confusion": dict(sorted(confusion.items())),
+        "mean_iterations": round(statistics.mean(r["iterations"] for r in ok), 3) if ok else None,
+        "latency_p50_s": _percentile(latencies, 50),
+        "latency_p95_s": _percentile(latencies, 95),
+        "input_tokens": sum(r["input_tokens"] for r in records),
+        "output_tokens": sum(r["output_tokens"] for r in records),
+    }
+
+def write_parquet(output: str, parquet_path: str):
+    try:
+        import pandas as pd
+        pd.read_json(output, lines=True).to_parquet(parquet_path, index=False)
+    except ImportError as e:
+        print(f"Skipping Parquet output ({e}); install pyarrow to enable it")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored assessments through the triage workflow")
+    parser.add_argument("--output", default="replay.jsonl", help="JSONL results file (also used to resume)")
+    parser.add_argument("--parquet", help="Also write results as Parquet to this path")
+    parser.add_argument("--mode", choices=["process", "async"], default="process")
+    parser.add_argument("--workers", type=int, default=4, help="Processes or concurrent async calls")
+    parser.add_argument("--rate", type=float, default=60, help="Max workflow starts per minute (0 = unlimited)")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--limit", type=int, help="Stop after this many assessments")
+    parser.add_argument("--fresh", action="store_true", help="Ignore any existing checkpoint and output")
+    args = parser.parse_args()
+
+    checkpoint = f"{args.output}.checkpoint.json"
+    if args.fresh:
+        for path in (args.output, checkpoint):
+            if os.path.exists(path):
+                os.remove(path)
+    after_id = load_checkpoint(checkpoint)
+    done = load_done_ids(args.output)
+    if after_id or done:
+        print(f"Resuming after assessment {after_id} ({len(done)} already replayed)")
+
+    repository = AssessmentRepository(get_storage_client())
+    limiter = RateLimiter(args.rate)
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.mode == "process" else None
+    replayed = 0
+    started = time.perf_counter()
+    try:
+        with open(args.output, "a") as out:
+            for chunk in repository.iter_all(chunk_size=args.chunk_size, after_id=after_id):
+                todo = [a for a in chunk if a.id not in done]
+                if args.limit is not None:
+                    todo = todo[:max(0, args.limit - replayed)]
+                if todo:
+                    if pool is not None:
+                        records = replay_chunk_process(pool, todo, limiter)
+                    else:
+                        records = replay_chunk_async(todo, limiter, args.workers)
+                    for record in records:
+                        out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    replayed += len(records)
+                    print(f"Replayed {replayed} assessments ({time.perf_counter() - started:.1f}s)")
+                if args.limit is not None and replayed >= args.limit:
+                    break
+                save_checkpoint(checkpoint, chunk[-1].id)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report = summarize(args.output)
+    with open(f"{args.output}.summary.json", "w") as f:
+        json.dump(report, f, indent=2)
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Train the local ESI classifier used by the tiered triage cascade.
+
+Streams stored assessments (notes and esi_level), holds out a deterministic
+fraction for evaluation, trains a hashed n-gram naive Bayes model and picks
+the confidence threshold at which hold-out precision reaches the target.
+Assessments that the classifier itself finalized are left out so it never
+learns from its own output.
+
+The artifact is written as `esi_classifier-<version>.npz` (+ `.json`
+metadata) and `LATEST` is pointed at it; the API loads LATEST from
+ESI_CLASSIFIER_PATH at startup.
+
+Usage:
+    python -m scripts.train_esi_classifier [--output-dir models/esi_classifier]
+        [--target-precision 0.97] [--holdout 0.2] [--min-samples 200]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import time
+from collections import Counter
+from datetime import UTC, datetime
+
+from agents.esi_classifier import CLASSIFIER_REASONING_PREFIX, ESI_LEVELS, ESIClassifier, choose_threshold
+from app.engine import get_storage_client
+from app.repository.AssessmentRepository import AssessmentRepository
+
+def load_examples(repository: AssessmentRepository, chunk_size: int):
+    notes, labels, skipped = [], [], 0
+    for rows in repository.iter_rows(chunk_size=chunk_size):
+        for row in rows:
+            if row["esi_level"] not in ESI_LEVELS or CLASSIFIER_REASONING_PREFIX in (row.get("diagnosis") or ""):
+                skipped += 1
+                continue
+            notes.append(row["notes"])
+            labels.append(row["esi_level"])
+    return notes, labels, skipped
+
+def is_holdout(note: str, fraction: float) -> bool:
+    """Stable split, so retraining on a grown table keeps old hold-out notes out of training"""
+    return int(hashlib.sha256(note.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF < fraction
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local ESI classifier from stored assessments")
+    parser.add_argument("--output-dir", default="models/esi_classifier")
+    parser.add_argument("--target-precision", type=float, default=0.97,
+                        help="Hold-out precision required of notes finalized without the LLM")
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--min-samples", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=17, help="log2 of the hashed feature space")
+    parser.add_argument("--alpha", type=float, default=0.1, help="Additive smoothing")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    notes, labels, skipped = load_examples(AssessmentRepository(get_storage_client()), args.chunk_size)
+    if len(notes) < args.min_samples:
+        raise SystemExit(f"Only {len(notes)} usable assessments (need {args.min_samples}); not training")
+
+    split = [is_holdout(n, args.holdout) for n in notes]
+    train = [(n, l) for n, l, h in zip(notes, labels, split) if not h]
+    test = [(n, l) for n, l, h in zip(notes, labels, split) if h]
+    trained_at = datetime.now(UTC)
+    data_hash = hashlib.sha256("\n".join(f"{l}\t{n}" for n, l in zip(notes, labels)).encode("utf-8")).hexdigest()
+
+    started = time.perf_counter()
+    model = ESIClassifier.train([n for n, _ in train], [l for _, l in train], dim=1 << args.dim, alpha=args.alpha)
+    train_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    predictions = [model.predict(n) for n, _ in test]
+    predict_us = (time.perf_counter() - started) / max(len(test), 1) * 1e6
+    correct = [p[0] == l for p, (_, l) in zip(predictions, test)]
+    threshold = choose_threshold([p[1] for p in predictions], correct, args.target_precision)
+    accepted = [ok for p, ok in zip(predictions, correct) if p[1] >= threshold]
+
+    model.threshold = threshold
+    model.metadata = {
+        "version": f"{trained_at:%Y%m%d%H%M%S}-{data_hash[:8]}",
+        "trained_at": trained_at.isoformat(),
+        "data_sha256": data_hash,
+        "train_samples": len(train),
+        "holdout_samples": len(test),
+        "skipped": skipped,
+        "label_counts": {str(k): v for k, v in sorted(Counter(labels).items())},
+        "dim": 1 << args.dim,
+        "alpha": args.alpha,
+        "target_precision": args.target_precision,
+        "holdout_accuracy": round(sum(correct) / len(correct), 4) if correct else None,
+        "holdout_coverage": round(len(accepted) / len(test), 4) if test else 0.0,
+        "holdout_precision_at_threshold": round(sum(accepted) / len(accepted), 4) if accepted else None,
+        "avg_predict_us": round(predict_us, 1),
+        "train_s": round(train_s, 2),
+    }
+    path = model.save(args.output_dir)
+    print(json.dumps({**model.metadata, "threshold": None if math.isinf(threshold) else threshold}, indent=2))
+    if math.isinf(threshold):
+        print("No confidence level reached the target precision; the cascade will escalate every note")
+    print(f"Saved {path}")
+
+if __name__ == "__main__":
+    main()
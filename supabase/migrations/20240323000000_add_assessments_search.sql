@@ -0,0 +1,53 @@
+-- Full-text search over assessment notes and diagnoses
+alter table public.assessments
+add column search_vector tsvector
+generated always as (
+    setweight(to_tsvector('english', coalesce(diagnosis, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(notes, '')), 'B')
+) stored;
+
+-- GIN index keeps lookups proportional to the number of matches, not table size
+create index idx_assessments_search_vector on public.assessments using gin (search_vector);
+
+-- Ranked, highlighted, paginated search.
+-- Highlighting only runs on the requested page, so its cost doesn't grow with the table.
+create or replace function public.search_assessments(
+    q text,
+    page_limit integer default 20,
+    page_offset integer default 0
+)
+returns table (
+    id bigint,
+    notes text,
+    esi_level integer,
+    diagnosis text,
+    user_id bigint,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone,
+    rank real,
+    notes_headline text,
+    diagnosis_headline text
+)
+language sql stable
+as $$
+    with query as (
+        select websearch_to_tsquery('english', q) as tsq
+    ),
+    page as (
+        select a.id, a.notes, a.esi_level, a.diagnosis, a.user_id, a.created_at, a.updated_at,
+               ts_rank_cd(a.search_vector, query.tsq) as rank
+        from public.assessments a, query
+        where a.search_vector @@ query.tsq
+        order by rank desc, a.id desc
+        limit page_limit
+        offset page_offset
+    )
+    select page.id, page.notes, page.esi_level, page.diagnosis, page.user_id,
+           page.created_at, page.updated_at, page.rank,
+           ts_headline('english', page.notes, query.tsq,
+                       'StartSel=**, StopSel=**, MaxFragments=2, MaxWords=25, MinWords=8'),
+           ts_headline('english', page.diagnosis, query.tsq,
+                       'StartSel=**, StopSel=**, MaxFragments=2, MaxWords=25, MinWords=8')
+    from page, query
+    order by page.rank desc, page.id desc;
+$$;
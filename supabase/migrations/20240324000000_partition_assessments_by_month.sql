@@ -0,0 +1,117 @@
+-- Convert public.assessments to monthly range partitions on created_at.
+-- Date-bounded queries only touch the partitions they need, and old months
+-- can be detached and archived without a bulk delete.
+
+alter table public.assessments rename to assessments_legacy;
+alter index if exists idx_assessments_user_id rename to idx_assessments_legacy_user_id;
+alter index if exists idx_assessments_search_vector rename to idx_assessments_legacy_search_vector;
+
+-- Identity columns aren't supported on partitioned tables before Postgres 17
+create sequence public.assessments_id_seq as bigint;
+select setval('public.assessments_id_seq', coalesce((select max(id) from public.assessments_legacy), 0) + 1, false);
+
+create table public.assessments (
+    id bigint not null default nextval('public.assessments_id_seq'),
+    notes text not null,
+    esi_level integer not null,
+    diagnosis text not null,
+    user_id bigint not null references public.users(id) on delete cascade,
+    created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null,
+    search_vector tsvector generated always as (
+        setweight(to_tsvector('english', coalesce(diagnosis, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(notes, '')), 'B')
+    ) stored,
+    primary key (id, created_at)
+) partition by range (created_at);
+
+alter sequence public.assessments_id_seq owned by public.assessments.id;
+
+-- Partitioned indexes are created on every partition automatically
+create index idx_assessments_user_id on public.assessments(user_id);
+create index idx_assessments_created_at on public.assessments(created_at);
+create index idx_assessments_id on public.assessments(id);
+create index idx_assessments_search_vector on public.assessments using gin (search_vector);
+
+-- Create the partition holding the month that contains `month`, if missing
+create or replace function public.create_assessments_partition(month date)
+returns text
+language plpgsql
+as $$
+declare
+    start_at date := date_trunc('month', month)::date;
+    partition_name text := format('assessments_y%sm%s', to_char(start_at, 'YYYY'), to_char(start_at, 'MM'));
+begin
+    if to_regclass(format('public.%I', partition_name)) is null then
+        execute format(
+            'create table public.%I partition of public.assessments for values from (%L) to (%L)',
+            partition_name, start_at, (start_at + interval '1 month')::date
+        );
+        execute format('alter table public.%I enable row level security', partition_name);
+    end if;
+    return partition_name;
+end;
+$$;
+
+-- Make sure partitions exist for the current month and `months_ahead` months after it
+create or replace function public.ensure_assessments_partitions(months_ahead integer default 3)
+returns setof text
+language sql
+as $$
+    select public.create_assessments_partition((date_trunc('month', now()) + make_interval(months => m))::date)
+    from generate_series(0, months_ahead) as m;
+$$;
+
+-- Partitions for the existing history, then the months ahead
+select public.create_assessments_partition(month::date)
+from generate_series(
+    date_trunc('month', coalesce((select min(created_at) from public.assessments_legacy), now())),
+    date_trunc('month', now()),
+    interval '1 month'
+) as month;
+select public.ensure_assessments_partitions(3);
+
+insert into public.assessments (id, notes, esi_level, diagnosis, user_id, created_at, updated_at)
+select id, notes, esi_level, diagnosis, user_id, created_at, updated_at
+from public.assessments_legacy;
+
+drop table public.assessments_legacy;
+
+-- Row Level Security and policies, as in the original table
+alter table public.assessments enable row level security;
+
+create policy "Enable read access for all users" on public.assessments
+    for select
+    using (true);
+
+create policy "Enable insert access for authenticated users" on public.assessments
+    for insert
+    with check (true);
+
+create policy "Enable update access for authenticated users" on public.assessments
+    for update
+    using (true)
+    with check (true);
+
+create policy "Enable delete access for authenticated users" on public.assessments
+    for delete
+    using (true);
+
+create trigger handle_assessments_updated_at
+    before update on public.assessments
+    for each row
+    execute function public.handle_updated_at();
+
+-- Keep partitions created ahead of time when pg_cron is available
+do $$
+begin
+    create extension if not exists pg_cron;
+    perform cron.schedule(
+        'ensure-assessments-partitions',
+        '0 3 1 * *',
+        'select public.ensure_assessments_partitions(3)'
+    );
+exception when others then
+    raise notice 'pg_cron unavailable (%); run ensure_assessments_partitions() from the retention job', sqlerrm;
+end;
+$$;
@@ -0,0 +1,61 @@
+-- Stored responses for requests sent with an Idempotency-Key header.
+-- A row is claimed as in_progress by the first request and completed with its
+-- response; retries with the same key replay it instead of re-running triage.
+create table public.idempotency_keys (
+    scope text not null,
+    key text not null,
+    request_hash text not null,
+    status text not null check (status in ('in_progress', 'completed')),
+    status_code integer,
+    response text,
+    created_at timestamp with time zone not null default timezone('utc'::text, now()),
+    expires_at timestamp with time zone not null,
+    primary key (scope, key)
+);
+
+create index idx_idempotency_keys_expires_at on public.idempotency_keys (expires_at);
+
+-- Enable Row Level Security (RLS)
+alter table public.idempotency_keys enable row level security;
+
+-- Create policies
+create policy "Enable read access for all users" on public.idempotency_keys
+    for select
+    using (true);
+
+create policy "Enable insert access for authenticated users" on public.idempotency_keys
+    for insert
+    with check (true);
+
+create policy "Enable update access for authenticated users" on public.idempotency_keys
+    for update
+    using (true)
+    with check (true);
+
+create policy "Enable delete access for authenticated users" on public.idempotency_keys
+    for delete
+    using (true);
+
+create or replace function public.purge_expired_idempotency_keys()
+returns integer
+language sql
+as $$
+    with deleted as (
+        delete from public.idempotency_keys where expires_at < now() returning 1
+    )
+    select count(*)::integer from deleted;
+$$;
+
+-- Hourly TTL cleanup when pg_cron is available; the API also purges in the background
+do $$
+begin
+    create extension if not exists pg_cron;
+    perform cron.schedule(
+        'purge-expired-idempotency-keys',
+        '15 * * * *',
+        'select public.purge_expired_idempotency_keys()'
+    );
+exception when others then
+    raise notice 'pg_cron unavailable (%); relying on the API purger', sqlerrm;
+end;
+$$;
@@ -0,0 +1,23 @@
+-- Change watermark for a filtered assessments listing, used to build ETags.
+-- Count catches deletes, max(id) inserts and max(updated_at) edits, without
+-- shipping the rows themselves; the created_at bounds still prune partitions.
+create or replace function public.assessments_watermark(
+    p_user_id bigint default null,
+    p_esi_level integer default null,
+    p_created_after timestamp with time zone default null,
+    p_created_before timestamp with time zone default null
+)
+returns table (
+    row_count bigint,
+    max_id bigint,
+    max_updated_at timestamp with time zone
+)
+language sql stable
+as $$
+    select count(*), max(a.id), max(a.updated_at)
+    from public.assessments a
+    where (p_user_id is null or a.user_id = p_user_id)
+      and (p_esi_level is null or a.esi_level = p_esi_level)
+      and (p_created_after is null or a.created_at >= p_created_after)
+      and (p_created_before is null or a.created_at < p_created_before);
+$$;
@@ -0,0 +1,19 @@
+-- Replication lag in seconds, probed on each read replica to decide whether it
+-- may serve reads. Zero on the primary, and on a streaming standby that has
+-- replayed everything it received (an idle primary would otherwise look like
+-- growing lag). Null on a standby whose WAL receiver is not streaming: with no
+-- receiver, received = replayed says nothing about how far behind it is.
+-- Security definer so the API role can read pg_stat_wal_receiver.
+create or replace function public.replica_lag()
+returns double precision
+language sql stable
+security definer
+set search_path = pg_catalog
+as $$
+    select case
+        when not pg_is_in_recovery() then 0
+        when not exists (select 1 from pg_stat_wal_receiver where status = 'streaming') then null
+        when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() then 0
+        else coalesce(extract(epoch from now() - pg_last_xact_replay_timestamp()), 0)
+    end::double precision;
+$$;
@@ -0,0 +1,10 @@
+-- Client-generated key for write-behind inserts. The flusher upserts on
+-- (write_key, created_at) ignoring duplicates, so a batch re-sent after a
+-- crash between the insert and the journal delete is not stored twice.
+-- Unique constraints on a partitioned table must include the partition key;
+-- the client fixes created_at when it journals the row. Rows inserted
+-- directly leave write_key null, and nulls never conflict.
+alter table public.assessments add column write_key uuid;
+
+alter table public.assessments
+    add constraint assessments_write_key_created_at_key unique (write_key, created_at);
@@ -0,0 +1,4 @@
+-- Last lease renewal of an in-progress idempotency key. The worker running
+-- the request bumps it periodically; another worker only takes the key over
+-- once it has gone unrenewed for IDEMPOTENCY_LEASE_SECONDS.
+alter table public.idempotency_keys add column heartbeat_at timestamp with time zone;
@@ -0,0 +1,60 @@
+-- Bound search cost and page by keyset instead of OFFSET.
+-- Ranking used to score every match, so a common term scanned the whole table and
+-- deep OFFSET pages re-ranked everything before them. Only the newest
+-- max_candidates matches are ranked now, and pages continue after (rank, id).
+drop function if exists public.search_assessments(text, integer, integer);
+
+create or replace function public.search_assessments(
+    q text,
+    page_limit integer default 20,
+    after_rank real default null,
+    after_id bigint default null,
+    max_candidates integer default 2000
+)
+returns table (
+    id bigint,
+    notes text,
+    esi_level integer,
+    diagnosis text,
+    user_id bigint,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone,
+    rank real,
+    notes_headline text,
+    diagnosis_headline text
+)
+language sql stable
+as $$
+    with query as (
+        select websearch_to_tsquery('english', q) as tsq
+    ),
+    candidates as (
+        -- GIN match capped to the most recent hits before anything is ranked
+        select a.id, a.notes, a.esi_level, a.diagnosis, a.user_id, a.created_at, a.updated_at,
+               a.search_vector
+        from public.assessments a, query
+        where a.search_vector @@ query.tsq
+        order by a.id desc
+        limit max_candidates
+    ),
+    ranked as (
+        select c.id, c.notes, c.esi_level, c.diagnosis, c.user_id, c.created_at, c.updated_at,
+               ts_rank_cd(c.search_vector, query.tsq) as rank
+        from candidates c, query
+    ),
+    page as (
+        select *
+        from ranked
+        where after_rank is null or (ranked.rank, ranked.id) < (after_rank, after_id)
+        order by ranked.rank desc, ranked.id desc
+        limit page_limit
+    )
+    select page.id, page.notes, page.esi_level, page.diagnosis, page.user_id,
+           page.created_at, page.updated_at, page.rank,
+           ts_headline('english', page.notes, query.tsq,
+                       'StartSel=**, StopSel=**, MaxFragments=2, MaxWords=25, MinWords=8'),
+           ts_headline('english', page.diagnosis, query.tsq,
+                       'StartSel=**, StopSel=**, MaxFragments=2, MaxWords=25, MinWords=8')
+    from page, query
+    order by page.rank desc, page.id desc;
+$$;
@@ -0,0 +1,51 @@
+-- Catch-all partition so an insert past the ensure_assessments_partitions horizon
+-- (e.g. pg_cron missing and the retention job not run) lands somewhere instead of failing.
+create table if not exists public.assessments_default partition of public.assessments default;
+alter table public.assessments_default enable row level security;
+
+-- Create the partition holding the month that contains `month`, if missing.
+-- Rows that already landed in the default partition for that month are moved into it,
+-- since Postgres refuses to create a range that the default partition still holds rows for.
+create or replace function public.create_assessments_partition(month date)
+returns text
+language plpgsql
+as $$
+declare
+    start_at date := date_trunc('month', month)::date;
+    end_at date := (date_trunc('month', month) + interval '1 month')::date;
+    partition_name text := format('assessments_y%sm%s', to_char(start_at, 'YYYY'), to_char(start_at, 'MM'));
+begin
+    if to_regclass(format('public.%I', partition_name)) is not null then
+        return partition_name;
+    end if;
+    if exists (
+        select 1 from public.assessments_default
+        where created_at >= start_at and created_at < end_at
+    ) then
+        execute format(
+            'create table public.%I (like public.assessments including defaults including generated including constraints)',
+            partition_name
+        );
+        execute format(
+            'with moved as (
+                 delete from public.assessments_default where created_at >= %L and created_at < %L
+                 returning id, notes, esi_level, diagnosis, user_id, created_at, updated_at
+             )
+             insert into public.%I (id, notes, esi_level, diagnosis, user_id, created_at, updated_at)
+             select * from moved',
+            start_at, end_at, partition_name
+        );
+        execute format(
+            'alter table public.assessments attach partition public.%I for values from (%L) to (%L)',
+            partition_name, start_at, end_at
+        );
+    else
+        execute format(
+            'create table public.%I partition of public.assessments for values from (%L) to (%L)',
+            partition_name, start_at, end_at
+        );
+    end if;
+    execute format('alter table public.%I enable row level security', partition_name);
+    return partition_name;
+end;
+$$;
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so point everything at throwaway local backends before any app module loads
+_tmp = tempfile.mkdtemp(prefix="clinical-agents-tests-")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(_tmp, "app.db"))
+os.environ.setdefault("ASSESSMENT_JOURNAL_PATH", os.path.join(_tmp, "journal.db"))
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("TRIAGE_CHECKPOINTER", "off")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from agents.admission import AdmissionController, LLMOverloadedError, TokenBucket
+
+def controller(**kwargs) -> AdmissionController:
+    settings = dict(max_concurrency=1, max_queue=0, queue_timeout=0.01, global_rate=0.001, global_burst=3,
+                    patient_rate=0.001, patient_burst=2)
+    settings.update(kwargs)
+    return AdmissionController(**settings)
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(rate=100, burst=1)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+    time.sleep(0.02)
+    assert bucket.try_acquire() == 0
+
+def test_wait_time_does_not_consume():
+    bucket = TokenBucket(rate=0.001, burst=1)
+    assert bucket.wait_time() == 0
+    assert bucket.wait_time() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.wait_time() > 0
+
+def test_patient_limit_is_per_patient():
+    admission = controller(global_burst=10)
+    admission.admit("p1")
+    admission.admit("p1")
+    with pytest.raises(LLMOverloadedError) as rejected:
+        admission.admit("p1")
+    assert rejected.value.reason == "patient_rate"
+    admission.admit("p2")
+
+def test_requests_without_patient_only_charge_global():
+    admission = controller(global_burst=3, patient_burst=1)
+    for _ in range(3):
+        admission.admit()
+    with pytest.raises(LLMOverloadedError) as rejected:
+        admission.admit()
+    assert rejected.value.reason == "global_rate"
+    assert admission._patients == {}
+
+def test_global_rejection_leaves_patient_tokens():
+    admission = controller(global_burst=1, patient_burst=2)
+    admission.admit("other")
+    with pytest.raises(LLMOverloadedError) as rejected:
+        admission.admit("p1")
+    assert rejected.value.reason == "global_rate"
+    assert admission._patients["p1"].tokens == 2
+
+def test_patient_rejection_leaves_global_tokens():
+    admission = controller(global_burst=5, patient_burst=1)
+    admission.admit("p1")
+    with pytest.raises(LLMOverloadedError):
+        admission.admit("p1")
+    assert admission._global.tokens == pytest.approx(4, abs=0.01)
+
+def test_slot_sheds_when_queue_is_full():
+    admission = controller(max_concurrency=1, max_queue=0)
+    with admission.slot():
+        with pytest.raises(LLMOverloadedError) as rejected:
+            with admission.slot():
+                pass
+    assert rejected.value.reason == "queue_full"
+    assert admission.stats()["in_flight"] == 0
+    with admission.slot():
+        pass
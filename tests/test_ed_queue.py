@@ -0,0 +1,38 @@
+import random
+
+from app.ed_queue import RankedKeys
+
+def test_matches_a_sorted_list_under_random_inserts_and_removes():
+    rng = random.Random(7)
+    keys, expected = RankedKeys(), []
+    for step in range(3000):
+        if expected and rng.random() < 0.4:
+            key = rng.choice(expected)
+            assert keys.remove(key)
+            expected.remove(key)
+        else:
+            key = (rng.randint(0, 1), rng.uniform(0, 1e6), step)
+            keys.add(key)
+            expected.append(key)
+        if step % 250 == 0:
+            expected.sort()
+            assert keys.first(len(expected) + 1) == expected
+    expected.sort()
+    assert len(keys) == len(expected)
+    for index in rng.sample(range(len(expected)), 50):
+        assert keys.rank(expected[index]) == index
+
+def test_rank_of_missing_key_is_its_insertion_point():
+    keys = RankedKeys()
+    for key in [(1, 10.0, 1), (1, 30.0, 2), (0, 50.0, 3)]:
+        keys.add(key)
+    assert keys.first(3) == [(0, 50.0, 3), (1, 10.0, 1), (1, 30.0, 2)]
+    assert keys.rank((1, 20.0, 9)) == 2
+    assert not keys.remove((1, 20.0, 9))
+    assert len(keys) == 3
+
+def test_first_stops_at_count():
+    keys = RankedKeys()
+    for i in range(10):
+        keys.add((1, float(i), i))
+    assert keys.first(3) == [(1, 0.0, 0), (1, 1.0, 1), (1, 2.0, 2)]
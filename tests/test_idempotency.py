@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+
+from app.idempotency import IdempotencyStore
+from app.storage import SQLiteClient
+
+@pytest.fixture
+def client(tmp_path):
+    return SQLiteClient(str(tmp_path / "idempotency.db"))
+
+def test_repeat_replays_stored_response(client):
+    store = IdempotencyStore(poll_interval=0.01)
+    calls = []
+
+    def create():
+        calls.append(1)
+        return 201, {"id": len(calls)}
+
+    first = store.run(client, "assessments", "key-1", {"notes": "a"}, create)
+    second = store.run(client, "assessments", "key-1", {"notes": "a"}, create)
+    assert len(calls) == 1
+    assert (first.status_code, first.body) == (second.status_code, second.body) == (201, b'{"id":1}')
+    assert first.headers["Idempotent-Replayed"] == "false"
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+def test_replay_from_table_on_another_worker(client):
+    IdempotencyStore().run(client, "assessments", "key-1", {"notes": "a"}, lambda: (201, {"id": 7}))
+    other_worker = IdempotencyStore()
+    replay = other_worker.run(client, "assessments", "key-1", {"notes": "a"}, lambda: pytest.fail("re-executed"))
+    assert replay.body == b'{"id":7}'
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert other_worker.stats()["replayed_db"] == 1
+
+def test_different_body_is_rejected(client):
+    store = IdempotencyStore()
+    store.run(client, "assessments", "key-1", {"notes": "a"}, lambda: (201, {"id": 1}))
+    with pytest.raises(HTTPException) as rejected:
+        store.run(client, "assessments", "key-1", {"notes": "b"}, lambda: (201, {"id": 2}))
+    assert rejected.value.status_code == 422
+
+def test_failed_request_releases_key(client):
+    store = IdempotencyStore()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        store.run(client, "assessments", "key-1", {"notes": "a"}, fail)
+    retried = store.run(client, "assessments", "key-1", {"notes": "a"}, lambda: (201, {"id": 1}))
+    assert retried.headers["Idempotent-Replayed"] == "false"
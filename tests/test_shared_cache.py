@@ -0,0 +1,49 @@
+import pytest
+
+from agents.shared_cache import InMemoryBackend, SharedStore
+
+@pytest.fixture
+def workers():
+    """Two workers sharing one backend, as two processes would share one Redis"""
+    backend = InMemoryBackend()
+    stores = [SharedStore(backend), SharedStore(backend)]
+    for store in stores:
+        store.start()
+    return [store.cache("triage", ttl=60, local_ttl=60) for store in stores]
+
+def test_value_set_on_one_worker_is_read_by_another(workers):
+    a, b = workers
+    a.set("note", {"esi": 2})
+    assert b.get("note") == {"esi": 2}
+    assert b.stats()["shared_hits"] == 1
+    assert b.get("note") == {"esi": 2}
+    assert b.stats()["local_hits"] == 1
+
+def test_overwrite_drops_other_workers_local_copy(workers):
+    a, b = workers
+    a.set("note", {"esi": 2})
+    assert b.get("note") == {"esi": 2}
+    received = b.stats()["invalidations_received"]
+    a.set("note", {"esi": 3})
+    assert b.stats()["invalidations_received"] == received + 1
+    assert b.get("note") == {"esi": 3}
+
+def test_invalidate_removes_both_tiers_everywhere(workers):
+    a, b = workers
+    a.set("note", {"esi": 2})
+    assert b.get("note") == {"esi": 2}
+    b.invalidate("note")
+    assert a.get("note") is None
+    assert b.get("note") is None
+
+def test_zero_ttl_disables_the_cache():
+    cache = SharedStore(InMemoryBackend()).cache("triage", ttl=0)
+    cache.set("note", {"esi": 2})
+    assert cache.get("note") is None
+    assert not cache.stats()["enabled"]
+
+def test_hits_return_fresh_objects(workers):
+    a, _ = workers
+    a.set("note", {"esi": 2})
+    a.get("note")["esi"] = 5
+    assert a.get("note") == {"esi": 2}
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from app.models import PatientAssessment
+from app.repository.AssessmentWriteBuffer import AssessmentWriteBuffer
+from app.storage import SQLiteClient
+
+@pytest.fixture
+def client(tmp_path):
+    client = SQLiteClient(str(tmp_path / "app.db"))
+    client.table("users").insert({
+        "name": "Test Patient", "email": "patient@example.com", "age": 40, "gender": "f", "user_type": "patient"
+    }).execute()
+    return client
+
+@pytest.fixture
+def user_id(client):
+    return client.table("users").select("id").execute().data[0]["id"]
+
+def buffer(client, tmp_path) -> AssessmentWriteBuffer:
+    return AssessmentWriteBuffer(lambda: client, journal_path=str(tmp_path / "journal.db"), batch_size=10)
+
+def assessment(user_id: int, esi_level: int = 3) -> PatientAssessment:
+    return PatientAssessment(notes="chest pain", esi_level=esi_level, diagnosis="NURSE REASONING: x\nDOCTOR INPUT: y",
+                             user_id=user_id)
+
+def stored(client):
+    return client.table("assessments").select("id,write_key").execute().data
+
+def test_journal_is_replayed_after_restart(client, tmp_path, user_id):
+    buffer(client, tmp_path).enqueue(assessment(user_id))
+    restarted = buffer(client, tmp_path)
+    assert restarted.backlog() == 1
+    assert restarted.flush_once(client) == 1
+    assert restarted.backlog() == 0
+    assert len(stored(client)) == 1
+
+def test_batch_resent_after_crash_is_not_duplicated(client, tmp_path, user_id):
+    journal = buffer(client, tmp_path)
+    journal.enqueue(assessment(user_id))
+    payload = journal._next_batch()[0][1]
+    journal.flush_once(client)
+    # Crash between the insert and the journal delete: the same payload is still pending on restart
+    journal._connect().execute("insert into pending (payload, enqueued_at) values (?, 0)", (payload,))
+    journal.flush_once(client)
+    assert journal.backlog() == 0
+    assert [row["write_key"] for row in stored(client)] == [json.loads(payload)["write_key"]]
+
+def test_rejected_row_is_dead_lettered_without_blocking_the_batch(client, tmp_path, user_id):
+    journal = buffer(client, tmp_path)
+    journal.enqueue(assessment(user_id))
+    journal.enqueue(assessment(user_id + 1000))  # no such user: foreign key violation
+    journal.enqueue(assessment(user_id, esi_level=2))
+    assert journal.flush_once(client) == 3
+    assert journal.backlog() == 0
+    assert journal.dead_letters() == 1
+    assert len(stored(client)) == 2
+    assert journal.stats()["dead_lettered"] == 1
+
+def test_transient_error_keeps_rows_pending(client, tmp_path, user_id):
+    journal = buffer(client, tmp_path)
+    journal.enqueue(assessment(user_id))
+
+    class Unavailable:
+        def table(self, name):
+            raise ConnectionError("database unreachable")
+
+    with pytest.raises(ConnectionError):
+        journal.flush_once(Unavailable())
+    assert journal.backlog() == 1
+    assert journal.dead_letters() == 0